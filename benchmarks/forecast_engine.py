@@ -0,0 +1,95 @@
+"""Benchmark the vectorized demand forecast engine against the previous pure-Python one.
+
+Usage: PYTHONPATH=. python benchmarks/forecast_engine.py [series] [horizon_days ...]
+"""
+from datetime import datetime, timedelta
+import random
+import sys
+import time
+
+from src.models.demand_forecast import HISTORY_DAYS, forecast_demand
+from src.models.demand_history import to_day
+
+def legacy_forecast(historical, forecast_period):
+    """The per-day dict engine the vectorized one replaced, kept as the baseline"""
+    demands = [record['demand'] for record in historical[-30:]]
+    if len(demands) < 7:
+        raise ValueError("Insufficient data for forecasting")
+    ma_forecast = sum(demands[-7:]) / 7
+    if len(demands) >= 14:
+        trend = (sum(demands[-7:]) / 7 - sum(demands[-14:-7]) / 7) / 7
+    else:
+        trend = 0
+    seasonal_factor = 1.0
+    current_day = datetime.utcnow().weekday()
+    if len(demands) >= 14:
+        weekly_pattern = {}
+        for record in historical[-14:]:
+            weekly_pattern.setdefault(datetime.fromisoformat(record['date']).weekday(), []).append(record['demand'])
+        if current_day in weekly_pattern:
+            day_avg = sum(weekly_pattern[current_day]) / len(weekly_pattern[current_day])
+            seasonal_factor = day_avg / max(sum(demands[-14:]) / 14, 1)
+    daily_forecast = []
+    for day in range(forecast_period):
+        daily_demand = ma_forecast + trend * day
+        if (current_day + day) % 7 in [5, 6]:
+            daily_demand *= 0.8
+        daily_demand = max(0, daily_demand * seasonal_factor)
+        daily_forecast.append({
+            'date': (datetime.utcnow() + timedelta(days=day)).isoformat()[:10],
+            'predicted_demand': round(daily_demand, 2)
+        })
+    return {
+        'predicted_demand': round(sum(day['predicted_demand'] for day in daily_forecast), 2),
+        'seasonal_factor': round(seasonal_factor, 2),
+        'daily_forecast': daily_forecast
+    }
+
+def vectorized_forecast(historical, forecast_period):
+    recent = historical[-HISTORY_DAYS:]
+    return forecast_demand(
+        [record['demand'] for record in recent], [to_day(record['date']) for record in recent], forecast_period
+    )
+
+def synthetic_series(count, days=60, seed=42):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=days)
+    series = []
+    for _ in range(count):
+        base, slope = rng.uniform(5, 200), rng.uniform(-0.5, 0.5)
+        series.append([
+            {
+                'date': (start + timedelta(days=day)).date().isoformat(),
+                'demand': max(0, round(base + slope * day + rng.gauss(0, base * 0.1) +
+                                       (base * 0.2 if (start + timedelta(days=day)).weekday() < 5 else 0), 1))
+            }
+            for day in range(days)
+        ])
+    return series
+
+def throughput(engine, series, horizon):
+    started = time.perf_counter()
+    for historical in series:
+        engine(historical, horizon)
+    elapsed = time.perf_counter() - started
+    return len(series) / elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    horizons = [int(arg) for arg in sys.argv[2:]] or [30, 90, 365]
+    series = synthetic_series(count)
+
+    # The engines must agree before their speed is worth comparing
+    for historical in series[:100]:
+        old, new = legacy_forecast(historical, 30), vectorized_forecast(historical, 30)
+        assert old['daily_forecast'] == new['daily_forecast'], 'engines disagree'
+        assert abs(old['predicted_demand'] - new['predicted_demand']) < 0.02, 'engines disagree'
+
+    for horizon in horizons:
+        before = throughput(legacy_forecast, series, horizon)
+        after = throughput(vectorized_forecast, series, horizon)
+        print(f'horizon {horizon:>3}d: pure-Python {before:>9,.0f} forecasts/s, '
+              f'vectorized {after:>9,.0f} forecasts/s ({after / before:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark StockLedger restore time with and without a snapshot.
+
+Usage: PYTHONPATH=. python benchmarks/ledger_replay.py [movements] [products] [locations]
+"""
+import random
+import sys
+import tempfile
+import time
+
+from src.models.stock_ledger import StockLedger, RECEIPT, SALE, ADJUSTMENT, TRANSFER
+
+WRITE_BATCH = 100000
+
+def generate(ledger, movements, products, locations):
+    rng = random.Random(42)
+    product_ids = [f'PROD{n:06d}' for n in range(products)]
+    location_ids = [f'LOC{n:03d}' for n in range(locations)]
+    kinds = (RECEIPT, SALE, SALE, ADJUSTMENT, TRANSFER)
+
+    written = 0
+    while written < movements:
+        batch = []
+        for _ in range(min(WRITE_BATCH, movements - written)):
+            kind = rng.choice(kinds)
+            location = rng.choice(location_ids)
+            to_location = rng.choice(location_ids) if kind == TRANSFER else None
+            batch.append((kind, rng.choice(product_ids), location, rng.randint(1, 50), to_location))
+        ledger.record(batch)
+        written += len(batch)
+
+def timed_open(directory):
+    ledger = StockLedger(directory, snapshot_every=0)
+    started = time.perf_counter()
+    stats = ledger.open()
+    elapsed = time.perf_counter() - started
+    ledger.close()
+    return ledger, stats, elapsed
+
+def main():
+    movements = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    locations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    with tempfile.TemporaryDirectory() as directory:
+        # snapshot_every=0 disables auto-snapshots so the full log is replayed
+        ledger = StockLedger(directory, snapshot_every=0)
+        ledger.open()
+        started = time.perf_counter()
+        generate(ledger, movements, products, locations)
+        write_seconds = time.perf_counter() - started
+        ledger.close()
+        print(f'wrote {movements:,} movements in {write_seconds:.2f}s '
+              f'({movements / write_seconds:,.0f}/s)')
+
+        _, stats, elapsed = timed_open(directory)
+        print(f'full replay: {stats["replayed_movements"]:,} movements in {elapsed:.2f}s '
+              f'({stats["replayed_movements"] / elapsed:,.0f}/s), {stats["balances"]:,} balances')
+
+        ledger = StockLedger(directory, snapshot_every=0)
+        ledger.open()
+        started = time.perf_counter()
+        ledger.snapshot()
+        snapshot_seconds = time.perf_counter() - started
+        ledger.close()
+        print(f'snapshot + compaction: {snapshot_seconds:.2f}s')
+
+        _, stats, elapsed = timed_open(directory)
+        print(f'restore from snapshot: {stats["balances"]:,} balances, '
+              f'{stats["replayed_movements"]:,} replayed in {elapsed * 1000:.1f}ms')
+
+if __name__ == '__main__':
+    main()
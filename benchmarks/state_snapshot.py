@@ -0,0 +1,72 @@
+"""Benchmark state snapshot write and restore time.
+
+Usage: PYTHONPATH=. python benchmarks/state_snapshot.py [products] [history_days]
+"""
+import atexit
+import gc
+import os
+import sys
+import tempfile
+import time
+
+def generate(store, history, products, days):
+    from src.models.demand_history import DemandHistory, to_day
+
+    first_day = to_day('2024-01-01')
+    for n in range(products):
+        product_id = f'PROD{n:07d}'
+        store.upsert(product_id, f'Product {n}', n % 500, 20, 400,
+                     sku=f'SKU{n}', location=f'LOC{n % 20:03d}', supplier=f'SUP{n % 50:02d}',
+                     cost_per_unit=1.5, last_updated='2024-01-01T00:00:00')
+        rows = [(first_day + day, (n + day) % 40, 0.0, 0.0, False) for day in range(days)]
+        history.put(product_id, DemandHistory(history.capacity).add(rows), None)
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the app's shared state and snapshot at scratch files before any of its modules load
+        os.environ['SHARED_STATE_PATH'] = os.path.join(directory, 'shared_state.db')
+        os.environ['STATE_SNAPSHOT_PATH'] = os.path.join(directory, 'state.snapshot')
+        os.environ['STATE_SNAPSHOT_INTERVAL'] = '0'
+        from src.models.demand_history import DemandHistoryStore
+        from src.models.inventory_store import InventoryStore
+        from src.models.shared_state import SharedState
+        from src.models.state_snapshot import StateSnapshotter
+        from src.routes.forecasting import historical_data, state_snapshots
+        atexit.unregister(state_snapshots.close)
+
+        # History goes through the forecasting blueprint's registered snapshot provider
+        store = InventoryStore()
+        generate(store, historical_data, products, days)
+        state_snapshots.register('inventory', lambda: (0, store.to_snapshot()), lambda: 0)
+        state_snapshots.write(force=True)
+        print(f"wrote {state_snapshots.last_write['bytes'] / 2**20:,.1f} MiB "
+              f"({products:,} products, {products * days:,} history records) "
+              f"in {state_snapshots.last_write['write_ms'] / 1000:.2f}s")
+
+        # Restore into fresh stores, as a new process would; drop the
+        # generated data first so it does not inflate garbage collection
+        capacity = historical_data.capacity
+        del store
+        historical_data.histories = {}
+        gc.collect()
+        restored_store, restored_history = InventoryStore(), DemandHistoryStore(capacity)
+        restore = StateSnapshotter(state_snapshots.path, SharedState(os.environ['SHARED_STATE_PATH']))
+        started = time.perf_counter()
+        restore.open()
+        restore.restore_shared()
+        restored_store.load_snapshot(restore.section('inventory')[1])
+        restored_history.load_snapshot(restore.section('historical_data')[1])
+        elapsed = time.perf_counter() - started
+        print(f'restore: {len(restored_store):,} products and {len(restored_history):,} '
+              f'histories in {elapsed:.2f}s')
+
+        started = time.perf_counter()
+        for product_id in list(restored_history)[:1000]:
+            restored_history.get(product_id)
+        print(f'first read of 1,000 histories: {(time.perf_counter() - started) * 1000:.1f}ms')
+
+if __name__ == '__main__':
+    main()
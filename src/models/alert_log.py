@@ -0,0 +1,119 @@
+from bisect import bisect_left
+from collections import deque
+from itertools import islice
+
+
+class AlertLog:
+    """Bounded ring buffer of alerts with per-type and per-product indexes.
+
+    Every alert gets a monotonically increasing sequence number. Once
+    `capacity` alerts are retained, appending overwrites the oldest slot and
+    drops it from the indexes, so memory stays fixed and filtered reads only
+    touch matching alerts.
+
+    Sequence numbers can also be assigned by the caller (e.g. replaying a
+    log shared between workers); skipped numbers simply leave empty slots.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('Alert log capacity must be at least 1')
+        self.capacity = capacity
+        self.next_seq = 0
+        self._start = 0  # lowest seq this log can hold (moves when skipping past the window)
+        self._size = 0
+        self._slots = [None] * capacity
+        self._by_type = {}  # alert type -> deque of seqs
+        self._by_product = {}  # product_id -> deque of seqs
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def version(self):
+        """Changes on every append (evictions only happen on append)"""
+        return self.next_seq
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest retained alert"""
+        return max(self._start, self.next_seq - self.capacity)
+
+    def append(self, alert, seq=None):
+        """Store an alert, evicting the oldest one when full, and return its seq.
+
+        `seq` may jump ahead of `next_seq` (never back); the skipped numbers
+        stay empty.
+        """
+        if seq is not None and seq > self.next_seq:
+            self._skip_to(seq)
+        seq = self.next_seq
+        slot = seq % self.capacity
+
+        if not self._evict(slot):
+            self._size += 1
+
+        self._slots[slot] = alert
+        self._by_type.setdefault(alert['type'], deque()).append(seq)
+        self._by_product.setdefault(alert['product_id'], deque()).append(seq)
+        self.next_seq += 1
+        return seq
+
+    def _evict(self, slot):
+        """Empty a slot, returning whether it held an alert"""
+        evicted = self._slots[slot]
+        if evicted is None:
+            return False
+        # The evicted alert is always the oldest entry in both of its indexes
+        self._unindex(self._by_type, evicted['type'])
+        self._unindex(self._by_product, evicted['product_id'])
+        self._slots[slot] = None
+        return True
+
+    def _skip_to(self, seq):
+        if seq - self.next_seq >= self.capacity:
+            # Everything retained falls out of the window
+            self._slots = [None] * self.capacity
+            self._by_type, self._by_product = {}, {}
+            self._size = 0
+            self._start = seq
+        else:
+            for skipped in range(self.next_seq, seq):
+                if self._evict(skipped % self.capacity):
+                    self._size -= 1
+        self.next_seq = seq
+
+    def _unindex(self, index, key):
+        seqs = index[key]
+        seqs.popleft()
+        if not seqs:
+            del index[key]
+
+    def get(self, seq):
+        """Get a retained alert by sequence number, or None if it was evicted"""
+        if self.first_seq <= seq < self.next_seq:
+            return self._slots[seq % self.capacity]
+        return None
+
+    def seqs(self, start=0, alert_type=None, product_id=None):
+        """Iterate retained sequence numbers >= start, using the narrowest index available"""
+        start = max(start, self.first_seq)
+
+        if product_id is not None:
+            candidates = self._by_product.get(product_id, ())
+        elif alert_type is not None:
+            candidates = self._by_type.get(alert_type, ())
+        else:
+            slots, capacity = self._slots, self.capacity
+            return (seq for seq in range(start, self.next_seq) if slots[seq % capacity] is not None)
+
+        return islice(candidates, bisect_left(candidates, start), None)
+
+    def of_type(self, alert_type):
+        """Get all retained alerts of one type, oldest first"""
+        slots, capacity = self._slots, self.capacity
+        return [slots[seq % capacity] for seq in self._by_type.get(alert_type, ())]
+
+    def count(self, alert_type):
+        """Count retained alerts of one type"""
+        return len(self._by_type.get(alert_type, ()))
@@ -0,0 +1,263 @@
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime
+import time
+import numpy as np
+
+HISTORY_DAYS = 30  # demand history the model looks at
+MOVING_AVERAGE_DAYS = 7
+WEEKEND_FACTOR = 0.8
+MODEL_NAME = 'moving_average_with_trend'
+MOVING_AVERAGE = 'moving_average'
+
+# datetime64 day 0 (1970-01-01) was a Thursday
+_EPOCH_WEEKDAY = 3
+
+
+def weekdays(days):
+    """Monday=0 weekdays of datetime64[D] values (or day numbers since the epoch)"""
+    return (np.asarray(days, dtype='datetime64[D]').astype(np.int64) + _EPOCH_WEEKDAY) % 7
+
+
+def forecast_demand(demand, days, forecast_period, today=None):
+    """Forecast daily demand from a history of (day, demand) observations.
+
+    `demand` and `days` (datetime64[D] or day numbers since the epoch) are
+    in date order, oldest first.
+    The model is a 7-day moving average plus the daily trend between the
+    last two weeks, scaled by today's weekday demand relative to the last
+    14 days and damped on weekends. The whole horizon is computed as one
+    set of array operations.
+    """
+    demand = np.asarray(demand, dtype=np.float64)[-HISTORY_DAYS:]
+    days = np.asarray(days, dtype='datetime64[D]')[-HISTORY_DAYS:]
+    if len(demand) < MOVING_AVERAGE_DAYS:
+        raise ValueError("Insufficient data for forecasting")
+
+    today = np.datetime64(today or datetime.utcnow().date(), 'D')
+    current_day = int(weekdays(today))
+
+    recent_avg = demand[-7:].mean()
+    trend = 0.0
+    seasonal_factor = 1.0
+    if len(demand) >= 14:
+        trend = (recent_avg - demand[-14:-7].mean()) / 7  # daily trend
+        # This weekday's average demand over the last two weeks vs. the overall average
+        same_weekday = weekdays(days[-14:]) == current_day
+        if same_weekday.any():
+            seasonal_factor = demand[-14:][same_weekday].mean() / max(demand[-14:].mean(), 1)
+
+    offsets = np.arange(forecast_period)
+    daily = recent_avg + trend * offsets
+    daily[(current_day + offsets) % 7 >= 5] *= WEEKEND_FACTOR
+    return forecast_result(daily * seasonal_factor, today, trend, seasonal_factor, len(demand), MODEL_NAME)
+
+
+def forecast_result(daily, today, trend, seasonal_factor, observations, model_name):
+    """Build an engine result from a daily forecast starting `today` (datetime64[D])"""
+    daily = np.round(np.maximum(daily, 0), 2)
+    dates = (today + np.arange(len(daily))).astype(str)
+
+    if trend > 0.1:
+        trend_direction = 'increasing'
+    elif trend < -0.1:
+        trend_direction = 'decreasing'
+    else:
+        trend_direction = 'stable'
+
+    return {
+        'predicted_demand': round(float(daily.sum()), 2),
+        'confidence_level': min(95, 60 + int(observations) * 2),  # more data = higher confidence
+        'trend_direction': trend_direction,
+        'seasonal_factor': round(float(seasonal_factor), 2),
+        'daily_forecast': [
+            {'date': date, 'predicted_demand': value}
+            for date, value in zip(dates.tolist(), daily.tolist())
+        ],
+        'model_used': model_name,
+        'accuracy_score': 0  # updated when actual data is available
+    }
+
+
+class OnlineModel(ABC):
+    """A forecasting model whose fit is a small array of floats updated one observation at a time.
+
+    The state starts with the observation count and the day of the last
+    observation; `update` folds in an observation for a later day in O(1).
+    Subclasses must implement `update`, `project` and `trend`.
+    """
+
+    model_id = None
+    state_fields = ('observations', 'last_day')
+
+    def initial(self):
+        return array('d', bytes(8 * len(self.state_fields)))
+
+    @abstractmethod
+    def update(self, state, day, demand):
+        """Fold in the observation for a day later than any before it"""
+
+    @abstractmethod
+    def project(self, state, days):
+        """Predicted demand for an array of future day numbers"""
+
+    @abstractmethod
+    def trend(self, state):
+        """Fitted change in daily demand per day"""
+
+    def seasonal_factor(self, state, day):
+        return 1.0
+
+    def fit(self, demand, days):
+        """Fit a state from observations in day order"""
+        state = self.initial()
+        for day, value in zip(days, demand):
+            self.update(state, day, value)
+        return state
+
+    def describe(self, state):
+        return dict(zip(self.state_fields, state.tolist()))
+
+    def forecast(self, state, forecast_period, today=None):
+        today = np.datetime64(today or datetime.utcnow().date(), 'D')
+        day = int(today.astype(np.int64))
+        days = day + np.arange(forecast_period)
+        return forecast_result(
+            self.project(state, days), today, self.trend(state), self.seasonal_factor(state, day), state[0], self.model_id
+        )
+
+
+class ExponentialSmoothing(OnlineModel):
+    """Holt's linear exponential smoothing: a smoothed level plus a smoothed daily trend"""
+
+    model_id = 'exponential_smoothing'
+    state_fields = OnlineModel.state_fields + ('level', 'trend')
+
+    def __init__(self, alpha=0.3, beta=0.1):
+        self.alpha, self.beta = alpha, beta
+
+    def update(self, state, day, demand):
+        observations, last_day, level, trend = state
+        if observations:
+            gap = day - last_day
+            new_level = self.alpha * demand + (1 - self.alpha) * (level + gap * trend)
+            trend = self.beta * (new_level - level) / gap + (1 - self.beta) * trend
+            level = new_level
+        else:
+            level = demand
+        state[0], state[1], state[2], state[3] = observations + 1, day, level, trend
+
+    def project(self, state, days):
+        return state[2] + state[3] * (days - state[1])
+
+    def trend(self, state):
+        return state[3]
+
+
+class SeasonalDecomposition(OnlineModel):
+    """Additive Holt-Winters: level, daily trend and a weekday component, each smoothed online"""
+
+    model_id = 'seasonal_decomposition'
+    state_fields = OnlineModel.state_fields + ('level', 'trend') + tuple(f'weekday_{day}' for day in range(7))
+
+    def __init__(self, alpha=0.3, beta=0.05, gamma=0.2):
+        self.alpha, self.beta, self.gamma = alpha, beta, gamma
+
+    def update(self, state, day, demand):
+        observations, last_day, level, trend = state[:4]
+        slot = 4 + (int(day) + _EPOCH_WEEKDAY) % 7
+        if observations:
+            gap = day - last_day
+            new_level = self.alpha * (demand - state[slot]) + (1 - self.alpha) * (level + gap * trend)
+            trend = self.beta * (new_level - level) / gap + (1 - self.beta) * trend
+            level = new_level
+            state[slot] = self.gamma * (demand - level) + (1 - self.gamma) * state[slot]
+        else:
+            level = demand
+        state[0], state[1], state[2], state[3] = observations + 1, day, level, trend
+
+    def project(self, state, days):
+        seasonal = np.asarray(state[4:11])[weekdays(days)]
+        return state[2] + state[3] * (days - state[1]) + seasonal
+
+    def trend(self, state):
+        return state[3]
+
+    def seasonal_factor(self, state, day):
+        return (state[2] + state[4 + int(weekdays(day))]) / max(state[2], 1)
+
+
+class LinearRegression(OnlineModel):
+    """Least-squares line through the history, with older days weighted down by `decay` per day.
+
+    The weighted sums are kept relative to the last observed day, so a new
+    observation shifts and decays them in O(1).
+    """
+
+    model_id = 'linear_regression'
+    state_fields = OnlineModel.state_fields + ('weight', 'sum_x', 'sum_y', 'sum_xx', 'sum_xy')
+
+    def __init__(self, decay=0.97):
+        self.decay = decay
+
+    def update(self, state, day, demand):
+        observations, last_day, weight, sum_x, sum_y, sum_xx, sum_xy = state
+        if observations:
+            # Re-origin x on the new day, then age every sum by the days elapsed
+            gap = day - last_day
+            sum_xx += gap * (gap * weight - 2 * sum_x)
+            sum_xy -= gap * sum_y
+            sum_x -= gap * weight
+            factor = self.decay ** gap
+            weight, sum_x, sum_y, sum_xx, sum_xy = (
+                weight * factor, sum_x * factor, sum_y * factor, sum_xx * factor, sum_xy * factor
+            )
+        # The new observation sits at x = 0
+        state[:] = array('d', (observations + 1, day, weight + 1, sum_x, sum_y + demand, sum_xx, sum_xy))
+
+    def line(self, state):
+        """(intercept at the last day, slope per day)"""
+        _, _, weight, sum_x, sum_y, sum_xx, sum_xy = state
+        if not weight:
+            return 0.0, 0.0
+        spread = weight * sum_xx - sum_x * sum_x
+        slope = (weight * sum_xy - sum_x * sum_y) / spread if spread > 1e-9 else 0.0
+        return (sum_y - slope * sum_x) / weight, slope
+
+    def project(self, state, days):
+        intercept, slope = self.line(state)
+        return intercept + slope * (days - state[1])
+
+    def trend(self, state):
+        return self.line(state)[1]
+
+
+# Models fitted incrementally; moving_average works on the recent window instead
+ONLINE_MODELS = {model.model_id: model for model in (ExponentialSmoothing(), SeasonalDecomposition(), LinearRegression())}
+FORECAST_MODELS = (MOVING_AVERAGE,) + tuple(ONLINE_MODELS)
+
+
+def forecast_with(model_id, data, forecast_period, today=None):
+    """Forecast from a (demand, days) window for moving_average, or a fitted state for online models"""
+    if model_id == MOVING_AVERAGE:
+        return forecast_demand(*data, forecast_period, today)
+    return ONLINE_MODELS[model_id].forecast(data, forecast_period, today)
+
+
+def forecast_chunk(items, forecast_period, today):
+    """Forecast a chunk of products; runs in a worker process.
+
+    `items` holds (product_id, model_id, data) where data is what
+    `forecast_with` takes: a (demands, days) window, days numbered from the
+    epoch, or a fitted state.
+    Returns (forecasts, failures, compute_ms), where forecasts is a list of
+    (product_id, forecast) and failures a list of (product_id, error).
+    """
+    started = time.perf_counter()
+    forecasts, failures = [], []
+    for product_id, model_id, data in items:
+        try:
+            forecasts.append((product_id, forecast_with(model_id, data, forecast_period, today)))
+        except Exception as e:
+            failures.append((product_id, str(e)))
+    return forecasts, failures, (time.perf_counter() - started) * 1000
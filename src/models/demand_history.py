@@ -0,0 +1,421 @@
+from array import array
+import base64
+from datetime import date
+from functools import lru_cache
+import json
+import struct
+from src.models.demand_forecast import ONLINE_MODELS
+
+EPOCH = date(1970, 1, 1)
+
+# Typed columns of every history, in serialization order
+COLUMNS = (('days', 'i'), ('demand', 'd'), ('sales', 'd'), ('price', 'd'), ('promotions', 'b'))
+# Packed history: observation count, then each column's values oldest first,
+# then each fitted model as its code followed by its state
+PACKED_HEADER = struct.Struct('<I')
+MODEL_CODES = tuple(ONLINE_MODELS)
+# Store snapshot section: product count, length of the JSON product id list
+SNAPSHOT_HEADER = struct.Struct('<QQ')
+# Shared-state key of the rows appended to a product since its history was
+# last published whole, and how many may pile up before it is published again
+APPENDED_SUFFIX = '/appended'
+MAX_APPENDED_ROWS = 32
+
+
+@lru_cache(maxsize=4096)  # bulk loads repeat the same dates across products
+def to_day(value):
+    """Day number since the epoch of an ISO date or datetime string"""
+    return (date.fromisoformat(value[:10]) - EPOCH).days
+
+
+def from_day(day):
+    return date.fromordinal(EPOCH.toordinal() + day).isoformat()
+
+
+def _number(value):
+    """Return whole floats as ints so records keep their original shape"""
+    return int(value) if value.is_integer() else value
+
+
+class DemandHistory:
+    """Fixed-capacity ring buffer of one product's daily observations.
+
+    Each observation is a day number plus demand, sales, price and a
+    promotion flag, stored in typed arrays and kept in day order with one
+    observation per day. Columns grow on demand up to `capacity`; after
+    that a new day overwrites the oldest. Retention only moves the head.
+
+    `fits` holds the fitted state of each online model used for the
+    product; the store keeps them current as observations arrive.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.head = 0  # physical slot of the oldest observation
+        self.size = 0
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.fits = {}  # model_id -> fitted state
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def oldest_day(self):
+        return self.days[self.head] if self.size else None
+
+    @property
+    def newest_day(self):
+        return self.days[self._slot(self.size - 1)] if self.size else None
+
+    def _columns(self):
+        return (self.days, self.demand, self.sales, self.price, self.promotions)
+
+    def _slot(self, index):
+        return (self.head + index) % len(self.days)
+
+    def _linearize(self):
+        """Rotate the columns so the oldest observation sits in slot 0 and no slot is free"""
+        if self.head == 0 and len(self.days) == self.size:
+            return
+        end = self.head + self.size
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            if end <= len(column):
+                setattr(self, name, column[self.head:end])
+            else:
+                setattr(self, name, column[self.head:] + column[:end - len(column)])
+        self.head = 0
+
+    def search(self, day):
+        """Index of the first observation on or after `day`"""
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.days[self._slot(middle)] < day:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def insert(self, day, demand, sales=0.0, price=0.0, promotions=False):
+        """Record a day's observation, replacing any already held for that day.
+
+        Days at or after the newest are appended in O(1) (amortized while the
+        columns grow); earlier days are inserted in order by shifting the
+        newer ones. Returns False if the buffer is full and `day` is older
+        than everything it holds.
+        """
+        values = (day, demand, sales, price, bool(promotions))
+        if self.size:
+            last = self._slot(self.size - 1)
+            if day < self.days[last]:
+                return self._insert_before(self.search(day), values)
+            if day == self.days[last]:
+                self._set(last, values)
+                return True
+
+        if self.size < len(self.days):
+            self._set(self._slot(self.size), values)
+            self.size += 1
+        elif len(self.days) < self.capacity:
+            self._linearize()
+            for column, value in zip(self._columns(), values):
+                column.append(value)
+            self.size += 1
+        else:
+            # Full: the new day takes the oldest one's slot
+            self._set(self.head, values)
+            self.head = (self.head + 1) % len(self.days)
+        return True
+
+    def _insert_before(self, index, values):
+        slot = self._slot(index)
+        if self.days[slot] == values[0]:
+            self._set(slot, values)
+            return True
+        if index == 0 and self.size >= self.capacity:
+            return False
+        self._linearize()
+        for column, value in zip(self._columns(), values):
+            column.insert(index, value)
+        self.size += 1
+        if self.size > self.capacity:
+            for column in self._columns():
+                del column[0]
+            self.size -= 1
+        return True
+
+    def _set(self, slot, values):
+        for column, value in zip(self._columns(), values):
+            column[slot] = value
+
+    def trim_before(self, day):
+        """Drop observations older than `day` by advancing the head; returns how many"""
+        count = self.search(day)
+        if count == self.size:
+            self.__init__(self.capacity)  # release the columns
+        elif count:
+            self.head = self._slot(count)
+            self.size -= count
+        return count
+
+    def _tail(self, column, count):
+        """The newest `count` values of a column, oldest first"""
+        count = min(count, self.size)
+        start = self._slot(self.size - count) if count else 0
+        end = start + count
+        if end <= len(column):
+            return column[start:end]
+        return column[start:] + column[:end - len(column)]
+
+    def window(self, count):
+        """(demand, days) arrays of the newest `count` observations, oldest first"""
+        return self._tail(self.demand, count), self._tail(self.days, count)
+
+    def add(self, rows, retain_from=None):
+        """Insert (day, demand, sales, price, promotions) rows, then drop observations before `retain_from`.
+
+        Fitted models take each observation newer than any before it in O(1);
+        any other change to the history refits them once all rows are in.
+        Returns the history.
+        """
+        refit = False
+        for row in rows:
+            newest_day = self.newest_day
+            if not self.insert(*row) or not self.fits:
+                continue
+            if newest_day is None or row[0] > newest_day:
+                for model_id, state in self.fits.items():
+                    ONLINE_MODELS[model_id].update(state, row[0], row[1])
+            else:
+                refit = True
+        if refit:
+            self.refit()
+        if retain_from is not None:
+            self.trim_before(retain_from)
+        return self
+
+    def copy(self):
+        """Independent copy, fitted states included"""
+        history = DemandHistory(self.capacity)
+        history.head, history.size = self.head, self.size
+        for name, _ in COLUMNS:
+            setattr(history, name, getattr(self, name)[:])
+        history.fits = {model_id: state[:] for model_id, state in self.fits.items()}
+        return history
+
+    def fit(self, model_id):
+        """Fit an online model over the whole history and keep its state"""
+        state = self.fits[model_id] = ONLINE_MODELS[model_id].fit(*self.window(self.size))
+        return state
+
+    def refit(self):
+        for model_id in self.fits:
+            self.fit(model_id)
+
+    def records(self):
+        """Observations as dicts, oldest first"""
+        return [
+            {
+                'date': from_day(day),
+                'demand': _number(demand),
+                'sales': _number(sales),
+                'price': _number(price),
+                'promotions': bool(promotions)
+            }
+            for day, demand, sales, price, promotions in zip(
+                *(self._tail(column, self.size) for column in self._columns())
+            )
+        ]
+
+    def to_bytes(self):
+        return b''.join(
+            [PACKED_HEADER.pack(self.size)] + [self._tail(column, self.size).tobytes() for column in self._columns()] +
+            [bytes([MODEL_CODES.index(model_id)]) + state.tobytes() for model_id, state in self.fits.items()]
+        )
+
+    @classmethod
+    def from_bytes(cls, buffer, capacity):
+        """Rebuild a `to_bytes()` history, keeping its newest `capacity` observations"""
+        history = cls(capacity)
+        size = PACKED_HEADER.unpack_from(buffer)[0]
+        start = PACKED_HEADER.size
+        for name, typecode in COLUMNS:
+            column = getattr(history, name)
+            end = start + size * column.itemsize
+            column.frombytes(buffer[start:end])
+            if size > capacity:
+                del column[:size - capacity]
+            start = end
+        history.size = min(size, capacity)
+
+        while start < len(buffer):
+            model_id = MODEL_CODES[buffer[start]]
+            state = array('d')
+            end = start + 1 + len(ONLINE_MODELS[model_id].state_fields) * state.itemsize
+            state.frombytes(buffer[start + 1:end])
+            history.fits[model_id] = state
+            start = end
+        return history
+
+    @classmethod
+    def from_records(cls, records, capacity):
+        """Build a history from record dicts (the format histories were stored in before)"""
+        history = cls(capacity)
+        for record in records:
+            history.insert(
+                to_day(record['date']), record['demand'], record.get('sales', 0),
+                record.get('price', 0), record.get('promotions', False)
+            )
+        return history
+
+
+class DemandHistoryStore:
+    """Demand histories by product id.
+
+    Histories travel between workers packed as base64 strings (see
+    `encode`/`load`). Between those full writes, only the rows appended
+    since and the fitted states are published, under the product's
+    appended-rows key. A store loaded from a snapshot keeps each history
+    as a view into the snapshot until it is first read. Writers change a
+    copy (`checkout`) and install it (`put`); a history in the store is
+    never changed in place.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.histories = {}  # product_id -> DemandHistory (or packed memoryview)
+        # product_id -> rows appended since the history was last published whole,
+        # for the products whose full publish this store has seen
+        self.appended = {}
+
+    def __len__(self):
+        return len(self.histories)
+
+    def __contains__(self, product_id):
+        return product_id in self.histories
+
+    def __iter__(self):
+        return iter(self.histories)
+
+    def get(self, product_id):
+        history = self.histories.get(product_id)
+        if type(history) is memoryview:
+            history = self.histories[product_id] = DemandHistory.from_bytes(history, self.capacity)
+        return history
+
+    def checkout(self, product_id):
+        """A private copy of a product's history to change (empty if it has none), and its appended rows"""
+        history = self.get(product_id)
+        history = history.copy() if history is not None else DemandHistory(self.capacity)
+        return history, self.appended.get(product_id)
+
+    def put(self, product_id, history, appended):
+        """Install a changed history and its appended rows; an empty history removes the product"""
+        if history.size:
+            self.histories[product_id] = history
+            self.appended[product_id] = appended
+        else:
+            self.histories.pop(product_id, None)
+            self.appended.pop(product_id, None)
+
+    @staticmethod
+    def keys(product_id):
+        """Shared-state keys a product's history is published under"""
+        return product_id, product_id + APPENDED_SUFFIX
+
+    def unfitted(self, product_ids, model_id):
+        """Those of `product_ids` with a history but no fit of `model_id`"""
+        return [
+            product_id for product_id in product_ids
+            if self.get(product_id) is not None and model_id not in self.histories[product_id].fits
+        ]
+
+    def encode(self, product_id, history, appended, rows):
+        """Shared-state entries publishing a checked-out history after `rows` went in, and its appended rows.
+
+        While the rows appended since the last full publish (`appended`,
+        None if unknown) stay within MAX_APPENDED_ROWS, only those rows,
+        the oldest day kept and the fitted states are published; otherwise
+        the whole packed history is, and the appended rows start over.
+        Rows published before it are older than the full history, so no
+        worker replays them onto it.
+        """
+        key, appended_key = self.keys(product_id)
+        if not history.size:
+            return {key: None}, None
+        if appended is not None and len(appended) + len(rows) <= MAX_APPENDED_ROWS:
+            appended = appended + [tuple(row) for row in rows]
+            return {appended_key: {
+                'rows': appended,
+                'oldest_day': history.oldest_day,
+                'fits': {model_id: state.tolist() for model_id, state in history.fits.items()}
+            }}, appended
+        return {key: base64.b64encode(history.to_bytes()).decode('ascii')}, []
+
+    def load(self, key, value):
+        """Apply a history or appended rows written by any worker"""
+        if key.endswith(APPENDED_SUFFIX):
+            self._load_appended(key[:-len(APPENDED_SUFFIX)], value)
+            return
+
+        if value is None:
+            self.histories.pop(key, None)
+            self.appended.pop(key, None)
+            return
+        if isinstance(value, list):
+            self.histories[key] = DemandHistory.from_records(value, self.capacity)
+        else:
+            self.histories[key] = DemandHistory.from_bytes(base64.b64decode(value), self.capacity)
+        self.appended[key] = []
+
+    def _load_appended(self, product_id, appended):
+        """Replay the rows appended since the last full history; rows already held are written again unchanged"""
+        history, _ = self.checkout(product_id)
+        rows = [tuple(row) for row in appended['rows']]
+        history.trim_before(appended['oldest_day'])
+        for row in rows:
+            history.insert(*row)
+        history.trim_before(appended['oldest_day'])
+        history.fits = {model_id: array('d', state) for model_id, state in appended['fits'].items()}
+        self.put(product_id, history, rows)
+
+    def copy(self):
+        """Shallow copy that stays as it is while this store takes new writes"""
+        store = DemandHistoryStore(self.capacity)
+        store.histories = dict(self.histories)
+        return store
+
+    def to_snapshot(self):
+        """Serialize every history: header, JSON product ids, padding to 8 bytes, end offsets, packed histories"""
+        product_ids = list(self.histories)
+        packed = [
+            history.tobytes() if type(history) is memoryview else history.to_bytes()
+            for history in self.histories.values()
+        ]
+        ids_json = json.dumps(product_ids).encode()
+        ends = array('Q')
+        end = 0
+        for history in packed:
+            end += len(history)
+            ends.append(end)
+        padding = b'\0' * (-(SNAPSHOT_HEADER.size + len(ids_json)) % 8)
+        return b''.join([SNAPSHOT_HEADER.pack(len(product_ids), len(ids_json)), ids_json, padding, ends.tobytes(), *packed])
+
+    def load_snapshot(self, buffer):
+        """Replace the store with a `to_snapshot()` buffer; histories are unpacked on first read"""
+        count, ids_length = SNAPSHOT_HEADER.unpack_from(buffer)
+        start = SNAPSHOT_HEADER.size
+        product_ids = json.loads(bytes(buffer[start:start + ids_length]))
+        start += ids_length + (-(SNAPSHOT_HEADER.size + ids_length) % 8)
+        ends = buffer[start:start + count * 8].cast('Q')
+        packed = buffer[start + count * 8:]
+
+        histories, begin = {}, 0
+        for product_id, end in zip(product_ids, ends):
+            histories[product_id] = packed[begin:end]
+            begin = end
+        self.histories = histories
+        self.appended = {}
+        return count
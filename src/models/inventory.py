@@ -0,0 +1,60 @@
+from src.models.user import db
+
+class Product(db.Model):
+    __tablename__ = 'products'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.String(120), unique=True, nullable=False, index=True)
+    name = db.Column(db.String(255), nullable=False)
+    sku = db.Column(db.String(120), index=True, default='')
+    unit = db.Column(db.String(40), default='units')
+    location = db.Column(db.String(120), index=True, default='main_warehouse')
+    supplier = db.Column(db.String(120), default='')
+    cost_per_unit = db.Column(db.Float, default=0)
+    current_stock = db.Column(db.Float, nullable=False, default=0)
+    min_threshold = db.Column(db.Float, nullable=False, default=0)
+    max_threshold = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(db.String(20), index=True, default='normal')
+    last_updated = db.Column(db.String(32))
+
+    def __repr__(self):
+        return f'<Product {self.product_id}>'
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'name': self.name,
+            'sku': self.sku,
+            'current_stock': self.current_stock,
+            'min_threshold': self.min_threshold,
+            'max_threshold': self.max_threshold,
+            'unit': self.unit,
+            'location': self.location,
+            'supplier': self.supplier,
+            'cost_per_unit': self.cost_per_unit,
+            'last_updated': self.last_updated,
+            'status': self.status
+        }
+
+class InventoryLevel(db.Model):
+    __tablename__ = 'inventory_levels'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'location', name='uq_inventory_levels_product_location'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.String(120), db.ForeignKey('products.product_id'), nullable=False, index=True)
+    location = db.Column(db.String(120), nullable=False, index=True)
+    quantity = db.Column(db.Float, nullable=False, default=0)
+    last_updated = db.Column(db.String(32))
+
+    def __repr__(self):
+        return f'<InventoryLevel {self.product_id}@{self.location}>'
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'location': self.location,
+            'quantity': self.quantity,
+            'last_updated': self.last_updated
+        }
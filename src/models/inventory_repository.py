@@ -0,0 +1,130 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.inventory import Product, InventoryLevel
+from src.models.inventory_store import STATUS_NAMES
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE support
+UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert
+}
+
+PRODUCT_COLUMNS = (
+    'product_id', 'name', 'sku', 'unit', 'location', 'supplier', 'cost_per_unit',
+    'current_stock', 'min_threshold', 'max_threshold', 'status', 'last_updated'
+)
+
+class InventoryRepository:
+    """Persists InventoryStore rows to the products/inventory_levels tables.
+
+    Writes are batched: every call issues one executemany upsert per table
+    (INSERT ... ON CONFLICT DO UPDATE) regardless of how many rows changed.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def save(self, store, rows, replace_levels=False):
+        """Upsert the given store rows and their per-location levels, then commit.
+
+        With replace_levels, existing level rows for these products are
+        deleted first (used when a product is re-added with a new layout).
+        """
+        if not rows:
+            return
+
+        products = [self._product_params(store, row) for row in rows]
+        levels = [
+            {
+                'product_id': store.product_ids[row],
+                'location': location,
+                'quantity': quantity,
+                'last_updated': store.last_updated[row]
+            }
+            for row in rows
+            for location, quantity in store.stock_by_location[row].items()
+        ]
+
+        session = self.db.session
+        if replace_levels:
+            session.execute(
+                InventoryLevel.__table__.delete().where(
+                    InventoryLevel.product_id.in_([params['product_id'] for params in products])
+                )
+            )
+
+        self._upsert(Product.__table__, products, ['product_id'],
+                     [column for column in PRODUCT_COLUMNS if column != 'product_id'])
+        if levels:
+            self._upsert(InventoryLevel.__table__, levels, ['product_id', 'location'],
+                         ['quantity', 'last_updated'])
+        session.commit()
+
+    def _product_params(self, store, row):
+        return {
+            'product_id': store.product_ids[row],
+            'name': store.names[row],
+            'sku': store.skus[row],
+            'unit': store.units[row],
+            'location': store.locations[row],
+            'supplier': store.suppliers[row],
+            'cost_per_unit': store.cost_per_unit[row],
+            'current_stock': store.current_stock[row],
+            'min_threshold': store.min_threshold[row],
+            'max_threshold': store.max_threshold[row],
+            'status': STATUS_NAMES[store.status[row]],
+            'last_updated': store.last_updated[row]
+        }
+
+    def _upsert(self, table, params, conflict_columns, update_columns):
+        """Run one executemany INSERT ... ON CONFLICT DO UPDATE for all params"""
+        session = self.db.session
+        insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+
+        if insert is None:
+            # No native upsert: fall back to per-row merges
+            model = Product if table is Product.__table__ else InventoryLevel
+            for values in params:
+                existing = model.query.filter_by(
+                    **{column: values[column] for column in conflict_columns}
+                ).first()
+                if existing is None:
+                    session.add(model(**values))
+                else:
+                    for column in update_columns:
+                        setattr(existing, column, values[column])
+            return
+
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={column: stmt.excluded[column] for column in update_columns}
+        )
+        session.execute(stmt, params)
+
+    def load_into(self, store):
+        """Rebuild an InventoryStore from the database, returning the number of products loaded"""
+        levels = {}
+        for level in InventoryLevel.query.order_by(InventoryLevel.id):
+            levels.setdefault(level.product_id, {})[level.location] = level.quantity
+
+        count = 0
+        for product in Product.query.order_by(Product.id):
+            product_levels = levels.get(product.product_id)
+            row = store.upsert(
+                product.product_id,
+                product.name,
+                0 if product_levels else product.current_stock,
+                product.min_threshold,
+                product.max_threshold,
+                sku=product.sku or '',
+                unit=product.unit or 'units',
+                location=product.location or 'main_warehouse',
+                supplier=product.supplier or '',
+                cost_per_unit=product.cost_per_unit or 0,
+                last_updated=product.last_updated or ''
+            )
+            if product_levels:
+                store.set_location_stock(row, product_levels, product.last_updated or '')
+            count += 1
+
+        return count
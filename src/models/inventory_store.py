@@ -0,0 +1,465 @@
+from array import array
+import heapq
+import json
+import struct
+import sys
+import numpy as np
+
+# Stock status codes stored in the status column
+NORMAL = 0
+STOCKOUT = 1
+OVERSTOCK = 2
+STATUS_NAMES = ('normal', 'stockout', 'overstock')
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# Fields every serialized product carries, in serialization order
+PRODUCT_FIELDS = (
+    'product_id', 'name', 'sku', 'current_stock', 'min_threshold', 'max_threshold',
+    'unit', 'location', 'supplier', 'cost_per_unit', 'last_updated', 'status'
+)
+
+# Snapshot layout: typed columns as raw bytes, then JSON-encoded string
+# columns, per-location stock and extras, in this order
+SNAPSHOT_ARRAYS = ('current_stock', 'min_threshold', 'max_threshold', 'cost_per_unit', 'status')
+SNAPSHOT_STRINGS = ('product_ids', 'names', 'skus', 'units', 'locations', 'suppliers', 'last_updated')
+SNAPSHOT_PARTS = len(SNAPSHOT_ARRAYS) + len(SNAPSHOT_STRINGS) + 2
+SNAPSHOT_OFFSETS = struct.Struct(f'<{SNAPSHOT_PARTS + 1}Q')
+
+
+def stock_status_code(current_stock, min_threshold, max_threshold):
+    """Classify a single stock level against its thresholds"""
+    if current_stock <= min_threshold:
+        return STOCKOUT
+    elif current_stock >= max_threshold:
+        return OVERSTOCK
+    else:
+        return NORMAL
+
+
+def stock_status_codes(current_stock, min_threshold, max_threshold):
+    """Classify stock levels against their thresholds, given as NumPy arrays, in one vectorized pass"""
+    return np.select(
+        [current_stock <= min_threshold, current_stock >= max_threshold], [STOCKOUT, OVERSTOCK], NORMAL
+    ).astype(np.int8)
+
+
+def _json_number(value):
+    """Return whole floats as ints so serialized products keep their original shape"""
+    return int(value) if value.is_integer() else value
+
+
+def _move(index, old_key, new_key, row):
+    """Move a row between keys of a value -> rows index"""
+    if old_key == new_key:
+        return
+    rows = index[old_key]
+    rows.discard(row)
+    if not rows:
+        del index[old_key]
+    index.setdefault(new_key, set()).add(row)
+
+
+class InventoryStore:
+    """Columnar, array-backed storage for tracked inventory products.
+
+    Each product occupies one row across a set of typed arrays (numbers and
+    status codes) and interned string columns. Dicts are only built when a
+    product is serialized.
+    """
+
+    def __init__(self):
+        self.index = {}  # product_id -> row
+        self.product_ids = []
+        self.names = []
+        self.skus = []
+        self.units = []
+        self.locations = []
+        self.suppliers = []
+        self.last_updated = []
+        self.current_stock = array('d')
+        self.min_threshold = array('d')
+        self.max_threshold = array('d')
+        self.cost_per_unit = array('d')
+        self.status = array('b')
+        # Sparse per-product fields (demand forecasts, recommended stock, ...)
+        self.extras = {}
+        # Per-(product, location) stock matrix; current_stock holds each row's total
+        self.stock_by_location = []  # row -> {location: quantity}
+        # Location roll-ups, adjusted by the delta of every cell write
+        self.location_totals = {}  # location -> units
+        self.location_values = {}  # location -> units * cost_per_unit
+        # Secondary indexes kept in step with every write: status buckets,
+        # location -> rows stocked there, supplier -> rows
+        self.by_status = tuple(set() for _ in STATUS_NAMES)
+        self.by_location = {}
+        self.by_supplier = {}
+        # Per-field readers used for projected serialization
+        self._readers = {
+            'product_id': lambda row: self.product_ids[row],
+            'name': lambda row: self.names[row],
+            'sku': lambda row: self.skus[row],
+            'current_stock': lambda row: _json_number(self.current_stock[row]),
+            'min_threshold': lambda row: _json_number(self.min_threshold[row]),
+            'max_threshold': lambda row: _json_number(self.max_threshold[row]),
+            'unit': lambda row: self.units[row],
+            'location': lambda row: self.locations[row],
+            'supplier': lambda row: self.suppliers[row],
+            'cost_per_unit': lambda row: _json_number(self.cost_per_unit[row]),
+            'last_updated': lambda row: self.last_updated[row],
+            'status': lambda row: STATUS_NAMES[self.status[row]],
+            'stock_by_location': lambda row: {
+                location: _json_number(float(quantity))
+                for location, quantity in self.stock_by_location[row].items()
+            }
+        }
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def __contains__(self, product_id):
+        return product_id in self.index
+
+    def row(self, product_id):
+        """Get the row number for a product, or None if it is not tracked"""
+        return self.index.get(product_id)
+
+    def upsert(self, product_id, name, current_stock, min_threshold, max_threshold,
+               sku='', unit='units', location='main_warehouse', supplier='',
+               cost_per_unit=0, last_updated=''):
+        """Insert or fully replace a product, returning its row"""
+        row = self.index.get(product_id)
+        values = (sys.intern(str(name)), sys.intern(str(sku)), sys.intern(str(unit)),
+                  sys.intern(str(location)), sys.intern(str(supplier)))
+        code = stock_status_code(current_stock, min_threshold, max_threshold)
+
+        if row is None:
+            row = len(self.product_ids)
+            self.product_ids.append(sys.intern(str(product_id)))
+            self.names.append(values[0])
+            self.skus.append(values[1])
+            self.units.append(values[2])
+            self.locations.append(values[3])
+            self.suppliers.append(values[4])
+            self.last_updated.append(last_updated)
+            self.current_stock.append(current_stock)
+            self.min_threshold.append(min_threshold)
+            self.max_threshold.append(max_threshold)
+            self.cost_per_unit.append(cost_per_unit)
+            self.status.append(code)
+            self.stock_by_location.append({})
+            self.index[self.product_ids[row]] = row
+            self.by_status[code].add(row)
+            self.by_supplier.setdefault(values[4], set()).add(row)
+        else:
+            self._clear_cells(row)
+            _move(self.by_supplier, self.suppliers[row], values[4], row)
+            self._restatus(row, code)
+            (self.names[row], self.skus[row], self.units[row],
+             self.locations[row], self.suppliers[row]) = values
+            self.last_updated[row] = last_updated
+            self.current_stock[row] = current_stock
+            self.min_threshold[row] = min_threshold
+            self.max_threshold[row] = max_threshold
+            self.cost_per_unit[row] = cost_per_unit
+            self.extras.pop(row, None)
+
+        # All of a newly upserted product's stock sits at its primary location
+        self._set_cell(row, values[3], current_stock)
+        return row
+
+    def load_record(self, record):
+        """Insert or fully replace a product from its serialized dict, returning its row.
+
+        `record` is a full `materialize()` dict plus `stock_by_location`;
+        keys outside PRODUCT_FIELDS are restored as extras.
+        """
+        levels = record.get('stock_by_location')
+        row = self.upsert(
+            record['product_id'],
+            record['name'],
+            0 if levels else record['current_stock'],
+            record['min_threshold'],
+            record['max_threshold'],
+            sku=record.get('sku', ''),
+            unit=record.get('unit', 'units'),
+            location=record.get('location', 'main_warehouse'),
+            supplier=record.get('supplier', ''),
+            cost_per_unit=record.get('cost_per_unit', 0),
+            last_updated=record.get('last_updated', '')
+        )
+        if levels:
+            self.set_location_stock(row, levels, record.get('last_updated', ''))
+
+        extras = {
+            key: value for key, value in record.items()
+            if key not in PRODUCT_FIELDS and key != 'stock_by_location'
+        }
+        if extras:
+            self.extras[row] = extras
+        return row
+
+    def to_snapshot(self):
+        """Serialize the whole store to bytes for a state snapshot"""
+        parts = [getattr(self, name).tobytes() for name in SNAPSHOT_ARRAYS]
+        parts += [json.dumps(getattr(self, name)).encode() for name in SNAPSHOT_STRINGS]
+        parts.append(json.dumps(self.stock_by_location).encode())
+        parts.append(json.dumps({str(row): extra for row, extra in self.extras.items()}, default=str).encode())
+
+        offsets = [0]
+        for part in parts:
+            offsets.append(offsets[-1] + len(part))
+        return b''.join([SNAPSHOT_OFFSETS.pack(*offsets), *parts])
+
+    def load_snapshot(self, buffer):
+        """Replace the contents of the store with a `to_snapshot()` buffer, returning the row count.
+
+        Typed columns are copied straight from the buffer; the secondary
+        indexes and location roll-ups are rebuilt in one pass.
+        """
+        offsets = SNAPSHOT_OFFSETS.unpack_from(buffer)
+        base = SNAPSHOT_OFFSETS.size
+        parts = [buffer[base + start:base + end] for start, end in zip(offsets, offsets[1:])]
+
+        for name, part in zip(SNAPSHOT_ARRAYS, parts):
+            column = array(getattr(self, name).typecode)
+            column.frombytes(part)
+            setattr(self, name, column)
+        for name, part in zip(SNAPSHOT_STRINGS, parts[len(SNAPSHOT_ARRAYS):]):
+            values = json.loads(bytes(part))
+            setattr(self, name, values if name == 'last_updated' else list(map(sys.intern, values)))
+        self.stock_by_location = [
+            {sys.intern(location): quantity for location, quantity in cells.items()}
+            for cells in json.loads(bytes(parts[-2]))
+        ]
+        self.extras = {int(row): extra for row, extra in json.loads(bytes(parts[-1])).items()}
+
+        self.index = {product_id: row for row, product_id in enumerate(self.product_ids)}
+        self.by_status = tuple(set() for _ in STATUS_NAMES)
+        self.by_supplier, self.by_location = {}, {}
+        self.location_totals, self.location_values = {}, {}
+        for row, (code, supplier, cells, cost) in enumerate(
+                zip(self.status, self.suppliers, self.stock_by_location, self.cost_per_unit)):
+            self.by_status[code].add(row)
+            self.by_supplier.setdefault(supplier, set()).add(row)
+            for location, quantity in cells.items():
+                self.by_location.setdefault(location, set()).add(row)
+                self.location_totals[location] = self.location_totals.get(location, 0) + quantity
+                self.location_values[location] = self.location_values.get(location, 0) + quantity * cost
+
+        return len(self.product_ids)
+
+    def _set_cell(self, row, location, quantity):
+        """Set one (product, location) quantity and roll the delta into the location aggregates"""
+        cells = self.stock_by_location[row]
+        old = cells.get(location)
+        if old is None:
+            location = sys.intern(str(location))
+            self.by_location.setdefault(location, set()).add(row)
+            old = 0
+
+        cells[location] = quantity
+        delta = quantity - old
+        self.location_totals[location] = self.location_totals.get(location, 0) + delta
+        self.location_values[location] = (
+            self.location_values.get(location, 0) + delta * self.cost_per_unit[row]
+        )
+        return delta
+
+    def _clear_cells(self, row):
+        """Remove a product from every location, backing its stock out of the aggregates"""
+        cost = self.cost_per_unit[row]
+        for location, quantity in self.stock_by_location[row].items():
+            self.location_totals[location] -= quantity
+            self.location_values[location] -= quantity * cost
+            rows = self.by_location[location]
+            rows.discard(row)
+            if not rows:
+                del self.by_location[location]
+                del self.location_totals[location]
+                del self.location_values[location]
+        self.stock_by_location[row] = {}
+
+    def _set_total(self, row, current_stock):
+        """Set a product's total stock; the primary location absorbs the difference"""
+        primary = self.locations[row]
+        delta = current_stock - self.current_stock[row]
+        self._set_cell(row, primary, self.stock_by_location[row].get(primary, 0) + delta)
+        self.current_stock[row] = current_stock
+
+    def _set_locations(self, row, quantities):
+        """Set per-location quantities for a product and update its total incrementally"""
+        for location, quantity in quantities.items():
+            self.current_stock[row] += self._set_cell(row, location, quantity)
+
+    def set_location_stock(self, row, quantities, last_updated):
+        """Write location-scoped quantities for one row and reclassify it"""
+        self._set_locations(row, quantities)
+        self.last_updated[row] = last_updated
+        self.classify([row])
+
+    def update(self, row, last_updated, current_stock=None, min_threshold=None, max_threshold=None):
+        """Update stock levels/thresholds for one row and reclassify it"""
+        if current_stock is not None:
+            self._set_total(row, current_stock)
+        if min_threshold is not None:
+            self.min_threshold[row] = min_threshold
+        if max_threshold is not None:
+            self.max_threshold[row] = max_threshold
+
+        self.last_updated[row] = last_updated
+        self._restatus(row, stock_status_code(
+            self.current_stock[row], self.min_threshold[row], self.max_threshold[row]
+        ))
+
+    def _restatus(self, row, code):
+        """Set a row's status code, moving it between status buckets if it changed"""
+        old = self.status[row]
+        if old != code:
+            self.by_status[old].discard(row)
+            self.by_status[code].add(row)
+            self.status[row] = code
+
+    def bulk_update(self, rows, stocks, last_updated, location_stocks=None):
+        """Write stock levels for many rows and reclassify them in one pass.
+
+        A stock value of None leaves that row's total unchanged. Rows present
+        in `location_stocks` ({row: {location: quantity}}) get location-scoped
+        writes instead. Returns the status codes the rows had before the update.
+        """
+        previous = [self.status[row] for row in rows]
+        location_stocks = location_stocks or {}
+        updated = self.last_updated
+
+        for row, value in zip(rows, stocks):
+            if row in location_stocks:
+                self._set_locations(row, location_stocks[row])
+            elif value is not None:
+                self._set_total(row, value)
+            updated[row] = last_updated
+
+        self.classify(rows)
+        return previous
+
+    def classify(self, rows=None):
+        """Recompute stock status for the given rows (default: whole catalogue) in one pass.
+
+        Returns the status column as it was before a whole-catalogue pass.
+        """
+        stock = np.frombuffer(self.current_stock, dtype=np.float64)
+        low = np.frombuffer(self.min_threshold, dtype=np.float64)
+        high = np.frombuffer(self.max_threshold, dtype=np.float64)
+        previous = self.status
+
+        if rows is None:
+            codes = stock_status_codes(stock, low, high)
+            self.status = array('b', codes.tobytes())
+            self.by_status = tuple(set(np.flatnonzero(codes == code).tolist()) for code in range(len(STATUS_NAMES)))
+        else:
+            rows = np.asarray(rows, dtype=np.intp)
+            codes = stock_status_codes(stock[rows], low[rows], high[rows])
+            moved = codes != np.frombuffer(self.status, dtype=np.int8)[rows]
+            restatus = self._restatus
+            for row, code in zip(rows[moved].tolist(), codes[moved].tolist()):
+                restatus(row, code)
+
+        return previous
+
+    def set_extra(self, row, key, value):
+        """Attach a sparse field (e.g. demand_forecast) to a product"""
+        self.extras.setdefault(row, {})[key] = value
+
+    def set_extras_bulk(self, rows, key, values):
+        """Attach one sparse field to many rows in one pass"""
+        extras = self.extras
+        for row, value in zip(rows, values):
+            extras.setdefault(row, {})[key] = value
+
+    def location_summary(self):
+        """Get stock, value and product count per location from the maintained roll-ups"""
+        return [
+            {
+                'location': location,
+                'total_stock': _json_number(round(float(self.location_totals[location]), 6)),
+                'total_value': round(self.location_values[location], 2),
+                'product_count': len(rows)
+            }
+            for location, rows in self.by_location.items()
+        ]
+
+    def status_counts(self):
+        """Get the number of products in each status bucket"""
+        return {name: len(bucket) for name, bucket in zip(STATUS_NAMES, self.by_status)}
+
+    def scan(self, start=0, limit=None, status=None, location=None, supplier=None):
+        """Find matching rows in row order starting at `start`.
+
+        Filters are answered from the secondary indexes, starting from the
+        smallest matching bucket. Returns (rows, next_row) where next_row is
+        the first matching row after the page, or None when there are no more.
+        """
+        start = max(start, 0)
+        buckets = []
+        if status is not None:
+            buckets.append(self.by_status[STATUS_CODES[status]])
+        if location is not None:
+            buckets.append(self.by_location.get(location, set()))
+        if supplier is not None:
+            buckets.append(self.by_supplier.get(supplier, set()))
+
+        if not buckets:
+            end = len(self.product_ids)
+            if limit is None or start + limit >= end:
+                return list(range(start, end)), None
+            return list(range(start, start + limit)), start + limit
+
+        buckets.sort(key=len)
+        smallest, others = buckets[0], buckets[1:]
+        matches = (
+            row for row in smallest
+            if row >= start and all(row in bucket for bucket in others)
+        )
+
+        if limit is None:
+            return sorted(matches), None
+        page = heapq.nsmallest(limit + 1, matches)
+        if len(page) > limit:
+            return page[:limit], page[limit]
+        return page, None
+
+    def materialize(self, row, fields=None):
+        """Build the serialized dict for one row, optionally projected to `fields`"""
+        if fields is not None:
+            readers, extras = self._readers, self.extras.get(row, {})
+            return {
+                field: readers[field](row) if field in readers else extras.get(field)
+                for field in fields
+            }
+
+        product = {
+            'product_id': self.product_ids[row],
+            'name': self.names[row],
+            'sku': self.skus[row],
+            'current_stock': _json_number(self.current_stock[row]),
+            'min_threshold': _json_number(self.min_threshold[row]),
+            'max_threshold': _json_number(self.max_threshold[row]),
+            'unit': self.units[row],
+            'location': self.locations[row],
+            'supplier': self.suppliers[row],
+            'cost_per_unit': _json_number(self.cost_per_unit[row]),
+            'last_updated': self.last_updated[row],
+            'status': STATUS_NAMES[self.status[row]]
+        }
+        if row in self.extras:
+            product.update(self.extras[row])
+        return product
+
+    def get(self, product_id):
+        """Get the serialized dict for a product, or None if it is not tracked"""
+        row = self.index.get(product_id)
+        return None if row is None else self.materialize(row)
+
+    def records(self, rows=None, fields=None):
+        """Serialize the given rows (default: whole catalogue) in row order"""
+        if rows is None:
+            rows = range(len(self.product_ids))
+        return [self.materialize(row, fields) for row in rows]
@@ -0,0 +1,324 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+import logging
+import os
+import threading
+import time
+import uuid
+from src.models.shared_state import SharedDict
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+PUBLISH_INTERVAL = 0.25  # seconds between shared progress updates of a running job
+
+
+def owner_exited(record):
+    """Whether the worker owning an unfinished shared job record has exited"""
+    if record['status'] in FINISHED_STATES or record.get('owner_pid') is None:
+        return False
+    try:
+        os.kill(record['owner_pid'], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:  # alive, owned by another user
+        pass
+    return False
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation has been requested"""
+
+
+class Job:
+    """One unit of background work and its observable progress"""
+
+    def __init__(self, job_type, payload):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.payload = payload
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created_date = datetime.utcnow().isoformat()
+        self.started_date = None
+        self.finished_date = None
+        self.future = None
+        self.queue = None
+        self._cancel = threading.Event()
+        self._published_at = 0.0
+
+    @classmethod
+    def from_dict(cls, record):
+        """Read-only view of a job owned by another worker (its result is fetched separately)"""
+        job = cls.__new__(cls)
+        job.job_id = record['job_id']
+        job.job_type = record['type']
+        job.payload = None
+        for field in ('status', 'progress', 'message', 'error', 'created_date', 'started_date', 'finished_date'):
+            setattr(job, field, record[field])
+        job.result = None
+        job.future = job.queue = None
+        job._cancel = threading.Event()
+        if record.get('cancel_requested'):
+            job._cancel.set()
+        job._published_at = 0.0
+        return job
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def report(self, progress, message=None):
+        """Publish progress (0-1); raises JobCancelled if the job was cancelled meanwhile"""
+        self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        if self.queue is not None:
+            self.queue._progress(self)
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def to_dict(self, include_result=False):
+        job = {
+            'job_id': self.job_id,
+            'type': self.job_type,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'message': self.message,
+            'error': self.error,
+            'created_date': self.created_date,
+            'started_date': self.started_date,
+            'finished_date': self.finished_date
+        }
+        if include_result:
+            job['result'] = self.result
+        return job
+
+
+class JobQueue:
+    """In-process background job queue with a bounded worker pool per job type.
+
+    Runners are registered per job type as `runner(job, payload)` and run on
+    that type's own thread pool, so `concurrency` caps how many jobs of the
+    type run at once while the rest wait in order. Finished jobs are kept
+    for polling until `retention` newer jobs push them out.
+
+    Once `share()` is called, job records are also published to shared
+    state, so any worker can report on (and cancel) any worker's jobs.
+    Results are published apart from the records, so listing jobs never
+    decodes them. Unfinished jobs whose owning worker has exited are
+    reported (and recorded) as failed. The shared records are held to the
+    same retention as each worker's own jobs.
+    """
+
+    def __init__(self, retention=1000):
+        self.retention = retention
+        self.app = None
+        self.shared = None
+        self.cancellations = None
+        self.results = None
+        self._runners = {}
+        self._executors = {}
+        self._limits = {}
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Run jobs inside this Flask app's context"""
+        self.app = app
+
+    def share(self, state):
+        """Publish job records through a SharedState"""
+        self.shared = SharedDict(state, 'jobs')
+        self.cancellations = SharedDict(state, 'job_cancellations')
+        self.results = SharedDict(state, 'job_results')
+
+    def _publish(self, job):
+        if self.shared is None:
+            return
+        record = job.to_dict()
+        record['cancel_requested'] = job.cancel_requested
+        record['owner_pid'] = os.getpid()
+        self.shared[job.job_id] = record
+        job._published_at = time.monotonic()
+
+    def _progress(self, job):
+        """Called from Job.report(): throttled publish plus cross-worker cancellation check"""
+        if self.shared is None:
+            return
+        if job.job_id in self.cancellations:
+            job._cancel.set()
+        if time.monotonic() - job._published_at >= PUBLISH_INTERVAL:
+            self._publish(job)
+
+    def register(self, job_type, runner, concurrency=1):
+        self._runners[job_type] = runner
+        self._limits[job_type] = concurrency
+        self._executors[job_type] = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=f'job-{job_type}'
+        )
+
+    @property
+    def job_types(self):
+        return list(self._runners)
+
+    def submit(self, job_type, payload=None):
+        """Queue a job and return it immediately"""
+        if job_type not in self._runners:
+            raise ValueError(f'Unknown job type: {job_type}')
+
+        job = Job(job_type, payload or {})
+        job.queue = self
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._evict()
+        if self.shared is not None:
+            self._evict_shared()
+        self._publish(job)
+        job.future = self._executors[job_type].submit(self._run, job)
+        return job
+
+    def _evict(self):
+        """Drop the oldest finished jobs beyond the retention limit"""
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:excess]:
+            del self._jobs[job_id]
+            if self.shared is not None:
+                self.shared.pop(job_id, None)
+                self.cancellations.pop(job_id, None)
+                self.results.pop(job_id, None)
+
+    def _evict_shared(self):
+        """Drop the oldest finished shared records beyond the retention limit, whichever worker (or orphan) left them"""
+        if len(self.shared) < self.retention:
+            return
+        with self.shared.exclusive():
+            records = self._fail_orphans(dict(self.shared.items()))
+            excess = len(records) + 1 - self.retention  # leave room for the job being submitted
+            finished = sorted(
+                (record['created_date'], job_id) for job_id, record in records.items()
+                if record['status'] in FINISHED_STATES
+            )
+            for _, job_id in finished[:max(excess, 0)]:
+                self.shared.pop(job_id, None)
+                self.cancellations.pop(job_id, None)
+                self.results.pop(job_id, None)
+
+    def _run(self, job):
+        if self.shared is not None and job.job_id in self.cancellations:
+            job._cancel.set()
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+
+        job.status = RUNNING
+        job.started_date = datetime.utcnow().isoformat()
+        self._publish(job)
+        try:
+            with self.app.app_context() if self.app is not None else nullcontext():
+                job.result = self._runners[job.job_type](job, job.payload)
+            job.progress = 1.0
+            self._finish(job, SUCCEEDED)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} ({job.job_type}) failed: {str(e)}")
+            job.error = str(e)
+            self._finish(job, FAILED)
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_date = datetime.utcnow().isoformat()
+        if self.shared is not None and status == SUCCEEDED:
+            self.results[job.job_id] = job.result  # before the record, so a reader seeing success finds it
+        self._publish(job)
+
+    def _fail_orphans(self, records):
+        """Record as failed the shared jobs (job_id -> record) whose owning worker exited; returns the records as now stored"""
+        orphans = [job_id for job_id, record in records.items() if owner_exited(record)]
+        if not orphans:
+            return records
+        with self.shared.exclusive():
+            for job_id in orphans:
+                record = self.shared.get(job_id)
+                if record is not None and owner_exited(record):
+                    record = dict(
+                        record, status=FAILED, finished_date=datetime.utcnow().isoformat(),
+                        error=f"Worker {record['owner_pid']} exited before the job finished"
+                    )
+                    self.shared[job_id] = record
+                records[job_id] = record
+        return {job_id: record for job_id, record in records.items() if record is not None}
+
+    def get(self, job_id, include_result=False):
+        job = self._jobs.get(job_id)
+        if job is None and self.shared is not None:
+            record = self.shared.get(job_id)
+            if record is not None:
+                record = self._fail_orphans({job_id: record}).get(job_id)
+            job = Job.from_dict(record) if record else None
+            if job is not None and include_result and job.status == SUCCEEDED:
+                job.result = self.results.get(job_id)
+        return job
+
+    def _all_jobs(self):
+        """This worker's jobs plus (when shared) views of every other worker's, oldest first"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        if self.shared is not None:
+            local = {job.job_id for job in jobs}
+            records = self._fail_orphans({job_id: record for job_id, record in self.shared.items() if job_id not in local})
+            jobs += [Job.from_dict(record) for record in records.values()]
+            jobs.sort(key=lambda job: job.created_date)
+        return jobs
+
+    def jobs(self, status=None, job_type=None):
+        """List retained jobs, newest first"""
+        return [
+            job for job in reversed(self._all_jobs())
+            if (status is None or job.status == status) and (job_type is None or job.job_type == job_type)
+        ]
+
+    def cancel(self, job_id):
+        """Request cancellation; queued jobs are dropped, running ones stop at their next report()"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        job._cancel.set()
+        if job.job_id not in self._jobs:
+            # Owned by another worker, which picks the flag up at its next report()
+            self.cancellations[job_id] = True
+            return job
+        if job.future is not None and job.future.cancel():
+            self._finish(job, CANCELLED)
+        else:
+            self._publish(job)
+        return job
+
+    def stats(self):
+        jobs = self._all_jobs()
+        stats = {
+            job_type: {'concurrency': limit, QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, CANCELLED: 0}
+            for job_type, limit in self._limits.items()
+        }
+        for job in jobs:
+            if job.job_type in stats:
+                stats[job.job_type][job.status] += 1
+        return stats
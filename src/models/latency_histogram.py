@@ -0,0 +1,67 @@
+from bisect import bisect_left
+import threading
+
+# Upper bucket bounds in milliseconds; anything slower lands in the overflow bucket
+DEFAULT_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram.
+
+    Observations are counted into buckets by upper bound, so memory is
+    constant no matter how many are recorded. Quantiles are estimated as
+    the upper bound of the bucket containing them.
+    """
+
+    def __init__(self, bounds=DEFAULT_BOUNDS_MS):
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, duration_ms):
+        bucket = bisect_left(self.bounds, duration_ms)
+        with self._lock:
+            self.buckets[bucket] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            if duration_ms > self.max_ms:
+                self.max_ms = duration_ms
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0-1) as a bucket upper bound"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max_ms
+
+    def cumulative(self):
+        """Bucket counts as cumulative (<= bound) totals, overflow last"""
+        total = 0
+        counts = []
+        for count in self.buckets:
+            total += count
+            counts.append(total)
+        return counts
+
+    def to_dict(self):
+        cumulative = self.cumulative()
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': [
+                {'le': bound, 'count': count}
+                for bound, count in zip(self.bounds + ('inf',), cumulative)
+            ]
+        }
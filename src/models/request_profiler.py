@@ -0,0 +1,108 @@
+import cProfile
+import itertools
+import os
+import pstats
+import threading
+import time
+
+# Call-stat columns a profile can be sorted by
+SORT_KEYS = ('cumtime_ms', 'tottime_ms', 'calls', 'primitive_calls')
+
+
+def call_stats(profiler):
+    """Flatten a finished cProfile run into one row per function"""
+    return [
+        {
+            'function': name,
+            'file': filename,
+            'line': line,
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'tottime_ms': round(tottime * 1000, 4),
+            'cumtime_ms': round(cumtime * 1000, 4)
+        }
+        for (filename, line, name), (primitive_calls, calls, tottime, cumtime, _)
+        in pstats.Stats(profiler).stats.items()
+    ]
+
+
+class ProfileBuffer:
+    """Keeps the `capacity` slowest request profiles seen so far.
+
+    Profiles live in `store` (a dict by default; pass a SharedDict to pool
+    them across workers), keyed by an id unique across processes. A new
+    profile only displaces the fastest retained one, and is only turned
+    into call stats once it is known to qualify.
+    """
+
+    def __init__(self, capacity=20, store=None):
+        self.capacity = capacity
+        self.store = {} if store is None else store
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin profiling the calling thread and return the profiler.
+
+        Returns None if another profiler is already active; from Python 3.12
+        only one can run per process.
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        return profiler
+
+    def _fastest(self):
+        return min(self.store.values(), key=lambda profile: profile['duration_ms'], default=None)
+
+    def qualifies(self, duration_ms):
+        if len(self.store) < self.capacity:
+            return True
+        fastest = self._fastest()
+        return fastest is None or duration_ms > fastest['duration_ms']
+
+    def add(self, profiler, duration_ms, **details):
+        """Keep a finished profile if it is among the slowest; returns its id or None"""
+        profiler.disable()
+        if not self.qualifies(duration_ms):
+            return None
+        stats = call_stats(profiler)
+
+        with self._lock:
+            profile_id = f'{os.getpid()}-{next(self._ids)}'
+            while len(self.store) >= self.capacity:
+                fastest = self._fastest()
+                if fastest['duration_ms'] >= duration_ms:
+                    return None
+                del self.store[fastest['profile_id']]
+            self.store[profile_id] = {
+                'profile_id': profile_id,
+                'duration_ms': round(duration_ms, 3),
+                'captured': time.time(),
+                'pid': os.getpid(),
+                'function_count': len(stats),
+                **details,
+                'stats': stats
+            }
+        return profile_id
+
+    def summaries(self):
+        """Retained profiles without their call stats, slowest first"""
+        return sorted(
+            ({key: value for key, value in profile.items() if key != 'stats'} for profile in self.store.values()),
+            key=lambda profile: profile['duration_ms'], reverse=True
+        )
+
+    def get(self, profile_id, sort='cumtime_ms', limit=None):
+        """A profile with its call stats sorted descending by `sort`, or None"""
+        profile = self.store.get(profile_id)
+        if profile is None:
+            return None
+        stats = sorted(profile['stats'], key=lambda row: row[sort], reverse=True)
+        return {**profile, 'stats': stats[:limit] if limit else stats}
+
+    def clear(self):
+        for profile_id in list(self.store):
+            del self.store[profile_id]
@@ -0,0 +1,477 @@
+from array import array
+from collections import deque
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import uuid
+
+MAX_NAMESPACES = 256
+COUNTER = struct.Struct('<Q')
+SEQUENCE_KEY_WIDTH = 20  # zero-padded so log keys sort numerically
+# SharedDict snapshot section: entry count, length of the JSON key list
+DICT_SNAPSHOT_HEADER = struct.Struct('<QQ')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS namespaces (
+    name TEXT PRIMARY KEY,
+    slot INTEGER NOT NULL UNIQUE,
+    version INTEGER NOT NULL DEFAULT 0,
+    sequence INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    value TEXT,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS ix_entries_namespace_version ON entries (namespace, version);
+"""
+
+
+class SharedState:
+    """Key/value state shared by every worker process on a host.
+
+    Data lives in a SQLite database in WAL mode. Each namespace has a
+    version that every write bumps; the keys written are stamped with it,
+    so readers fetch only what changed since the version they last saw.
+    Versions are mirrored into a memory-mapped counter file, which lets a
+    reader check whether its cached copy is stale with one 8-byte read.
+    The counter moves before the write commits, so it only says that
+    something changed; what a reader has applied is its replica's `seen`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counters_path = f'{path}.versions'
+        self.state_id = None
+        self.replicas = {}  # namespace -> replica created in this process
+        self._slots = {}
+        self._counters = None
+        self._local = threading.local()
+        self._open_lock = threading.Lock()
+
+    def _connection(self):
+        # Connections are per thread and never cross a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def open(self):
+        """Create the database and counter file if needed; safe to call repeatedly"""
+        if self._counters is not None:
+            return
+        with self._open_lock:
+            if self._counters is not None:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = self._connection()
+            connection.executescript(SCHEMA)
+
+            size = COUNTER.size * MAX_NAMESPACES
+            fd = os.open(self.counters_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                counters = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+            with self._transaction(connection):
+                connection.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('state_id', uuid.uuid4().hex))
+                self.state_id = connection.execute("SELECT value FROM meta WHERE key = 'state_id'").fetchone()[0]
+                # Re-sync counters from the database (the counter file may be new)
+                for slot, version in connection.execute('SELECT slot, version FROM namespaces'):
+                    COUNTER.pack_into(counters, slot * COUNTER.size, version)
+            self._counters = counters
+
+    @contextmanager
+    def _transaction(self, connection):
+        """BEGIN IMMEDIATE ... COMMIT; serializes writers across processes.
+
+        Nested use on the same connection joins the outer transaction.
+        """
+        if connection.in_transaction:
+            yield connection
+            return
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def locked(self):
+        """Hold the cross-process write lock; writes made inside commit together on exit"""
+        self.open()
+        return self._transaction(self._connection())
+
+    def _slot(self, namespace):
+        slot = self._slots.get(namespace)
+        if slot is not None:
+            return slot
+        self.open()
+        connection = self._connection()
+        with self._transaction(connection):
+            row = connection.execute('SELECT slot FROM namespaces WHERE name = ?', (namespace,)).fetchone()
+            if row is None:
+                slot = connection.execute('SELECT COUNT(*) FROM namespaces').fetchone()[0]
+                if slot >= MAX_NAMESPACES:
+                    raise ValueError(f'Shared state supports at most {MAX_NAMESPACES} namespaces')
+                connection.execute('INSERT INTO namespaces (name, slot) VALUES (?, ?)', (namespace, slot))
+            else:
+                slot = row[0]
+        self._slots[namespace] = slot
+        return slot
+
+    def version(self, namespace):
+        """Latest version of a namespace, read from shared memory"""
+        slot = self._slot(namespace)
+        return COUNTER.unpack_from(self._counters, slot * COUNTER.size)[0]
+
+    def write(self, namespace, entries):
+        """Write {key: value} (None deletes) as one new version and return it"""
+        slot = self._slot(namespace)
+        connection = self._connection()
+        with self._transaction(connection):
+            version = self._bump(connection, namespace)
+            connection.executemany(
+                'INSERT INTO entries (namespace, key, version, value) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (namespace, key) DO UPDATE SET version = excluded.version, value = excluded.value',
+                [
+                    (namespace, key, version, None if value is None else json.dumps(value, default=str))
+                    for key, value in entries.items()
+                ]
+            )
+            # Published inside the write lock so the counter only ever moves forward;
+            # a reader that sees it early just finds nothing new until the commit lands,
+            # so nothing may treat the counter as committed (see SharedNamespace.version)
+            COUNTER.pack_into(self._counters, slot * COUNTER.size, version)
+        return version
+
+    def append(self, namespace, values, retain=None):
+        """Append values under consecutive sequence numbers as one new version.
+
+        Entries older than the newest `retain` are deleted. Returns the
+        sequence number of the first appended value.
+        """
+        slot = self._slot(namespace)
+        connection = self._connection()
+        with self._transaction(connection):
+            version = self._bump(connection, namespace)
+            start = connection.execute(
+                'SELECT sequence FROM namespaces WHERE name = ?', (namespace,)
+            ).fetchone()[0]
+            connection.executemany(
+                'INSERT INTO entries (namespace, key, version, value) VALUES (?, ?, ?, ?)',
+                [
+                    (namespace, str(start + offset).zfill(SEQUENCE_KEY_WIDTH), version, json.dumps(value, default=str))
+                    for offset, value in enumerate(values)
+                ]
+            )
+            end = start + len(values)
+            connection.execute('UPDATE namespaces SET sequence = ? WHERE name = ?', (end, namespace))
+            if retain is not None and end > retain:
+                connection.execute(
+                    'DELETE FROM entries WHERE namespace = ? AND key < ?',
+                    (namespace, str(end - retain).zfill(SEQUENCE_KEY_WIDTH))
+                )
+            COUNTER.pack_into(self._counters, slot * COUNTER.size, version)
+        return start
+
+    def _bump(self, connection, namespace):
+        connection.execute('UPDATE namespaces SET version = version + 1 WHERE name = ?', (namespace,))
+        return connection.execute('SELECT version FROM namespaces WHERE name = ?', (namespace,)).fetchone()[0]
+
+    def changes(self, namespace, since, values=True, exclude_version=None):
+        """Entries written after `since` as (key, version, value) in version order.
+
+        Entries of `exclude_version` (typically the caller's own write) are skipped.
+        """
+        self._slot(namespace)
+        column = 'value' if values else 'NULL'
+        rows = self._connection().execute(
+            f'SELECT key, version, {column} FROM entries WHERE namespace = ? AND version > ? AND version != ? '
+            'ORDER BY version, key',
+            (namespace, since, -1 if exclude_version is None else exclude_version)
+        )
+        return [(key, version, None if value is None else json.loads(value)) for key, version, value in rows]
+
+
+class SharedNamespace:
+    """Per-worker replica of one shared namespace.
+
+    `apply(key, value)` is called for every entry written by any worker,
+    in version order, when `refresh()` finds the shared version moved.
+    Entries this replica published itself are not re-applied; a key
+    another worker wrote after them is, since only its latest write is kept.
+    """
+
+    def __init__(self, state, namespace, apply):
+        self.state = state
+        self.namespace = namespace
+        self.apply = apply
+        self.seen = 0
+        self._lock = threading.RLock()
+        state.replicas[namespace] = self
+
+    @property
+    def version(self):
+        """Latest version applied to this replica, after catching up.
+
+        Taken from what was actually read rather than the shared counter,
+        which can run ahead of the commit; a body built from the replica
+        right after matches this version.
+        """
+        self.refresh()
+        return self.seen
+
+    def refresh(self):
+        """Apply entries written since the last refresh; cheap when nothing changed"""
+        if self.state.version(self.namespace) == self.seen:
+            return
+        with self._lock:
+            self._apply_changes()
+
+    def _apply_changes(self, own_version=None):
+        for key, version, value in self.state.changes(self.namespace, self.seen, exclude_version=own_version):
+            self.apply(key, value)
+            self.seen = max(self.seen, version)
+        if own_version is not None:
+            self.seen = max(self.seen, own_version)
+
+    @contextmanager
+    def exclusive(self):
+        """Read-modify-write section: no other worker writes until it exits.
+
+        The replica is caught up first, so it is current while modified.
+        """
+        self.state._slot(self.namespace)
+        with self._lock, self.state.locked():
+            self._apply_changes()
+            yield
+
+    @contextmanager
+    def pinned(self):
+        """Catch up, then keep this worker's other threads from applying changes; yields the version held.
+
+        Unlike exclusive() no cross-process lock is taken, so other workers
+        keep writing; pair it with written_since() to detect that.
+        """
+        with self._lock:
+            self.refresh()
+            yield self.seen
+
+    def changed_since(self, since):
+        """(key, version) of every key last written after `since`, oldest first"""
+        return [(key, version) for key, version, _ in self.state.changes(self.namespace, since, values=False)]
+
+    def written_since(self, since, keys):
+        """Those of `keys` written by any worker after `since`; inside exclusive() the answer holds until it exits"""
+        keys = set(keys)
+        return {key for key, _ in self.changed_since(since) if key in keys}
+
+    def publish(self, entries):
+        """Write entries (already applied locally) for every other worker to pick up"""
+        if not entries:
+            return self.seen
+        with self._lock:
+            version = self.state.write(self.namespace, entries)
+            self._apply_changes(version)
+        return version
+
+
+class SharedDict(SharedNamespace, MutableMapping):
+    """Dict whose contents are shared between workers.
+
+    Reads come from a local cache that refreshes only when the shared
+    version moved. Assignments and deletes are written through. Values
+    mutated in place must be written back with `commit(*keys)`.
+
+    A replica loaded from a snapshot holds each value as an encoded view
+    into the snapshot until it is first read.
+    """
+
+    def __init__(self, state, namespace):
+        self._data = {}
+        self._packed = False  # whether any value may still be encoded
+        SharedNamespace.__init__(self, state, namespace, self._apply_entry)
+
+    def _apply_entry(self, key, value):
+        if value is None:
+            self._data.pop(key, None)
+        else:
+            self._data[key] = value
+
+    def _unpack(self, key, value):
+        if type(value) is memoryview:
+            value = self._data[key] = json.loads(bytes(value))
+        return value
+
+    def _unpack_all(self):
+        if self._packed:
+            with self._lock:
+                for key, value in self._data.items():
+                    if type(value) is memoryview:
+                        self._data[key] = json.loads(bytes(value))
+                self._packed = False
+
+    def __getitem__(self, key):
+        self.refresh()
+        return self._unpack(key, self._data[key])
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self.publish({key: value})
+
+    def __delitem__(self, key):
+        self.refresh()
+        del self._data[key]
+        self.publish({key: None})
+
+    def __contains__(self, key):
+        self.refresh()
+        return key in self._data
+
+    def __iter__(self):
+        self.refresh()
+        return iter(self._data)
+
+    def __len__(self):
+        self.refresh()
+        return len(self._data)
+
+    def get(self, key, default=None):
+        self.refresh()
+        value = self._data.get(key, default)
+        return self._unpack(key, value)
+
+    def keys(self):
+        self.refresh()
+        return self._data.keys()
+
+    def values(self):
+        self.refresh()
+        self._unpack_all()
+        return self._data.values()
+
+    def items(self):
+        self.refresh()
+        self._unpack_all()
+        return self._data.items()
+
+    def update(self, other=(), **kwargs):
+        """Write many entries as a single shared version"""
+        entries = dict(other, **kwargs)
+        self._data.update(entries)
+        self.publish(entries)
+
+    def commit(self, *keys):
+        """Write back values that were mutated in place"""
+        self.publish({key: self._unpack(key, self._data[key]) for key in keys if key in self._data})
+
+    def dump_snapshot(self):
+        """Serialize the replica as (version, bytes) for a state snapshot.
+
+        Layout: header, JSON list of keys, padding to 8 bytes, value end
+        offsets, then the JSON-encoded values back to back. Values that
+        are still encoded are copied over as-is.
+        """
+        with self._lock:
+            self._apply_changes()
+            keys = list(self._data)
+            values = [
+                value.tobytes() if type(value) is memoryview else json.dumps(value, default=str).encode()
+                for value in self._data.values()
+            ]
+            version = self.seen
+
+        keys_json = json.dumps(keys).encode()
+        ends = array('Q')
+        end = 0
+        for value in values:
+            end += len(value)
+            ends.append(end)
+        padding = b'\0' * (-(DICT_SNAPSHOT_HEADER.size + len(keys_json)) % 8)
+        return version, b''.join([
+            DICT_SNAPSHOT_HEADER.pack(len(keys), len(keys_json)), keys_json, padding, ends.tobytes(), *values
+        ])
+
+    def load_snapshot(self, version, buffer):
+        """Replace the replica with a snapshot section taken at `version`; returns the entry count.
+
+        Only the keys are decoded here; refresh() then applies whatever was
+        written after the snapshot.
+        """
+        count, keys_length = DICT_SNAPSHOT_HEADER.unpack_from(buffer)
+        start = DICT_SNAPSHOT_HEADER.size
+        keys = json.loads(bytes(buffer[start:start + keys_length]))
+        start += keys_length + (-(DICT_SNAPSHOT_HEADER.size + keys_length) % 8)
+        ends = buffer[start:start + count * 8].cast('Q')
+        values = buffer[start + count * 8:]
+
+        with self._lock:
+            data, begin = {}, 0
+            for key, end in zip(keys, ends):
+                data[key] = values[begin:end]
+                begin = end
+            self._data = data
+            self._packed = bool(data)
+            self.seen = version
+        return count
+
+
+class SharedLog(SharedNamespace):
+    """Append-only shared sequence; every worker applies entries in the same order.
+
+    `apply(seq, value)` receives each entry's shared sequence number. By
+    default values are collected locally. At most `retain` entries are kept,
+    both in the shared store and in that local collection.
+    """
+
+    def __init__(self, state, namespace, apply=None, retain=None):
+        self._items = deque(maxlen=retain)
+        self.retain = retain
+        SharedNamespace.__init__(
+            self, state, namespace,
+            (lambda key, value: apply(int(key), value)) if apply else self._append_local
+        )
+
+    def _append_local(self, key, value):
+        self._items.append(value)
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        """Append values for every worker, including this one, in shared order"""
+        values = list(values)
+        if values:
+            self.state.append(self.namespace, values, self.retain)
+            self.refresh()
+
+    def __iter__(self):
+        self.refresh()
+        return iter(self._items)
+
+    def __len__(self):
+        self.refresh()
+        return len(self._items)
+
+
+# One shared state per host; every worker opens the same files
+shared_state = SharedState(os.environ.get(
+    'SHARED_STATE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'shared_state.db')
+))
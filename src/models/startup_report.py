@@ -0,0 +1,53 @@
+from contextlib import contextmanager
+import os
+import sys
+import time
+
+
+class StartupReport:
+    """Wall-clock timings of the startup phases of one app.
+
+    Each phase records its duration and how many modules it imported, so
+    per-module import cost, DB init and state restore can be compared
+    between cold starts. Phases run in the process that created the app;
+    with a preloaded app, forked workers inherit the report (and the work).
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.created = time.time()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block; yields a dict for extra details to report with it"""
+        details = {}
+        modules_before = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield details
+        finally:
+            self.phases.append({
+                'phase': name,
+                'ms': round((time.perf_counter() - started) * 1000, 3),
+                'modules_loaded': len(sys.modules) - modules_before,
+                **details
+            })
+
+    @property
+    def total_ms(self):
+        return round(sum(phase['ms'] for phase in self.phases), 3)
+
+    def summary(self):
+        """One-line summary for the startup log"""
+        return ', '.join(f"{phase['phase']} {phase['ms']:.1f}ms" for phase in self.phases) + \
+            f" (total {self.total_ms:.1f}ms)"
+
+    def to_dict(self):
+        return {
+            'pid': self.pid,
+            'preloaded': self.pid != os.getpid(),
+            'created': self.created,
+            'phases': self.phases,
+            'total_ms': self.total_ms
+        }
@@ -0,0 +1,233 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from src.models.shared_state import SharedDict
+
+MAGIC = b'SCSS'
+FORMAT_VERSION = 1
+# magic, format version, table-of-contents offset, table-of-contents length
+HEADER = struct.Struct('<4sIQQ')
+ALIGNMENT = 8  # sections start 8-byte aligned so typed columns can be cast in place
+SHARED_PREFIX = 'shared/'
+
+logger = logging.getLogger(__name__)
+
+
+class StateSnapshotter:
+    """Binary point-in-time snapshots of in-memory state, for fast restarts.
+
+    A snapshot file is a header, a run of opaque sections and a JSON table
+    of contents naming each section's offset, length and the version of
+    the state it captured. Files are written to a temp file, fsynced and
+    renamed into place, so readers only ever see a complete snapshot.
+
+    Restoring maps the file and hands out zero-copy views of sections;
+    owners decode them as they see fit (shared dicts keep values encoded
+    until first read). Each section's version lets the owner replay only
+    the shared-state changes made after the snapshot was taken. Snapshots
+    are tied to the shared state they were taken from and ignored by any
+    other.
+
+    Every SharedDict of the shared state is captured; other stores register
+    a `dump()` returning (version, bytes) and a `version()` callable.
+    """
+
+    def __init__(self, path, state, interval=0):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+        self.state = state
+        self.interval = interval
+        self.providers = {}  # name -> (dump, version)
+        self.toc = None
+        self.last_write = None
+        self.last_restore = None
+        self._map = None
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def register(self, name, dump, version):
+        """Capture a store in every snapshot under `name`"""
+        self.providers[name] = (dump, version)
+
+    def _shared_dicts(self):
+        return {
+            f'{SHARED_PREFIX}{namespace}': replica
+            for namespace, replica in self.state.replicas.items()
+            if isinstance(replica, SharedDict)
+        }
+
+    def versions(self):
+        """Current version of every captured section"""
+        versions = {name: version() for name, (_, version) in self.providers.items()}
+        versions.update({name: replica.version for name, replica in self._shared_dicts().items()})
+        return versions
+
+    # Reading
+
+    def open(self):
+        """Map the snapshot file, if there is a usable one; returns its table of contents"""
+        started = time.perf_counter()
+        self.state.open()
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            snapshot = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # empty file
+        finally:
+            os.close(fd)
+
+        magic, format_version, toc_offset, toc_length = HEADER.unpack_from(snapshot)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            logger.warning(f"Ignoring {self.path}: not a version {FORMAT_VERSION} state snapshot")
+            return None
+        toc = json.loads(snapshot[toc_offset:toc_offset + toc_length])
+        if toc['state_id'] != self.state.state_id:
+            logger.warning(f"Ignoring {self.path}: taken from a different shared state")
+            return None
+
+        self._map, self.toc = snapshot, toc
+        self.last_restore = {
+            'created': toc['created'],
+            'bytes': len(snapshot),
+            'sections': len(toc['sections']),
+            'open_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        return toc
+
+    def section(self, name):
+        """(version, memoryview) of a section of the open snapshot, or None"""
+        if self.toc is None or name not in self.toc['sections']:
+            return None
+        offset, length, version = self.toc['sections'][name]
+        return version, memoryview(self._map)[offset:offset + length]
+
+    def restore_shared(self):
+        """Load every snapshotted SharedDict; values are decoded on first read"""
+        restored = 0
+        for name, replica in self._shared_dicts().items():
+            section = self.section(name)
+            if section is not None:
+                restored += replica.load_snapshot(*section)
+        return restored
+
+    # Writing
+
+    def write(self, force=False):
+        """Write a snapshot unless another process is writing one or nothing changed.
+
+        Returns the new table of contents, or None if no snapshot was written.
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.lock_path, 'a+b') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return None
+                if not force and self._on_disk_versions() == self.versions():
+                    return None
+                return self._write()
+
+    def _on_disk_versions(self):
+        try:
+            with open(self.path, 'rb') as snapshot:
+                magic, format_version, toc_offset, toc_length = HEADER.unpack(snapshot.read(HEADER.size))
+                snapshot.seek(toc_offset)
+                toc = json.loads(snapshot.read(toc_length))
+        except (FileNotFoundError, struct.error, ValueError):
+            return None
+        if toc.get('state_id') != self.state.state_id:
+            return None
+        return {name: version for name, (_, _, version) in toc['sections'].items()}
+
+    def _write(self):
+        started = time.perf_counter()
+        self.state.open()
+        dumps = [(name, dump) for name, (dump, _) in self.providers.items()]
+        dumps += [(name, replica.dump_snapshot) for name, replica in self._shared_dicts().items()]
+
+        sections = {}
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'wb') as snapshot:
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0))
+            offset = HEADER.size
+            for name, dump in dumps:
+                version, data = dump()
+                snapshot.write(data)
+                sections[name] = [offset, len(data), version]
+                offset += len(data)
+                padding = -offset % ALIGNMENT
+                snapshot.write(b'\0' * padding)
+                offset += padding
+
+            toc = {'state_id': self.state.state_id, 'created': time.time(), 'sections': sections}
+            toc_bytes = json.dumps(toc).encode()
+            snapshot.write(toc_bytes)
+            snapshot.seek(0)
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, offset, len(toc_bytes)))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temp_path, self.path)
+        # Persist the rename itself
+        directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+        self.last_write = {
+            'created': toc['created'],
+            'bytes': offset + len(toc_bytes),
+            'sections': len(sections),
+            'write_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+        logger.info(f"Wrote state snapshot: {self.last_write['bytes']} bytes, "
+                    f"{len(sections)} sections in {self.last_write['write_ms']}ms")
+        return toc
+
+    # Scheduling
+
+    def ensure_running(self):
+        """Start this process's periodic snapshot thread if it is not running (threads do not survive fork)"""
+        if self.interval <= 0 or self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._run, name='state-snapshots', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                logger.error(f"Error writing state snapshot: {str(e)}")
+
+    def close(self):
+        """Write a final snapshot if anything changed (call at shutdown)"""
+        if self.state.state_id is None:
+            return  # state was never opened in this process
+        try:
+            self.write()
+        except Exception as e:
+            logger.error(f"Error writing state snapshot at shutdown: {str(e)}")
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'interval_seconds': self.interval,
+            'restored': self.last_restore,
+            'last_write': self.last_write,
+            'sections': self.toc['sections'] if self.toc else {}
+        }
@@ -0,0 +1,385 @@
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import struct
+import threading
+import time
+
+# Movement kinds
+RECEIPT = 1
+SALE = 2
+ADJUSTMENT = 3
+TRANSFER = 4
+MOVEMENT_KINDS = {
+    'receipt': RECEIPT,
+    'sale': SALE,
+    'adjustment': ADJUSTMENT,
+    'transfer': TRANSFER
+}
+
+# Fixed-width log record: seq, kind, product name id, location name id,
+# destination location name id (transfers only), quantity
+RECORD = struct.Struct('<QBIIId')
+NO_LOCATION = 0xFFFFFFFF
+REPLAY_CHUNK_RECORDS = 65536
+
+# Snapshot: header (magic, format version, seq, balance count) + (product, location, quantity) entries
+SNAPSHOT_MAGIC = b'SLSN'
+SNAPSHOT_HEADER = struct.Struct('<4sIQQ')
+SNAPSHOT_ENTRY = struct.Struct('<IId')
+
+class StockLedger:
+    """Append-only stock movement ledger with snapshots and log compaction.
+
+    Movements are appended as fixed-width binary records to `movements.log`;
+    product and location names are interned into an append-only `names`
+    file (one JSON string per line). Balances per (product, location) are derived by replaying the log.
+    Every `snapshot_every` movements the balances are written to a compact
+    snapshot and the log is compacted to the records after it, so a restart
+    only replays the tail.
+
+    Several processes may share one ledger directory: writes hold an
+    exclusive lock on `ledger.lock` and first catch up on whatever other
+    processes appended (or reload from the snapshot if one of them
+    compacted the log in the meantime).
+    """
+
+    def __init__(self, directory, snapshot_every=100000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.log_path = os.path.join(directory, 'movements.log')
+        self.names_path = os.path.join(directory, 'names')
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.lock_path = os.path.join(directory, 'ledger.lock')
+
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.names = []
+        self.name_ids = {}
+        self.balances = {}  # (product name id, location name id) -> quantity
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._log = None
+        self._names_file = None
+        self._lock_file = None
+        self._pid = None
+        self._log_inode = None
+        self._log_offset = 0
+        self._names_offset = 0
+
+    def __len__(self):
+        """Number of movements recorded since the last snapshot"""
+        return self.seq - self.snapshot_seq
+
+    def open(self):
+        """Load the latest snapshot and replay the log tail, returning restore stats.
+
+        Opening a ledger that is already open keeps its handles and only
+        catches up on what other processes recorded since.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if self._log is not None:
+                with self._exclusive():
+                    replayed = self._catch_up()
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'ab')
+                self._pid = os.getpid()
+
+                with self._exclusive():
+                    self._log = open(self.log_path, 'ab')
+                    self._names_file = open(self.names_path, 'ab')
+                    self._log_inode = os.fstat(self._log.fileno()).st_ino
+
+                    self._load_names()
+                    self._load_snapshot()
+                    replayed = self._replay_log()
+
+        return {
+            'snapshot_seq': self.snapshot_seq,
+            'replayed_movements': replayed,
+            'seq': self.seq,
+            'balances': len(self.balances),
+            'restore_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    def close(self):
+        for handle in (self._log, self._names_file, self._lock_file):
+            if handle is not None:
+                handle.close()
+        self._log = self._names_file = self._lock_file = None
+
+    def _reopen_after_fork(self):
+        """Give a forked child its own handles; an inherited lock file would share the parent's flock"""
+        for handle in (self._log, self._names_file, self._lock_file):
+            handle.close()
+        self._lock_file = open(self.lock_path, 'ab')
+        self._log = open(self.log_path, 'ab')
+        self._names_file = open(self.names_path, 'ab')
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the cross-process ledger lock (re-entrant; callers hold self._lock)"""
+        if self._lock_depth == 0:
+            if self._pid != os.getpid():
+                self._reopen_after_fork()
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the ledger, across processes, for a whole read-modify-write of stock.
+
+        Movements recorded inside the block go through the same lock, so
+        concurrent writers in different workers never interleave.
+        """
+        with self._lock:
+            if self._log is None:
+                self.open()
+            with self._exclusive():
+                self._catch_up()
+                yield
+
+    def _catch_up(self):
+        """Apply names and movements other processes appended since we last read, returning how many movements"""
+        self._load_names()
+        if os.stat(self.log_path).st_ino != self._log_inode:
+            # Another process compacted the log; its snapshot covers everything before the new log
+            self.balances = {}
+            self.seq = self.snapshot_seq = 0
+            self._load_snapshot()
+            self._log.close()
+            self._log = open(self.log_path, 'ab')
+            self._log_inode = os.fstat(self._log.fileno()).st_ino
+            self._log_offset = 0
+        return self._replay_log()
+
+    def refresh(self):
+        """Catch up on movements recorded by other processes"""
+        with self._lock:
+            if self._log is None:
+                self.open()
+                return
+            with self._exclusive():
+                self._catch_up()
+
+    def _load_names(self):
+        """Intern names appended since the last read (whole lines only)"""
+        with open(self.names_path, 'rb') as handle:
+            handle.seek(self._names_offset)
+            for line in handle:
+                if not line.endswith(b'\n'):
+                    break
+                self._intern_loaded(json.loads(line))
+                self._names_offset += len(line)
+
+    def _intern_loaded(self, name):
+        self.name_ids[name] = len(self.names)
+        self.names.append(name)
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, 'rb') as handle:
+            data = handle.read()
+
+        magic, _, seq, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f'Not a stock ledger snapshot: {self.snapshot_path}')
+
+        body = memoryview(data)[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + count * SNAPSHOT_ENTRY.size]
+        self.balances = {
+            (product, location): quantity
+            for product, location, quantity in SNAPSHOT_ENTRY.iter_unpack(body)
+        }
+        self.snapshot_seq = self.seq = seq
+
+    def _replay_log(self):
+        """Apply log records past the read offset that are newer than the snapshot, returning how many were applied"""
+        replayed = 0
+        chunk_size = RECORD.size * REPLAY_CHUNK_RECORDS
+        with open(self.log_path, 'rb') as handle:
+            handle.seek(self._log_offset)
+            while True:
+                chunk = handle.read(chunk_size)
+                # A torn trailing record from a crash is ignored
+                usable = len(chunk) - len(chunk) % RECORD.size
+                if usable:
+                    replayed += self._apply_records(RECORD.iter_unpack(chunk[:usable]))
+                    self._log_offset += usable
+                if len(chunk) < chunk_size:
+                    break
+        return replayed
+
+    def _apply_records(self, records):
+        balances, snapshot_seq = self.balances, self.snapshot_seq
+        get = balances.get
+        applied = 0
+        seq = self.seq
+
+        for seq_value, kind, product, location, to_location, quantity in records:
+            if seq_value <= snapshot_seq:
+                continue
+            key = (product, location)
+            if kind == RECEIPT or kind == ADJUSTMENT:
+                balances[key] = get(key, 0) + quantity
+            elif kind == SALE:
+                balances[key] = get(key, 0) - quantity
+            elif kind == TRANSFER:
+                balances[key] = get(key, 0) - quantity
+                destination = (product, to_location)
+                balances[destination] = get(destination, 0) + quantity
+            seq = seq_value
+            applied += 1
+
+        self.seq = max(self.seq, seq)
+        return applied
+
+    def _name_id(self, name, new_names):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.name_ids[name] = name_id
+            self.names.append(name)
+            new_names.append(name)
+        return name_id
+
+    def record(self, movements, only_if_empty=False):
+        """Append movements and apply them to the balances.
+
+        Each movement is (kind, product_id, location, quantity, to_location),
+        with to_location None except for transfers. All movements are written
+        with a single write call. With `only_if_empty` nothing is written if
+        any process already recorded a movement (used for seeding). Returns
+        the seq of the last movement.
+        """
+        with self._lock:
+            if self._log is None:
+                self.open()
+            with self._exclusive():
+                self._catch_up()
+                if only_if_empty and self.seq:
+                    return self.seq
+                return self._record(movements)
+
+    def _record(self, movements):
+        new_names = []
+        records = []
+        seq = self.seq
+        for kind, product_id, location, quantity, to_location in movements:
+            seq += 1
+            records.append((
+                seq,
+                kind,
+                self._name_id(str(product_id), new_names),
+                self._name_id(str(location), new_names),
+                NO_LOCATION if to_location is None else self._name_id(str(to_location), new_names),
+                quantity
+            ))
+
+        if not records:
+            return self.seq
+
+        # Names must be durable before any record that references them
+        if new_names:
+            encoded = ''.join(f'{json.dumps(name)}\n' for name in new_names).encode('utf-8')
+            self._names_file.write(encoded)
+            self._names_file.flush()
+            self._names_offset += len(encoded)
+        encoded = b''.join(RECORD.pack(*record) for record in records)
+        self._log.write(encoded)
+        self._log.flush()
+        self._log_offset += len(encoded)
+
+        self._apply_records(records)
+
+        if self.snapshot_every and len(self) >= self.snapshot_every:
+            self._snapshot()
+            self._compact()
+
+        return self.seq
+
+    def snapshot(self):
+        """Write a snapshot of the current balances and compact the log behind it"""
+        with self._lock:
+            if self._log is None:
+                self.open()
+            with self._exclusive():
+                self._catch_up()
+                self._snapshot()
+                self._compact()
+            return self.snapshot_seq
+
+    def _snapshot(self):
+        temp_path = f'{self.snapshot_path}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 1, self.seq, len(self.balances)))
+            handle.write(b''.join(
+                SNAPSHOT_ENTRY.pack(product, location, quantity)
+                for (product, location), quantity in self.balances.items()
+            ))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        # The rename must be durable before compaction drops the records it covers
+        self._sync_directory()
+        self.snapshot_seq = self.seq
+
+    def _sync_directory(self):
+        """Persist renames within the ledger directory"""
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+    def _compact(self):
+        """Rewrite the log keeping only records newer than the snapshot"""
+        tail = []
+        if os.path.exists(self.log_path):
+            self._log.flush()
+            with open(self.log_path, 'rb') as handle:
+                data = handle.read()
+            usable = len(data) - len(data) % RECORD.size
+            tail = [
+                record for record in RECORD.iter_unpack(data[:usable])
+                if record[0] > self.snapshot_seq
+            ]
+
+        temp_path = f'{self.log_path}.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(b''.join(RECORD.pack(*record) for record in tail))
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._log.close()
+        os.replace(temp_path, self.log_path)
+        self._sync_directory()
+        self._log = open(self.log_path, 'ab')
+        self._log_inode = os.fstat(self._log.fileno()).st_ino
+        self._log_offset = len(tail) * RECORD.size
+
+    def all_balances(self):
+        """Get derived balances as {product_id: {location: quantity}}"""
+        names = self.names
+        result = {}
+        for (product, location), quantity in self.balances.items():
+            result.setdefault(names[product], {})[names[location]] = quantity
+        return result
+
+    def stats(self):
+        return {
+            'seq': self.seq,
+            'snapshot_seq': self.snapshot_seq,
+            'movements_since_snapshot': len(self),
+            'balances': len(self.balances),
+            'snapshot_every': self.snapshot_every
+        }
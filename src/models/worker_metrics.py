@@ -0,0 +1,209 @@
+from bisect import bisect_left
+from array import array
+import fcntl
+import glob
+import json
+import logging
+import mmap
+import os
+import threading
+import uuid
+import weakref
+
+from src.models.latency_histogram import DEFAULT_BOUNDS_MS
+
+DEFAULT_SHARD_SLOTS = 8192
+# Totals folded in from the shards of exited workers, and the lock scrapes hold
+RETIRED_FILE = 'retired.json'
+COLLECT_LOCK_FILE = 'collect.lock'
+
+logger = logging.getLogger(__name__)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # alive, owned by another user
+        pass
+    return True
+
+
+class _Shard:
+    """One thread's slice of the counters: a file of doubles plus a key index.
+
+    Exactly one thread writes a shard at a time, so updates need no lock.
+    Each series is appended to the `.keys` file (slot, width, key) before
+    its slots are first written; readers map slots back to series with it.
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.slots = {}
+        self.used = 0
+        fd = os.open(f'{path}.metrics', os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, capacity * 8)
+            self._map = mmap.mmap(fd, capacity * 8)
+        finally:
+            os.close(fd)
+        self.values = memoryview(self._map).cast('d')
+        self._keys = open(f'{path}.keys', 'w')
+
+    def slot(self, key, width=1):
+        """First slot of a series, allocating `width` slots for it on first use (None when full)"""
+        start = self.slots.get(key)
+        if start is None:
+            if self.used + width > self.capacity:
+                return None
+            start = self.slots[key] = self.used
+            self.used += width
+            self._keys.write(json.dumps([start, width, *key]) + '\n')
+            self._keys.flush()
+        return start
+
+
+class WorkerMetrics:
+    """Request counters and latency histograms shared across worker processes.
+
+    Every thread that records gets its own memory-mapped shard in
+    `directory`, so the hot path is a dict lookup and a few float adds
+    with no locks. A shard returns to its process's free list when its
+    thread exits. Scrapes read and sum every shard file in the directory.
+    The shards of workers that have exited are folded into one retired
+    totals file and removed, so counters never go backwards while the
+    directory is kept and it does not grow with every worker restart.
+    """
+
+    def __init__(self, directory, bounds=DEFAULT_BOUNDS_MS, shard_slots=DEFAULT_SHARD_SLOTS):
+        self.directory = directory
+        self.bounds = tuple(bounds)
+        self.shard_slots = shard_slots
+        self._local = threading.local()
+        self._free = []
+        self._created = 0
+        self._pid = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        lease = getattr(self._local, 'lease', None)
+        if lease is not None and lease[1] == os.getpid():
+            return lease[0]
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Shards of the parent process are never written after a fork
+                self._pid, self._token = os.getpid(), uuid.uuid4().hex[:8]
+                self._free, self._created = [], 0
+            if self._free:
+                shard = self._free.pop()
+            else:
+                os.makedirs(self.directory, exist_ok=True)
+                shard = _Shard(os.path.join(self.directory, f'{self._pid}-{self._token}-{self._created}'),
+                               self.shard_slots)
+                self._created += 1
+
+        # Hand the shard back when the thread (and with it the thread-local) goes away
+        holder = _LeaseHolder()
+        weakref.finalize(holder, self._release, shard, os.getpid())
+        self._local.lease = (shard, os.getpid(), holder)
+        return shard
+
+    def _release(self, shard, pid):
+        # Looked up now, not when leased: a fork in between replaces the free list
+        if pid == self._pid:
+            self._free.append(shard)
+
+    def observe_request(self, endpoint, method, status, duration_ms):
+        """Count one request and add its duration to the endpoint's histogram"""
+        shard = self._shard()
+        values = shard.values
+        slot = shard.slot(('requests', endpoint, method, str(status)))
+        if slot is not None:
+            values[slot] += 1
+        # Histogram: one slot per bucket (overflow last), then the sum in ms
+        slot = shard.slot(('latency', endpoint), len(self.bounds) + 2)
+        if slot is not None:
+            values[slot + bisect_left(self.bounds, duration_ms)] += 1
+            values[slot + len(self.bounds) + 1] += duration_ms
+
+    def collect(self):
+        """Sum every shard in the directory, retiring those of exited workers.
+
+        Returns {'requests': {(endpoint, method, status): count},
+        'latency': {endpoint: {'buckets': [...], 'sum_ms': total}},
+        'pids': set of live worker pids that recorded anything}.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, COLLECT_LOCK_FILE), 'ab') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            requests, latency = self._load_retired()
+            shards = self._read_shards()
+
+            retired = {path for path, pid, _, _ in shards if pid != os.getpid() and not _pid_alive(pid)}
+            if retired:
+                for path, pid, series, values in shards:
+                    if path in retired:
+                        self._add(requests, latency, series, values)
+                self._save_retired(requests, latency)
+                for path in retired:
+                    for suffix in ('.keys', '.metrics'):
+                        try:
+                            os.remove(path + suffix)
+                        except FileNotFoundError:
+                            pass
+
+            pids = set()
+            for path, pid, series, values in shards:
+                if path not in retired:
+                    self._add(requests, latency, series, values)
+                    pids.add(pid)
+        return {'requests': requests, 'latency': latency, 'pids': pids}
+
+    def _read_shards(self):
+        """(path, pid, series, values) of every readable shard in the directory"""
+        shards = []
+        for keys_path in glob.glob(os.path.join(self.directory, '*.keys')):
+            path = keys_path[:-len('.keys')]
+            try:
+                with open(keys_path) as keys_file:
+                    series = [json.loads(line) for line in keys_file if line.endswith('\n')]
+                with open(f'{path}.metrics', 'rb') as values_file:
+                    values = array('d', values_file.read())
+            except (FileNotFoundError, ValueError):
+                continue
+            shards.append((path, int(os.path.basename(path).split('-')[0]), series, values))
+        return shards
+
+    @staticmethod
+    def _add(requests, latency, series, values):
+        for start, width, kind, *labels in series:
+            if kind == 'requests':
+                key = tuple(labels)
+                requests[key] = requests.get(key, 0) + values[start]
+            elif kind == 'latency':
+                histogram = latency.setdefault(labels[0], {'buckets': [0] * (width - 1), 'sum_ms': 0.0})
+                for bucket in range(width - 1):
+                    histogram['buckets'][bucket] += values[start + bucket]
+                histogram['sum_ms'] += values[start + width - 1]
+
+    def _load_retired(self):
+        try:
+            with open(os.path.join(self.directory, RETIRED_FILE)) as handle:
+                retired = json.load(handle)
+        except FileNotFoundError:
+            return {}, {}
+        return {tuple(row[:-1]): row[-1] for row in retired['requests']}, retired['latency']
+
+    def _save_retired(self, requests, latency):
+        path = os.path.join(self.directory, RETIRED_FILE)
+        with open(f'{path}.tmp', 'w') as handle:
+            json.dump({'requests': [[*key, count] for key, count in requests.items()], 'latency': latency}, handle)
+        os.replace(f'{path}.tmp', path)
+
+
+class _LeaseHolder:
+    pass
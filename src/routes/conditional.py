@@ -0,0 +1,33 @@
+from flask import current_app, make_response, request
+from functools import wraps
+from src.models.shared_state import shared_state
+
+def conditional_get(*stores):
+    """Serve a GET view with a version-based ETag and answer If-None-Match with 304.
+
+    Each store only needs a `version` attribute that increases on every
+    write. The ETag is derived from those versions, so a matching request
+    returns before the view runs and nothing is serialized. Versions come
+    from shared state, so every worker produces the same ETag for the same
+    data; the state id keeps ETags from a wiped state from ever matching.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            shared_state.open()
+            etag = '.'.join([shared_state.state_id] + [str(store.version) for store in stores])
+            
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                response.cache_control.no_cache = True
+                return response
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                # Let browsers keep the body but always revalidate it
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
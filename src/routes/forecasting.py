@@ -1,19 +1,88 @@
 from flask import Blueprint, request, jsonify
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 import logging
-import json
 import math
+import multiprocessing
+import os
+import threading
+import time
+from src.models.demand_forecast import (
+    HISTORY_DAYS, FORECAST_MODELS, MOVING_AVERAGE, ONLINE_MODELS, forecast_chunk, forecast_with
+)
+from src.models.demand_history import DemandHistoryStore, to_day
+from src.models.shared_state import shared_state, SharedDict, SharedNamespace
+from src.routes.conditional import conditional_get
+from src.routes.jobs import job_queue, wants_async, accepted
+from src.routes.metrics import track_store
+from src.routes.snapshots import state_snapshots
+from src.routes.streaming import STREAM_FORMATS, iter_stream_records
 
 forecasting_bp = Blueprint('forecasting', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-forecast_data = {}
-historical_data = {}
-market_trends = {}
-forecast_models = {}
+# Stores shared by all workers; each SharedDict's version doubles as its ETag source
+forecast_data = SharedDict(shared_state, 'forecast_data')
+market_trends = SharedDict(shared_state, 'market_trends')
+# Per-product model selections; products without one use DEFAULT_FORECAST_MODEL
+forecast_models = SharedDict(shared_state, 'forecast_models')
+DEFAULT_FORECAST_MODEL = MOVING_AVERAGE
+# Forecasts cover a whole number of days, at most a year ahead
+MAX_FORECAST_PERIOD_DAYS = 365
+FORECAST_PERIOD_ERROR = f'forecast_period_days must be a whole number between 1 and {MAX_FORECAST_PERIOD_DAYS}'
+
+# Per-product demand history in typed ring buffers; each write publishes the
+# rows appended since the product's packed history last went out (or, every
+# MAX_APPENDED_ROWS rows, the packed history) for every other worker to load
+HISTORY_RETENTION_DAYS = 365
+historical_data = DemandHistoryStore(int(os.environ.get('DEMAND_HISTORY_CAPACITY', HISTORY_RETENTION_DAYS + 1)))
+history_replica = SharedNamespace(shared_state, 'historical_data', historical_data.load)
+
+def dump_history_snapshot():
+    """Capture every history at one version, serializing them without holding off any writer"""
+    with history_replica.pinned() as version:
+        histories = historical_data.copy()
+    return version, histories.to_snapshot()
+
+state_snapshots.register('historical_data', dump_history_snapshot, lambda: history_replica.version)
+track_store('historical_data', historical_data)
+
+# Batch forecasting fans chunks out to a per-worker process pool, created on first use
+FORECAST_POOL_WORKERS = int(os.environ.get('FORECAST_POOL_WORKERS', os.cpu_count() or 1))
+DEFAULT_FORECAST_CHUNK = int(os.environ.get('FORECAST_BATCH_CHUNK', 1000))
+MAX_FORECAST_CHUNK = 50000
+_forecast_pool = None
+_forecast_pool_lock = threading.Lock()
+
+# Bulk history ingestion: batch sizing, and how many rejected rows are
+# listed in the response
+DEFAULT_INGEST_BATCH_SIZE = 10000
+MAX_INGEST_BATCH_SIZE = 100000
+MAX_REPORTED_REJECTIONS = 1000
+
+@forecasting_bp.before_app_request
+def refresh_history():
+    """Load histories written by other workers since the last request"""
+    history_replica.refresh()
+
+def retention_start():
+    """First day number kept in demand histories"""
+    return to_day(datetime.utcnow().date().isoformat()) - HISTORY_RETENTION_DAYS + 1
+
+def restore_demand_history():
+    """Load histories from the state snapshot, if any, then catch up on later writes"""
+    snapshot = state_snapshots.section('historical_data')
+    if snapshot is not None:
+        version, buffer = snapshot
+        count = historical_data.load_snapshot(buffer)
+        history_replica.seen = version
+        logger.info(f"Restored demand history of {count} products from the state snapshot")
+    history_replica.refresh()
+    return len(historical_data)
 
 @forecasting_bp.route('/status', methods=['GET'])
+@conditional_get(forecast_data, history_replica)
 def forecasting_status():
     """Get demand forecasting bot status"""
     return jsonify({
@@ -32,6 +101,7 @@ def forecasting_status():
     })
 
 @forecasting_bp.route('/forecasts', methods=['GET'])
+@conditional_get(forecast_data)
 def get_all_forecasts():
     """Get all demand forecasts"""
     return jsonify({
@@ -40,6 +110,7 @@ def get_all_forecasts():
     })
 
 @forecasting_bp.route('/forecasts/<product_id>', methods=['GET'])
+@conditional_get(forecast_data)
 def get_product_forecast(product_id):
     """Get demand forecast for specific product"""
     if product_id not in forecast_data:
@@ -57,48 +128,63 @@ def create_forecast():
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
+        if not valid_forecast_period(data['forecast_period_days']):
+            return jsonify({'error': FORECAST_PERIOD_ERROR}), 400
+        if data.get('model') is not None and data['model'] not in FORECAST_MODELS:
+            return jsonify({'error': f"Unknown model: {data['model']}", 'models': list(FORECAST_MODELS)}), 400
         
-        product_id = data['product_id']
-        forecast_period = data['forecast_period_days']
+        if wants_async():
+            return accepted(job_queue.submit('forecast_create', data))
         
-        # Get historical data for the product
-        historical = historical_data.get(product_id, [])
-        
-        if len(historical) < 7:  # Need at least 7 data points
+        product_id = data['product_id']
+        forecast = create_product_forecast(
+            product_id, data['forecast_period_days'], data.get('product_name', ''), data.get('model')
+        )
+        if forecast is None:
             return jsonify({'error': 'Insufficient historical data for forecasting'}), 400
         
-        # Generate forecast using simple moving average and trend analysis
-        forecast_result = generate_demand_forecast(product_id, historical, forecast_period)
-        
-        forecast_data[product_id] = {
-            'product_id': product_id,
-            'product_name': data.get('product_name', ''),
-            'forecast_period_days': forecast_period,
-            'predicted_demand': forecast_result['predicted_demand'],
-            'confidence_level': forecast_result['confidence_level'],
-            'trend_direction': forecast_result['trend_direction'],
-            'seasonal_factor': forecast_result['seasonal_factor'],
-            'forecast_breakdown': forecast_result['daily_forecast'],
-            'model_used': forecast_result['model_used'],
-            'created_date': datetime.utcnow().isoformat(),
-            'valid_until': (datetime.utcnow() + timedelta(days=forecast_period)).isoformat(),
-            'accuracy_score': forecast_result.get('accuracy_score', 0)
-        }
-        
-        # Trigger webhook for forecast update
-        trigger_forecast_webhook(forecast_data[product_id])
-        
         logger.info(f"Created demand forecast for product: {product_id}")
         
         return jsonify({
             'success': True,
-            'forecast': forecast_data[product_id]
+            'forecast': forecast
         }), 201
         
     except Exception as e:
         logger.error(f"Error creating forecast: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@forecasting_bp.route('/forecasts/batch', methods=['POST'])
+def create_forecasts_batch():
+    """Forecast many products (or "all") across the process pool, writing results back per chunk"""
+    try:
+        data = request.get_json() or {}
+        
+        if 'forecast_period_days' not in data:
+            return jsonify({'error': 'Missing required field: forecast_period_days'}), 400
+        if not valid_forecast_period(data['forecast_period_days']):
+            return jsonify({'error': FORECAST_PERIOD_ERROR}), 400
+        product_ids = data.get('product_ids', 'all')
+        if product_ids != 'all' and not isinstance(product_ids, list):
+            return jsonify({'error': 'product_ids must be a list or "all"'}), 400
+        chunk_size = data.get('chunk_size', DEFAULT_FORECAST_CHUNK)
+        if not isinstance(chunk_size, int) or not 0 < chunk_size <= MAX_FORECAST_CHUNK:
+            return jsonify({'error': f'chunk_size must be between 1 and {MAX_FORECAST_CHUNK}'}), 400
+        if data.get('model') is not None and data['model'] not in FORECAST_MODELS:
+            return jsonify({'error': f"Unknown model: {data['model']}", 'models': list(FORECAST_MODELS)}), 400
+        
+        if wants_async():
+            return accepted(job_queue.submit('forecast_batch', data))
+        
+        return jsonify({
+            'success': True,
+            **run_forecast_batch(product_ids, data['forecast_period_days'], chunk_size, model=data.get('model'))
+        })
+        
+    except Exception as e:
+        logger.error(f"Error creating batch forecasts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @forecasting_bp.route('/historical', methods=['POST'])
 def add_historical_data():
     """Add historical sales/demand data"""
@@ -111,56 +197,70 @@ def add_historical_data():
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         product_id = data['product_id']
+        row = (
+            to_day(data['date']), float(data['demand']), float(data.get('sales', 0)),
+            float(data.get('price', 0)), bool(data.get('promotions', False))
+        )
         
-        if product_id not in historical_data:
-            historical_data[product_id] = []
-        
-        historical_record = {
-            'date': data['date'],
-            'demand': data['demand'],
-            'sales': data.get('sales', 0),
-            'price': data.get('price', 0),
-            'promotions': data.get('promotions', False),
-            'external_factors': data.get('external_factors', {}),
-            'added_date': datetime.utcnow().isoformat()
-        }
-        
-        historical_data[product_id].append(historical_record)
-        
-        # Keep only last 365 days of data
-        cutoff_date = datetime.utcnow() - timedelta(days=365)
-        historical_data[product_id] = [
-            record for record in historical_data[product_id]
-            if datetime.fromisoformat(record['date']) > cutoff_date
-        ]
-        
-        # Sort by date
-        historical_data[product_id].sort(key=lambda x: x['date'])
+        # Only the last 365 days are kept; the ring buffer keeps them in date order
+        history = append_history({product_id: [row]})[product_id]
         
         logger.info(f"Added historical data for product: {product_id}")
         
         return jsonify({
             'success': True,
-            'total_records': len(historical_data[product_id])
+            'total_records': len(history) if history else 0
         })
         
     except Exception as e:
         logger.error(f"Error adding historical data: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@forecasting_bp.route('/historical/bulk', methods=['POST'])
+def add_historical_data_bulk():
+    """Add historical data for many products from a JSON array, NDJSON or CSV"""
+    try:
+        batch_size = max(min(request.args.get('batch_size', DEFAULT_INGEST_BATCH_SIZE, type=int),
+                             MAX_INGEST_BATCH_SIZE), 1)
+        
+        # NDJSON/CSV bodies are applied in batches as they stream in
+        stream_format = STREAM_FORMATS.get(request.mimetype)
+        if stream_format:
+            rows = iter_history_stream(request.stream, stream_format)
+        else:
+            data = request.get_json()
+            records = data.get('records') if isinstance(data, dict) else data
+            if not isinstance(records, list):
+                return jsonify({'error': 'Expected an array of records'}), 400
+            rows = iter_history_records(records)
+        
+        summary = ingest_history(rows, batch_size)
+        
+        logger.info(f"Ingested {summary['rows_applied']} history rows for {summary['products_updated']} products "
+                    f"in {summary['batches']} batches ({summary['rows_rejected']} rejected)")
+        
+        return jsonify({'success': True, **summary})
+        
+    except Exception as e:
+        logger.error(f"Error ingesting historical data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @forecasting_bp.route('/historical/<product_id>', methods=['GET'])
+@conditional_get(history_replica)
 def get_historical_data(product_id):
     """Get historical data for product"""
-    if product_id not in historical_data:
+    history = historical_data.get(product_id)
+    if history is None:
         return jsonify({'error': 'No historical data found for this product'}), 404
     
     return jsonify({
         'product_id': product_id,
-        'historical_data': historical_data[product_id],
-        'total_records': len(historical_data[product_id])
+        'historical_data': history.records(),
+        'total_records': len(history)
     })
 
 @forecasting_bp.route('/trends', methods=['GET'])
+@conditional_get(market_trends)
 def get_market_trends():
     """Get market trends data"""
     return jsonify({
@@ -207,48 +307,17 @@ def add_market_trend():
 def get_forecasting_analytics():
     """Get forecasting analytics and performance metrics"""
     try:
-        total_forecasts = len(forecast_data)
-        active_forecasts = len([f for f in forecast_data.values() 
-                              if datetime.fromisoformat(f['valid_until']) > datetime.utcnow()])
-        
-        # Calculate average accuracy
-        accuracy_scores = [f.get('accuracy_score', 0) for f in forecast_data.values() if f.get('accuracy_score', 0) > 0]
-        avg_accuracy = sum(accuracy_scores) / len(accuracy_scores) if accuracy_scores else 0
-        
-        # Get trend summary
-        trend_summary = {}
-        for trend in market_trends.values():
-            category = trend['category']
-            if category not in trend_summary:
-                trend_summary[category] = {'count': 0, 'avg_impact': 0}
-            trend_summary[category]['count'] += 1
-            trend_summary[category]['avg_impact'] += trend.get('impact_factor', 1.0)
-        
-        for category in trend_summary:
-            trend_summary[category]['avg_impact'] /= trend_summary[category]['count']
-        
-        analytics = {
-            'summary': {
-                'total_forecasts': total_forecasts,
-                'active_forecasts': active_forecasts,
-                'average_accuracy': round(avg_accuracy, 2),
-                'total_products_tracked': len(historical_data)
-            },
-            'performance': {
-                'forecast_accuracy_trend': calculate_accuracy_trend(),
-                'most_accurate_model': get_most_accurate_model(),
-                'seasonal_patterns_detected': count_seasonal_patterns()
-            },
-            'market_trends': trend_summary
-        }
+        if wants_async():
+            return accepted(job_queue.submit('forecasting_analytics'))
         
-        return jsonify(analytics)
+        return jsonify(compute_forecasting_analytics())
         
     except Exception as e:
         logger.error(f"Error getting analytics: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @forecasting_bp.route('/models', methods=['GET'])
+@conditional_get(forecast_models)
 def get_forecast_models():
     """Get available forecasting models"""
     return jsonify({
@@ -257,29 +326,84 @@ def get_forecast_models():
                 'model_id': 'moving_average',
                 'name': 'Moving Average',
                 'description': 'Simple moving average with trend adjustment',
-                'best_for': 'Stable demand patterns'
+                'best_for': 'Stable demand patterns',
+                'online_updates': False
             },
             {
                 'model_id': 'exponential_smoothing',
                 'name': 'Exponential Smoothing',
                 'description': 'Weighted average giving more importance to recent data',
-                'best_for': 'Trending demand patterns'
+                'best_for': 'Trending demand patterns',
+                'online_updates': True
             },
             {
                 'model_id': 'seasonal_decomposition',
                 'name': 'Seasonal Decomposition',
                 'description': 'Separates trend, seasonal, and irregular components',
-                'best_for': 'Seasonal demand patterns'
+                'best_for': 'Seasonal demand patterns',
+                'online_updates': True
             },
             {
                 'model_id': 'linear_regression',
                 'name': 'Linear Regression',
                 'description': 'Linear trend-based forecasting',
-                'best_for': 'Linear growth patterns'
+                'best_for': 'Linear growth patterns',
+                'online_updates': True
             }
-        ]
+        ],
+        'default_model': DEFAULT_FORECAST_MODEL,
+        'product_selections': len(forecast_models)
     })
 
+@forecasting_bp.route('/models/<product_id>', methods=['GET'])
+@conditional_get(forecast_models, history_replica)
+def get_product_model(product_id):
+    """Get the model used for a product and its fitted model states"""
+    history = historical_data.get(product_id)
+    return jsonify({
+        'product_id': product_id,
+        'model': resolve_model(product_id),
+        'selection': forecast_models.get(product_id),
+        'fitted': {
+            model_id: ONLINE_MODELS[model_id].describe(state) for model_id, state in history.fits.items()
+        } if history else {}
+    })
+
+@forecasting_bp.route('/models/<product_id>', methods=['PUT'])
+def select_product_model(product_id):
+    """Select the model used to forecast a product"""
+    try:
+        data = request.get_json() or {}
+        
+        model_id = data.get('model')
+        if model_id not in FORECAST_MODELS:
+            return jsonify({'error': f'Unknown model: {model_id}', 'models': list(FORECAST_MODELS)}), 400
+        
+        forecast_models[product_id] = {
+            'product_id': product_id,
+            'model': model_id,
+            'selected_at': datetime.utcnow().isoformat()
+        }
+        # Fit now so the product's forecasts start from an up-to-date state
+        ensure_fitted([product_id], model_id)
+        
+        logger.info(f"Selected forecasting model {model_id} for product: {product_id}")
+        
+        return jsonify({'success': True, 'selection': forecast_models[product_id]})
+        
+    except Exception as e:
+        logger.error(f"Error selecting forecasting model: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@forecasting_bp.route('/models/<product_id>', methods=['DELETE'])
+def clear_product_model(product_id):
+    """Go back to the default model for a product"""
+    if product_id not in forecast_models:
+        return jsonify({'error': 'No model selected for this product'}), 404
+    
+    del forecast_models[product_id]
+    return jsonify({'success': True, 'model': DEFAULT_FORECAST_MODEL})
+
 @forecasting_bp.route('/accuracy/<product_id>', methods=['POST'])
 def update_forecast_accuracy(product_id):
     """Update forecast accuracy based on actual results"""
@@ -309,6 +433,7 @@ def update_forecast_accuracy(product_id):
         forecast['percentage_error'] = round(percentage_error, 2)
         forecast['accuracy_score'] = round(accuracy, 2)
         forecast['accuracy_updated'] = datetime.utcnow().isoformat()
+        forecast_data.commit(product_id)
         
         logger.info(f"Updated forecast accuracy for product {product_id}: {accuracy}%")
         
@@ -327,87 +452,383 @@ def update_forecast_accuracy(product_id):
         logger.error(f"Error updating forecast accuracy: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def generate_demand_forecast(product_id, historical, forecast_period):
-    """Generate demand forecast using multiple models"""
-    try:
-        # Extract demand values
-        demands = [record['demand'] for record in historical[-30:]]  # Last 30 days
-        
-        if len(demands) < 7:
-            raise ValueError("Insufficient data for forecasting")
-        
-        # Simple moving average
-        ma_forecast = sum(demands[-7:]) / 7  # 7-day moving average
-        
-        # Trend calculation
-        if len(demands) >= 14:
-            recent_avg = sum(demands[-7:]) / 7
-            older_avg = sum(demands[-14:-7]) / 7
-            trend = (recent_avg - older_avg) / 7  # Daily trend
+def compute_forecasting_analytics():
+    """Calculate forecast accuracy, coverage and market trend summaries"""
+    total_forecasts = len(forecast_data)
+    active_forecasts = len([f for f in forecast_data.values() 
+                          if datetime.fromisoformat(f['valid_until']) > datetime.utcnow()])
+    
+    # Calculate average accuracy
+    accuracy_scores = [f.get('accuracy_score', 0) for f in forecast_data.values() if f.get('accuracy_score', 0) > 0]
+    avg_accuracy = sum(accuracy_scores) / len(accuracy_scores) if accuracy_scores else 0
+    
+    # Get trend summary
+    trend_summary = {}
+    for trend in market_trends.values():
+        category = trend['category']
+        if category not in trend_summary:
+            trend_summary[category] = {'count': 0, 'avg_impact': 0}
+        trend_summary[category]['count'] += 1
+        trend_summary[category]['avg_impact'] += trend.get('impact_factor', 1.0)
+    
+    for category in trend_summary:
+        trend_summary[category]['avg_impact'] /= trend_summary[category]['count']
+    
+    analytics = {
+        'summary': {
+            'total_forecasts': total_forecasts,
+            'active_forecasts': active_forecasts,
+            'average_accuracy': round(avg_accuracy, 2),
+            'total_products_tracked': len(historical_data)
+        },
+        'performance': {
+            'forecast_accuracy_trend': calculate_accuracy_trend(),
+            'most_accurate_model': get_most_accurate_model(),
+            'seasonal_patterns_detected': count_seasonal_patterns()
+        },
+        'market_trends': trend_summary
+    }
+    
+    return analytics
+
+def resolve_model(product_id, model=None):
+    """The model to forecast a product with: `model` if given, else its selection, else the default"""
+    if model is None:
+        model = forecast_models.get(product_id, {}).get('model', DEFAULT_FORECAST_MODEL)
+    if model not in FORECAST_MODELS:
+        raise ValueError(f'Unknown forecasting model: {model}')
+    return model
+
+def valid_forecast_period(days):
+    """Whether `days` is a forecast period the models support (1..MAX_FORECAST_PERIOD_DAYS whole days)"""
+    return isinstance(days, int) and not isinstance(days, bool) and 1 <= days <= MAX_FORECAST_PERIOD_DAYS
+
+def ensure_fitted(product_ids, model_id):
+    """Fit an online model for the products that do not have it yet, publishing the fits.
+
+    Fitting walks the whole history once; from then on every new
+    observation updates the fit in O(1).
+    """
+    if model_id not in ONLINE_MODELS:
+        return
+    
+    def fit(product_id, history):
+        if history.size and model_id not in history.fits:  # another worker may have fitted it first
+            history.fit(model_id)
+    
+    write_histories({product_id: () for product_id in historical_data.unfitted(product_ids, model_id)}, fit)
+
+def create_product_forecast(product_id, forecast_period, product_name='', model=None):
+    """Generate and store a forecast for a product, or return None without enough history"""
+    if not valid_forecast_period(forecast_period):
+        raise ValueError(FORECAST_PERIOD_ERROR)
+    model_id = resolve_model(product_id, model)
+    
+    # Get historical data for the product
+    history = historical_data.get(product_id)
+    
+    if history is None or len(history) < 7:  # Need at least 7 data points
+        return None
+    
+    ensure_fitted([product_id], model_id)
+    forecast_result = generate_demand_forecast(product_id, historical_data.get(product_id), forecast_period, model_id)
+    
+    forecast_data[product_id] = forecast_record(product_id, product_name, forecast_period, forecast_result)
+    
+    # Trigger webhook for forecast update
+    trigger_forecast_webhook(forecast_data[product_id])
+    
+    return forecast_data[product_id]
+
+def forecast_record(product_id, product_name, forecast_period, forecast_result):
+    """Build the stored forecast for a product from an engine result"""
+    return {
+        'product_id': product_id,
+        'product_name': product_name,
+        'forecast_period_days': forecast_period,
+        'predicted_demand': forecast_result['predicted_demand'],
+        'confidence_level': forecast_result['confidence_level'],
+        'trend_direction': forecast_result['trend_direction'],
+        'seasonal_factor': forecast_result['seasonal_factor'],
+        'forecast_breakdown': forecast_result['daily_forecast'],
+        'model_used': forecast_result['model_used'],
+        'created_date': datetime.utcnow().isoformat(),
+        'valid_until': (datetime.utcnow() + timedelta(days=forecast_period)).isoformat(),
+        'accuracy_score': forecast_result.get('accuracy_score', 0)
+    }
+
+def forecast_pool():
+    """This worker's forecasting process pool (spawned, so children never inherit worker threads)"""
+    global _forecast_pool
+    with _forecast_pool_lock:
+        if _forecast_pool is None or _forecast_pool[1] != os.getpid():
+            _forecast_pool = (
+                ProcessPoolExecutor(FORECAST_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn')),
+                os.getpid()
+            )
+        return _forecast_pool[0]
+
+def reset_forecast_pool(broken):
+    """Shut down a broken pool, so its management thread and surviving children exit, and drop it unless already replaced"""
+    global _forecast_pool
+    broken.shutdown(wait=False, cancel_futures=True)
+    with _forecast_pool_lock:
+        if _forecast_pool is not None and _forecast_pool[0] is broken:
+            _forecast_pool = None
+
+def run_forecast_batch(product_ids, forecast_period, chunk_size=DEFAULT_FORECAST_CHUNK, report=None, model=None):
+    """Forecast products in chunks on the process pool, bulk-writing each chunk as it completes.
+
+    Every product uses `model`, or its own selection when `model` is None.
+    Products with fewer than 7 history points are reported as
+    insufficient_data without being sent to the pool. `report(progress,
+    message)` is called after every chunk.
+    """
+    if not valid_forecast_period(forecast_period):
+        raise ValueError(FORECAST_PERIOD_ERROR)
+    started = time.perf_counter()
+    history_replica.refresh()
+    if product_ids == 'all':
+        product_ids = list(historical_data)
+    
+    models, insufficient_data = {}, []
+    for product_id in product_ids:
+        history = historical_data.get(product_id)
+        if history is None or len(history) < 7:
+            insufficient_data.append(product_id)
         else:
-            trend = 0
-        
-        # Seasonal factor (simplified)
-        seasonal_factor = 1.0
-        current_day = datetime.utcnow().weekday()
-        if len(demands) >= 14:
-            # Calculate weekly pattern
-            weekly_pattern = {}
-            for i, record in enumerate(historical[-14:]):
-                day = datetime.fromisoformat(record['date']).weekday()
-                if day not in weekly_pattern:
-                    weekly_pattern[day] = []
-                weekly_pattern[day].append(record['demand'])
-            
-            if current_day in weekly_pattern:
-                day_avg = sum(weekly_pattern[current_day]) / len(weekly_pattern[current_day])
-                overall_avg = sum(demands[-14:]) / 14
-                seasonal_factor = day_avg / max(overall_avg, 1)
-        
-        # Generate daily forecast
-        daily_forecast = []
-        base_demand = ma_forecast
-        
-        for day in range(forecast_period):
-            # Apply trend
-            daily_demand = base_demand + (trend * day)
-            
-            # Apply seasonal factor
-            day_of_week = (current_day + day) % 7
-            if day_of_week in [5, 6]:  # Weekend
-                daily_demand *= 0.8  # Assume lower weekend demand
+            models[product_id] = resolve_model(product_id, model)
+    model_counts = {}
+    for model_id in models.values():
+        model_counts[model_id] = model_counts.get(model_id, 0) + 1
+    for model_id in model_counts:
+        ensure_fitted([product_id for product_id, selected in models.items() if selected == model_id], model_id)
+    
+    # Online models ship only their fitted state to the pool
+    items = []
+    for product_id, model_id in models.items():
+        history = historical_data.get(product_id)
+        data = history.window(HISTORY_DAYS) if model_id == MOVING_AVERAGE else history.fits[model_id]
+        items.append((product_id, model_id, data))
+    chunks = [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)]
+    
+    today = datetime.utcnow().date().isoformat()
+    pool = forecast_pool()
+    futures = {}
+    
+    chunk_stats, failures = [], []
+    forecasted = 0
+    try:
+        # A pool broken since its last batch already fails here
+        for index, chunk in enumerate(chunks):
+            futures[pool.submit(forecast_chunk, chunk, forecast_period, today)] = (index, time.perf_counter())
+        for future in as_completed(futures):
+            index, submitted = futures[future]
+            results, chunk_failures, compute_ms = future.result()
             
-            daily_demand *= seasonal_factor
-            daily_demand = max(0, daily_demand)  # Ensure non-negative
+            write_started = time.perf_counter()
+            forecast_data.update({
+                product_id: forecast_record(
+                    product_id, forecast_data.get(product_id, {}).get('product_name', ''), forecast_period, result
+                )
+                for product_id, result in results
+            })
+            write_ms = (time.perf_counter() - write_started) * 1000
             
-            daily_forecast.append({
-                'date': (datetime.utcnow() + timedelta(days=day)).isoformat()[:10],
-                'predicted_demand': round(daily_demand, 2)
+            forecasted += len(results)
+            failures.extend({'product_id': product_id, 'error': error} for product_id, error in chunk_failures)
+            chunk_stats.append({
+                'chunk': index,
+                'products': len(chunks[index]),
+                'forecasted': len(results),
+                'failed': len(chunk_failures),
+                'compute_ms': round(compute_ms, 3),
+                'write_ms': round(write_ms, 3),
+                'elapsed_ms': round((time.perf_counter() - submitted) * 1000, 3)
             })
-        
-        # Calculate total predicted demand
-        total_predicted = sum(day['predicted_demand'] for day in daily_forecast)
-        
-        # Determine confidence level based on data quality
-        confidence = min(95, 60 + (len(demands) * 2))  # More data = higher confidence
-        
-        # Determine trend direction
-        if trend > 0.1:
-            trend_direction = 'increasing'
-        elif trend < -0.1:
-            trend_direction = 'decreasing'
-        else:
-            trend_direction = 'stable'
-        
-        return {
-            'predicted_demand': round(total_predicted, 2),
-            'confidence_level': confidence,
-            'trend_direction': trend_direction,
-            'seasonal_factor': round(seasonal_factor, 2),
-            'daily_forecast': daily_forecast,
-            'model_used': 'moving_average_with_trend',
-            'accuracy_score': 0  # Will be updated when actual data is available
-        }
+            if report is not None:
+                report(len(chunk_stats) / len(chunks), f"Forecasted {len(chunk_stats)} of {len(chunks)} chunks")
+    except BrokenProcessPool:
+        reset_forecast_pool(pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    
+    elapsed = time.perf_counter() - started
+    logger.info(f"Batch forecast: {forecasted} products in {len(chunks)} chunks, "
+                f"{len(failures)} failed, {len(insufficient_data)} without enough history, in {elapsed:.2f}s")
+    
+    return {
+        'forecast_period_days': forecast_period,
+        'requested': len(product_ids),
+        'forecasted': forecasted,
+        'failed': len(failures),
+        'failures': failures,
+        'insufficient_data': insufficient_data,
+        'models': model_counts,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'throughput_per_second': round(forecasted / elapsed, 1) if elapsed else 0.0,
+        'pool_workers': FORECAST_POOL_WORKERS,
+        'chunks': sorted(chunk_stats, key=lambda chunk: chunk['chunk'])
+    }
+
+def write_histories(groups, change):
+    """Apply `change(product_id, history)` to copies of the products' histories and publish them.
+
+    `groups` maps each product to the rows the change appends (empty
+    for a change that appends none). The copies are changed and encoded
+    without holding the shared write lock, which is then taken only to
+    check that no worker wrote those products in the meantime and to
+    publish. Products written meanwhile are redone from their new state.
+    Returns the changed histories.
+    """
+    histories = {}
+    pending = list(groups)
+    while pending:
+        with history_replica.pinned() as since:
+            copies = {product_id: historical_data.checkout(product_id) for product_id in pending}
+        encoded = {}
+        for product_id, (history, appended) in copies.items():
+            change(product_id, history)
+            encoded[product_id] = historical_data.encode(product_id, history, appended, groups[product_id])
+        
+        with history_replica.exclusive():
+            stale = history_replica.written_since(
+                since, [key for product_id in pending for key in historical_data.keys(product_id)]
+            )
+            fresh = [product_id for product_id in pending if stale.isdisjoint(historical_data.keys(product_id))]
+            entries = {}
+            for product_id in fresh:
+                product_entries, appended = encoded[product_id]
+                historical_data.put(product_id, copies[product_id][0], appended)
+                entries.update(product_entries)
+            history_replica.publish(entries)
+        
+        histories.update((product_id, copies[product_id][0]) for product_id in fresh)
+        pending = [product_id for product_id in pending if product_id not in histories]
+    return histories
+
+def append_history(groups, retain_from=None):
+    """Apply {product_id: [(day, demand, sales, price, promotions), ...]} and publish it.
+
+    Each product's rows go into its ring buffer in one step. Returns the
+    updated histories (None for products left without any).
+    """
+    if retain_from is None:
+        retain_from = retention_start()
+    histories = write_histories(groups, lambda product_id, history: history.add(groups[product_id], retain_from))
+    return {product_id: history if history.size else None for product_id, history in histories.items()}
+
+def ingest_history(rows, batch_size=DEFAULT_INGEST_BATCH_SIZE):
+    """Apply (row_number, product_id, row, error) tuples in batches of at most `batch_size` rows.
+
+    Rows of a batch are grouped by product and sorted by day, so each
+    product takes one mostly append-only write per batch. Only one batch
+    is held in memory at a time.
+    """
+    started = time.perf_counter()
+    retain_from = retention_start()
+    
+    pending = {}  # product_id -> rows of the current batch
+    pending_rows = 0
+    products = set()
+    rejected_rows = []
+    rows_read = rows_applied = rows_rejected = rows_expired = 0
+    batches = 0
+    
+    def flush():
+        nonlocal pending_rows, rows_applied, batches
+        for group in pending.values():
+            group.sort(key=lambda row: row[0])  # stable, so a day's last row wins
+        append_history(pending, retain_from)
+        products.update(pending)
+        rows_applied += pending_rows
+        batches += 1
+        pending.clear()
+        pending_rows = 0
+    
+    for row_number, product_id, row, error in rows:
+        rows_read += 1
+        if error:
+            rows_rejected += 1
+            if len(rejected_rows) < MAX_REPORTED_REJECTIONS:
+                rejected_rows.append({'row': row_number, 'product_id': product_id, 'error': error})
+            continue
+        if row[0] < retain_from:
+            rows_expired += 1
+            continue
+        
+        pending.setdefault(product_id, []).append(row)
+        pending_rows += 1
+        if pending_rows >= batch_size:
+            flush()
+    
+    if pending:
+        flush()
+    
+    return {
+        'products_updated': len(products),
+        'rows_read': rows_read,
+        'rows_applied': rows_applied,
+        'rows_expired': rows_expired,
+        'rows_rejected': rows_rejected,
+        'rejected_rows': rejected_rows,
+        'batches': batches,
+        'batch_size': batch_size,
+        'total_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def iter_history_stream(stream, stream_format):
+    """Yield (line_number, product_id, row, error) for each row of an NDJSON/CSV history body"""
+    for line_number, record, error in iter_stream_records(stream, stream_format):
+        if error:
+            yield line_number, None, None, error
+            continue
+        yield (line_number, *parse_history_row(record))
+
+def iter_history_records(records):
+    """Yield (index, product_id, row, error) for each record of a JSON array, counting from 1"""
+    for index, record in enumerate(records, start=1):
+        yield (index, *parse_history_row(record))
+
+def parse_history_row(record):
+    """Validate one bulk history record, returning (product_id, row, error)"""
+    if not isinstance(record, dict):
+        return None, None, 'Row is not an object'
+    product_id = record.get('product_id')
+    if not product_id:
+        return None, None, 'Missing product_id'
+    
+    try:
+        day = to_day(record['date'])
+    except (KeyError, TypeError, ValueError):
+        return product_id, None, 'Invalid date'
+    
+    values = []
+    for field in ('demand', 'sales', 'price'):
+        value = record.get(field)
+        if value is None or value == '':
+            if field == 'demand':
+                return product_id, None, 'Missing demand'
+            value = 0
+        if isinstance(value, bool):
+            return product_id, None, f'Invalid {field}'
+        try:
+            values.append(float(value))
+        except (TypeError, ValueError):
+            return product_id, None, f'Invalid {field}'
+    
+    promotions = record.get('promotions', False)
+    if isinstance(promotions, str):
+        promotions = promotions.strip().lower() in ('1', 'true', 'yes')
+    return product_id, (day, *values, bool(promotions)), None
+
+def generate_demand_forecast(product_id, history, forecast_period, model_id=MOVING_AVERAGE):
+    """Forecast from the recent window (moving_average) or the product's fitted state (online models)"""
+    try:
+        data = history.window(HISTORY_DAYS) if model_id == MOVING_AVERAGE else history.fits[model_id]
+        return forecast_with(model_id, data, forecast_period)
         
     except Exception as e:
         logger.error(f"Error generating forecast: {str(e)}")
@@ -479,3 +900,32 @@ def count_seasonal_patterns():
     
     return seasonal_count
 
+def run_forecast_job(job, payload):
+    """Create forecasts for `product_id` or every entry of `product_ids`, reporting progress per product"""
+    product_ids = payload.get('product_ids') or [payload['product_id']]
+    forecasts = []
+    insufficient_data = []
+    
+    for index, product_id in enumerate(product_ids):
+        job.report(index / len(product_ids), f"Forecasting {product_id}")
+        forecast = create_product_forecast(
+            product_id, payload['forecast_period_days'], payload.get('product_name', ''), payload.get('model')
+        )
+        if forecast is None:
+            insufficient_data.append(product_id)
+        else:
+            forecasts.append(forecast)
+    
+    logger.info(f"Created {len(forecasts)} demand forecasts in job {job.job_id}")
+    
+    return {'forecasts': forecasts, 'insufficient_data': insufficient_data}
+
+job_queue.register('forecast_create', run_forecast_job, concurrency=2)
+job_queue.register(
+    'forecast_batch',
+    lambda job, payload: run_forecast_batch(
+        payload.get('product_ids', 'all'), payload['forecast_period_days'],
+        payload.get('chunk_size', DEFAULT_FORECAST_CHUNK), job.report, payload.get('model')
+    )
+)
+job_queue.register('forecasting_analytics', lambda job, payload: compute_forecasting_analytics(), concurrency=2)
@@ -1,17 +1,118 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import logging
-import json
+import math
+import os
+import time
+from array import array
+from functools import wraps
+from statistics import NormalDist
+import numpy as np
+from src.models.inventory_store import (
+    InventoryStore, PRODUCT_FIELDS, STATUS_NAMES, NORMAL, STOCKOUT, OVERSTOCK, stock_status_code
+)
+from src.models.alert_log import AlertLog
+from src.models.inventory_repository import InventoryRepository
+from src.models.shared_state import shared_state, SharedNamespace, SharedLog
+from src.models.stock_ledger import StockLedger, MOVEMENT_KINDS, ADJUSTMENT, SALE, TRANSFER
+from src.models.user import db
+from src.routes.conditional import conditional_get
+from src.routes.forecasting import forecast_data as demand_forecasts, historical_data
+from src.routes.metrics import track_store, track_backlog
+from src.routes.reorder import reorder_rules
+from src.routes.snapshots import state_snapshots
+from src.routes.streaming import STREAM_FORMATS, StreamDecodeError, iter_stream_records
+from src.routes.supplier import suppliers_data
 
 inventory_bp = Blueprint('inventory', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-inventory_data = {}
+# In-memory working set; every write is persisted through the repository
+inventory_data = InventoryStore()
+inventory_repository = InventoryRepository(db)
+# Stock levels are derived from an append-only movement ledger
+stock_ledger = StockLedger(
+    os.environ.get('STOCK_LEDGER_DIR',
+                   os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'ledger')),
+    snapshot_every=int(os.environ.get('STOCK_LEDGER_SNAPSHOT_EVERY', 100000))
+)
 inventory_rules = {}
-inventory_alerts = []
+inventory_alerts = AlertLog(int(os.environ.get('INVENTORY_ALERT_RETENTION', 10000)))
+# Writes are published to shared state and replayed by every other worker;
+# alerts are applied by all workers (the writer included) in shared order
+inventory_replica = SharedNamespace(
+    shared_state, 'inventory', lambda product_id, record: inventory_data.load_record(record)
+)
+alert_replica = SharedLog(
+    shared_state, 'inventory_alerts', lambda seq, alert: inventory_alerts.append(alert, seq),
+    retain=inventory_alerts.capacity
+)
+
+def dump_inventory_snapshot():
+    """Capture the columnar store at a version no write can interleave with"""
+    with stock_ledger.transaction():
+        inventory_replica.refresh()
+        return inventory_replica.seen, inventory_data.to_snapshot()
+
+state_snapshots.register('inventory', dump_inventory_snapshot, lambda: inventory_replica.version)
+track_store('inventory_products', inventory_data)
+track_store('inventory_rules', inventory_rules)
+track_backlog('inventory_alerts', inventory_alerts)
+
+# Streaming sync: micro-batch sizing
+DEFAULT_SYNC_BATCH_SIZE = 5000
+MAX_SYNC_BATCH_SIZE = 50000
+
+# Recommended-stock engine defaults
+DEFAULT_SERVICE_LEVEL = 0.95
+DEFAULT_LEAD_TIME_DAYS = 7
+DEMAND_HISTORY_DAYS = 90
+# Demand forecast fields a client may send, with the range each must be in
+FORECAST_FIELD_CHECKS = {
+    'predicted_demand': lambda value: value >= 0,
+    'forecast_period': lambda value: value > 0,
+    'confidence_level': lambda value: 0 <= value <= 1,
+    'demand_std_dev': lambda value: value >= 0,
+    'lead_time_days': lambda value: value >= 0
+}
+
+# Listing endpoints: page size cap and projectable fields
+MAX_PAGE_LIMIT = 1000
+PRODUCT_EXTRA_FIELDS = ('stock_by_location', 'demand_forecast', 'recommended_stock')
+ALERT_FIELDS = (
+    'id', 'type', 'product_id', 'product_name', 'current_stock', 'min_threshold',
+    'max_threshold', 'severity', 'message', 'timestamp', 'webhook_data'
+)
+
+# Product fields snapshotted into an alert's webhook_data
+ALERT_PRODUCT_FIELDS = (
+    'product_id', 'name', 'sku', 'current_stock', 'min_threshold', 'max_threshold',
+    'location', 'supplier', 'status'
+)
+
+@inventory_bp.before_app_request
+def refresh_inventory():
+    """Apply inventory and alerts written by other workers since the last request"""
+    inventory_replica.refresh()
+    alert_replica.refresh()
+
+def serialized_write(func):
+    """Run an inventory write holding the ledger lock, starting from the latest shared state.
+    
+    Every write publishes whole product records, current stock included;
+    serializing them across workers keeps one worker's update (or a
+    catalogue-wide recompute) from overwriting another's with stale values.
+    The replica stays pinned meanwhile, so this worker's other threads do
+    not add rows to the store's columns while a write has NumPy views of them.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with stock_ledger.transaction(), inventory_replica.pinned():
+            return func(*args, **kwargs)
+    return wrapper
 
 @inventory_bp.route('/status', methods=['GET'])
+@conditional_get(inventory_replica, alert_replica)
 def inventory_status():
     """Get inventory management bot status"""
     return jsonify({
@@ -25,26 +126,46 @@ def inventory_status():
             'automated_reorder_triggers'
         ],
         'total_products': len(inventory_data),
+        'version': inventory_replica.version,
+        'status_counts': inventory_data.status_counts(),
+        'total_locations': len(inventory_data.location_totals),
         'active_alerts': len(inventory_alerts)
     })
 
 @inventory_bp.route('/products', methods=['GET'])
+@conditional_get(inventory_replica)
 def get_all_products():
-    """Get all products in inventory"""
+    """Get products in inventory, with optional cursor pagination, filters and field projection"""
+    try:
+        listing = parse_listing_args(request.args, PRODUCT_FIELDS + PRODUCT_EXTRA_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    rows, next_row = inventory_data.scan(
+        start=listing['cursor'],
+        limit=listing['limit'],
+        **listing['filters']
+    )
+    
     return jsonify({
-        'products': list(inventory_data.values()),
-        'total_count': len(inventory_data)
+        'products': inventory_data.records(rows, listing['fields']),
+        'count': len(rows),
+        'total_count': len(inventory_data),
+        'next_cursor': None if next_row is None else str(next_row)
     })
 
 @inventory_bp.route('/products/<product_id>', methods=['GET'])
+@conditional_get(inventory_replica)
 def get_product(product_id):
     """Get specific product inventory details"""
-    if product_id not in inventory_data:
+    product = inventory_data.get(product_id)
+    if product is None:
         return jsonify({'error': 'Product not found'}), 404
     
-    return jsonify(inventory_data[product_id])
+    return jsonify(product)
 
 @inventory_bp.route('/products', methods=['POST'])
+@serialized_write
 def add_product():
     """Add new product to inventory tracking"""
     try:
@@ -56,30 +177,36 @@ def add_product():
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         product_id = data['product_id']
+        existing_row = inventory_data.row(product_id)
+        previous_status = NORMAL if existing_row is None else inventory_data.status[existing_row]
+        before = {} if existing_row is None else {existing_row: dict(inventory_data.stock_by_location[existing_row])}
         
-        inventory_data[product_id] = {
-            'product_id': product_id,
-            'name': data['name'],
-            'sku': data.get('sku', ''),
-            'current_stock': data['current_stock'],
-            'min_threshold': data['min_threshold'],
-            'max_threshold': data['max_threshold'],
-            'unit': data.get('unit', 'units'),
-            'location': data.get('location', 'main_warehouse'),
-            'supplier': data.get('supplier', ''),
-            'cost_per_unit': data.get('cost_per_unit', 0),
-            'last_updated': datetime.utcnow().isoformat(),
-            'status': determine_stock_status(data['current_stock'], data['min_threshold'], data['max_threshold'])
-        }
+        row = inventory_data.upsert(
+            product_id,
+            data['name'],
+            data['current_stock'],
+            data['min_threshold'],
+            data['max_threshold'],
+            sku=data.get('sku', ''),
+            unit=data.get('unit', 'units'),
+            location=data.get('location', 'main_warehouse'),
+            supplier=data.get('supplier', ''),
+            cost_per_unit=data.get('cost_per_unit', 0),
+            last_updated=datetime.utcnow().isoformat()
+        )
+        
+        inventory_repository.save(inventory_data, [row], replace_levels=True)
+        record_stock_changes([row], before)
+        publish_inventory([row])
         
         # Check for alerts
-        check_inventory_alerts(product_id)
+        check_inventory_alerts(product_id, previous_status)
         
         logger.info(f"Added product to inventory: {product_id}")
         
         return jsonify({
             'success': True,
-            'product': inventory_data[product_id]
+            'product': inventory_data.materialize(row)
         }), 201
         
     except Exception as e:
@@ -87,124 +214,317 @@ def add_product():
         return jsonify({'error': str(e)}), 500
 
 @inventory_bp.route('/products/<product_id>', methods=['PUT'])
+@serialized_write
 def update_product(product_id):
     """Update product inventory levels"""
     try:
-        if product_id not in inventory_data:
+        row = inventory_data.row(product_id)
+        if row is None:
             return jsonify({'error': 'Product not found'}), 404
         
         data = request.get_json()
-        product = inventory_data[product_id]
-        
-        # Update fields
-        if 'current_stock' in data:
-            product['current_stock'] = data['current_stock']
-        if 'min_threshold' in data:
-            product['min_threshold'] = data['min_threshold']
-        if 'max_threshold' in data:
-            product['max_threshold'] = data['max_threshold']
-        
-        product['last_updated'] = datetime.utcnow().isoformat()
-        product['status'] = determine_stock_status(
-            product['current_stock'], 
-            product['min_threshold'], 
-            product['max_threshold']
+        previous_status = inventory_data.status[row]
+        before = {row: dict(inventory_data.stock_by_location[row])}
+        
+        # Update fields and reclassify
+        inventory_data.update(
+            row,
+            datetime.utcnow().isoformat(),
+            current_stock=data.get('current_stock'),
+            min_threshold=data.get('min_threshold'),
+            max_threshold=data.get('max_threshold')
         )
         
+        inventory_repository.save(inventory_data, [row])
+        record_stock_changes([row], before)
+        publish_inventory([row])
+        
         # Check for alerts
-        check_inventory_alerts(product_id)
+        check_inventory_alerts(product_id, previous_status)
         
         logger.info(f"Updated product inventory: {product_id}")
         
         return jsonify({
             'success': True,
-            'product': product
+            'product': inventory_data.materialize(row)
         })
         
     except Exception as e:
         logger.error(f"Error updating product: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@inventory_bp.route('/changes', methods=['GET'])
+@conditional_get(inventory_replica)
+def get_changes():
+    """Get products modified after a given shared inventory version (change feed)"""
+    since = request.args.get('since', '0')
+    if not since.isdigit():
+        return jsonify({'error': 'Invalid since version'}), 400
+    
+    try:
+        listing = parse_listing_args(request.args, PRODUCT_FIELDS + PRODUCT_EXTRA_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The high-water mark comes from committed entries only: versions commit in
+    # order, so everything up to the newest change read is already visible
+    feed = inventory_replica.changed_since(int(since))
+    version = feed[-1][1] if feed else min(int(since), inventory_replica.version)
+    inventory_replica.refresh()  # the local store must hold every change the feed listed
+    changes = [
+        (inventory_data.row(product_id), change_version)
+        for product_id, change_version in feed
+        if product_id in inventory_data
+    ]
+    has_more = False
+    
+    # Page on whole versions so rows written together are never split
+    limit = listing['limit']
+    if limit is not None and len(changes) > limit:
+        end = limit
+        while end < len(changes) and changes[end][1] == changes[limit - 1][1]:
+            end += 1
+        has_more = end < len(changes)
+        if has_more:
+            version = changes[end - 1][1]
+            changes = changes[:end]
+    
+    return jsonify({
+        'products': inventory_data.records([row for row, _ in changes], listing['fields']),
+        'count': len(changes),
+        'since': int(since),
+        'version': version,
+        'has_more': has_more
+    })
+
+@inventory_bp.route('/products/<product_id>/locations', methods=['GET'])
+@conditional_get(inventory_replica)
+def get_product_locations(product_id):
+    """Get a product's stock broken down by location"""
+    row = inventory_data.row(product_id)
+    if row is None:
+        return jsonify({'error': 'Product not found'}), 404
+    
+    return jsonify(inventory_data.materialize(row, ('product_id', 'current_stock', 'stock_by_location')))
+
+@inventory_bp.route('/products/<product_id>/locations', methods=['PUT'])
+@serialized_write
+def update_product_locations(product_id):
+    """Set location-scoped stock quantities for a product"""
+    try:
+        row = inventory_data.row(product_id)
+        if row is None:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        data = request.get_json()
+        quantities = data.get('locations')
+        if not isinstance(quantities, dict) or not quantities:
+            return jsonify({'error': 'Missing required field: locations'}), 400
+        
+        previous_status = inventory_data.status[row]
+        before = {row: dict(inventory_data.stock_by_location[row])}
+        inventory_data.set_location_stock(row, quantities, datetime.utcnow().isoformat())
+        inventory_repository.save(inventory_data, [row])
+        record_stock_changes([row], before)
+        publish_inventory([row])
+        
+        # Check for alerts
+        check_inventory_alerts(product_id, previous_status)
+        
+        logger.info(f"Updated location stock for product: {product_id}")
+        
+        return jsonify({
+            'success': True,
+            'product': inventory_data.materialize(row, PRODUCT_FIELDS + ('stock_by_location',))
+        })
+        
+    except Exception as e:
+        logger.error(f"Error updating location stock: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@inventory_bp.route('/locations', methods=['GET'])
+@conditional_get(inventory_replica)
+def get_locations():
+    """Get stock and value roll-ups per location"""
+    locations = inventory_data.location_summary()
+    return jsonify({
+        'locations': locations,
+        'total_count': len(locations)
+    })
+
+@inventory_bp.route('/movements', methods=['POST'])
+def record_movements():
+    """Record stock movements (receipt, sale, adjustment, transfer) in the ledger"""
+    try:
+        data = request.get_json()
+        movements = data.get('movements', [data])
+        if not isinstance(movements, list) or not movements:
+            return jsonify({'error': 'No movements provided'}), 400
+        
+        result = apply_stock_movements(movements)
+        
+        logger.info(f"Recorded {result['applied']} stock movements")
+        
+        return jsonify({'success': True, **result})
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error recording stock movements: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@inventory_bp.route('/ledger', methods=['GET'])
+def get_ledger_status():
+    """Get stock ledger position and snapshot status"""
+    stock_ledger.refresh()
+    return jsonify(stock_ledger.stats())
+
+@inventory_bp.route('/ledger/snapshot', methods=['POST'])
+def snapshot_ledger():
+    """Snapshot ledger balances and compact the movement log"""
+    try:
+        snapshot_seq = stock_ledger.snapshot()
+        
+        logger.info(f"Snapshotted stock ledger at seq {snapshot_seq}")
+        
+        return jsonify({'success': True, 'snapshot_seq': snapshot_seq})
+        
+    except Exception as e:
+        logger.error(f"Error snapshotting stock ledger: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @inventory_bp.route('/alerts', methods=['GET'])
+@conditional_get(inventory_replica, alert_replica)
 def get_alerts():
-    """Get all inventory alerts"""
+    """Get inventory alerts, with optional cursor pagination, filters and field projection"""
+    try:
+        listing = parse_listing_args(request.args, ALERT_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filters, limit, fields = listing['filters'], listing['limit'], listing['fields']
+    product_id = request.args.get('product_id')
+    alerts = []
+    next_seq = None
+    
+    # Walk the narrowest index (product, then type) from the cursor onwards
+    for seq in inventory_alerts.seqs(listing['cursor'], filters.get('status'), product_id):
+        alert = inventory_alerts.get(seq)
+        if filters and not alert_matches(alert, **filters):
+            continue
+        if limit is not None and len(alerts) >= limit:
+            next_seq = seq
+            break
+        alerts.append(alert if fields is None else {field: alert.get(field) for field in fields})
+    
     return jsonify({
-        'alerts': inventory_alerts,
-        'total_count': len(inventory_alerts)
+        'alerts': alerts,
+        'count': len(alerts),
+        'total_count': len(inventory_alerts),
+        'next_cursor': None if next_seq is None else str(next_seq)
     })
 
 @inventory_bp.route('/alerts/stockout', methods=['GET'])
+@conditional_get(alert_replica)
 def get_stockout_alerts():
     """Get stockout alerts for Zapier webhook"""
-    stockout_alerts = [alert for alert in inventory_alerts if alert['type'] == 'stockout']
+    stockout_alerts = inventory_alerts.of_type('stockout')
     return jsonify({
         'alerts': stockout_alerts,
         'count': len(stockout_alerts)
     })
 
 @inventory_bp.route('/alerts/overstock', methods=['GET'])
+@conditional_get(alert_replica)
 def get_overstock_alerts():
     """Get overstock alerts for Zapier webhook"""
-    overstock_alerts = [alert for alert in inventory_alerts if alert['type'] == 'overstock']
+    overstock_alerts = inventory_alerts.of_type('overstock')
     return jsonify({
         'alerts': overstock_alerts,
         'count': len(overstock_alerts)
     })
 
+@inventory_bp.route('/alerts/scan', methods=['POST'])
+def scan_alerts():
+    """Re-evaluate stock status and alerts across the whole catalogue"""
+    try:
+        new_alerts = scan_inventory_alerts()
+        
+        logger.info(f"Scanned {len(inventory_data)} products, raised {len(new_alerts)} alerts")
+        
+        return jsonify({
+            'success': True,
+            'scanned_products': len(inventory_data),
+            'new_alerts': len(new_alerts)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error scanning inventory alerts: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @inventory_bp.route('/sync', methods=['POST'])
 def sync_inventory():
     """Sync inventory from external systems (ERP, POS, etc.)"""
     try:
+        # NDJSON/CSV bodies are applied in micro-batches as they stream in
+        stream_format = STREAM_FORMATS.get(request.mimetype)
+        if stream_format:
+            batch_size = min(request.args.get('batch_size', DEFAULT_SYNC_BATCH_SIZE, type=int),
+                             MAX_SYNC_BATCH_SIZE)
+            summary = sync_inventory_stream(request.stream, stream_format, max(batch_size, 1))
+            if summary['aborted']:
+                # Earlier batches are applied; say how far the sync got
+                return jsonify({'error': summary['aborted']['error'], **summary}), 400
+            
+            logger.info(f"Stream-synced inventory for {len(summary['updated_products'])} products "
+                        f"in {summary['batches']} batches")
+            
+            return jsonify({'success': True, **summary})
+        
         data = request.get_json()
         
         if 'products' not in data:
             return jsonify({'error': 'No products data provided'}), 400
         
-        updated_products = []
-        new_alerts = []
+        result = sync_inventory_batch(data['products'])
         
-        for product_data in data['products']:
-            product_id = product_data.get('product_id')
-            if not product_id:
-                continue
-            
-            if product_id in inventory_data:
-                # Update existing product
-                inventory_data[product_id]['current_stock'] = product_data.get('current_stock', inventory_data[product_id]['current_stock'])
-                inventory_data[product_id]['last_updated'] = datetime.utcnow().isoformat()
-                inventory_data[product_id]['status'] = determine_stock_status(
-                    inventory_data[product_id]['current_stock'],
-                    inventory_data[product_id]['min_threshold'],
-                    inventory_data[product_id]['max_threshold']
-                )
-                updated_products.append(product_id)
-                
-                # Check for new alerts
-                alerts = check_inventory_alerts(product_id)
-                new_alerts.extend(alerts)
-        
-        logger.info(f"Synced inventory for {len(updated_products)} products")
+        logger.info(f"Synced inventory for {len(result['updated_products'])} products "
+                    f"in {result['timings_ms']['total']}ms")
         
         return jsonify({
             'success': True,
-            'updated_products': updated_products,
-            'new_alerts': len(new_alerts)
+            'updated_products': result['updated_products'],
+            'new_alerts': len(result['new_alerts']),
+            'transitions': result['transitions'],
+            'batch_timestamp': result['batch_timestamp'],
+            'timings_ms': result['timings_ms']
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error syncing inventory: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @inventory_bp.route('/forecast/demand', methods=['POST'])
+@serialized_write
 def update_demand_forecast():
     """Update demand forecast for inventory planning"""
     try:
         data = request.get_json()
         product_id = data.get('product_id')
         
-        if not product_id or product_id not in inventory_data:
+        row = inventory_data.row(product_id) if product_id else None
+        if row is None:
             return jsonify({'error': 'Product not found'}), 404
         
+        service_level = data.get('service_level', DEFAULT_SERVICE_LEVEL)
+        if not is_service_level(service_level):
+            return jsonify({'error': 'service_level must be in [0.5, 1)'}), 400
+        invalid = invalid_forecast_field(data)
+        if invalid is not None:
+            return jsonify({'error': f'Invalid {invalid}'}), 400
+        
         forecast_data = {
             'product_id': product_id,
             'predicted_demand': data.get('predicted_demand', 0),
@@ -212,98 +532,651 @@ def update_demand_forecast():
             'confidence_level': data.get('confidence_level', 0.8),
             'updated_at': datetime.utcnow().isoformat()
         }
+        # An explicit lead time is kept with the forecast and wins over the rule's and supplier's
+        for field in ('demand_std_dev', 'lead_time_days'):
+            if field in data:
+                forecast_data[field] = data[field]
         
         # Store forecast data (in production, save to database)
-        inventory_data[product_id]['demand_forecast'] = forecast_data
+        inventory_data.set_extra(row, 'demand_forecast', forecast_data)
         
         # Calculate recommended stock levels based on forecast
-        recommended_stock = calculate_recommended_stock(forecast_data)
-        inventory_data[product_id]['recommended_stock'] = recommended_stock
+        recompute_recommended_stock([row], service_level=service_level)
         
         return jsonify({
             'success': True,
             'forecast': forecast_data,
-            'recommended_stock': recommended_stock
+            'recommended_stock': inventory_data.extras[row]['recommended_stock']
         })
         
     except Exception as e:
         logger.error(f"Error updating demand forecast: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@inventory_bp.route('/recommendations/recompute', methods=['POST'])
+def recompute_recommendations():
+    """Recompute recommended min/max/safety stock for every product with a forecast"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        service_level = data.get('service_level', DEFAULT_SERVICE_LEVEL)
+        if not is_service_level(service_level):
+            return jsonify({'error': 'service_level must be in [0.5, 1)'}), 400
+        default_lead_time_days = data.get('default_lead_time_days', DEFAULT_LEAD_TIME_DAYS)
+        if not is_lead_time(default_lead_time_days):
+            return jsonify({'error': 'default_lead_time_days must be a non-negative number'}), 400
+        
+        result = recompute_recommended_stock(
+            service_level=service_level,
+            default_lead_time_days=default_lead_time_days
+        )
+        
+        logger.info(f"Recomputed recommended stock for {result['products_updated']} products "
+                    f"in {result['timings_ms']['total']}ms")
+        
+        return jsonify({'success': True, **result})
+        
+    except Exception as e:
+        logger.error(f"Error recomputing recommended stock: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_listing_args(args, allowed_fields):
+    """Parse the cursor/limit/fields/filter query params shared by the listing endpoints"""
+    cursor = args.get('cursor', '0')
+    if not cursor.isdigit():
+        raise ValueError('Invalid cursor')
+    
+    limit = args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError('Invalid limit')
+        limit = min(int(limit), MAX_PAGE_LIMIT)
+    
+    fields = None
+    if 'fields' in args:
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        for field in fields:
+            if field not in allowed_fields:
+                raise ValueError(f'Unknown field: {field}')
+    
+    status = args.get('status')
+    if status is not None and status not in STATUS_NAMES:
+        raise ValueError(f'Unknown status: {status}')
+    
+    filters = {
+        key: args[key] for key in ('status', 'location', 'supplier')
+        if args.get(key) is not None
+    }
+    
+    return {'cursor': int(cursor), 'limit': limit, 'fields': fields, 'filters': filters}
+
+def alert_matches(alert, status=None, location=None, supplier=None):
+    """Check an alert against listing filters; location/supplier come from the product's current record"""
+    if status is not None and alert['type'] != status:
+        return False
+    if location is None and supplier is None:
+        return True
+    
+    row = inventory_data.row(alert['product_id'])
+    if row is None:
+        return False
+    if location is not None and location not in inventory_data.stock_by_location[row]:
+        return False
+    if supplier is not None and inventory_data.suppliers[row] != supplier:
+        return False
+    return True
+
 def determine_stock_status(current_stock, min_threshold, max_threshold):
     """Determine stock status based on thresholds"""
-    if current_stock <= min_threshold:
-        return 'stockout'
-    elif current_stock >= max_threshold:
-        return 'overstock'
+    return STATUS_NAMES[stock_status_code(current_stock, min_threshold, max_threshold)]
+
+@serialized_write
+def sync_inventory_batch(products, batch_timestamp=None):
+    """Apply a batch of stock updates in one pass with a single batch timestamp.
+    
+    Raises ValueError for a malformed entry before anything is written.
+    """
+    started = time.perf_counter()
+    batch_timestamp = batch_timestamp or datetime.utcnow().isoformat()
+    if not isinstance(products, list):
+        raise ValueError('products must be an array')
+    
+    # Resolve product_ids to rows; later entries for the same product win.
+    # Rows carrying `location` or `locations` are location-scoped writes.
+    updates = {}
+    location_updates = {}
+    unknown_products = []
+    for index, product_data in enumerate(products):
+        if not isinstance(product_data, dict):
+            raise ValueError(f'Product entry {index} is not an object')
+        product_id = product_data.get('product_id')
+        current_stock = product_data.get('current_stock')
+        if current_stock is not None and not is_quantity(current_stock):
+            raise ValueError(f'Invalid current_stock for product {product_id}')
+        locations = product_data.get('locations')
+        if locations and (not isinstance(locations, dict) or not all(map(is_quantity, locations.values()))):
+            raise ValueError(f'Invalid locations for product {product_id}')
+        
+        if not product_id:
+            continue
+        row = inventory_data.row(product_id)
+        if row is None:
+            unknown_products.append(product_id)
+            continue
+        
+        updates[row] = current_stock
+        if locations:
+            location_updates.setdefault(row, {}).update(locations)
+        elif product_data.get('location') and current_stock is not None:
+            location_updates.setdefault(row, {})[product_data['location']] = current_stock
+    rows = list(updates)
+    before = {row: dict(inventory_data.stock_by_location[row]) for row in rows}
+    resolved = time.perf_counter()
+    
+    # Write stock levels and reclassify the touched rows
+    previous = inventory_data.bulk_update(rows, list(updates.values()), batch_timestamp, location_updates)
+    applied = time.perf_counter()
+    
+    # Persist the whole batch with one bulk upsert per table, log the movements and share it
+    inventory_repository.save(inventory_data, rows)
+    record_stock_changes(rows, before)
+    publish_inventory(rows)
+    persisted = time.perf_counter()
+    
+    transitions, new_alerts = batch_transitions(rows, previous, batch_timestamp)
+    finished = time.perf_counter()
+    
+    return {
+        'updated_products': [inventory_data.product_ids[row] for row in rows],
+        'unknown_products': unknown_products,
+        'new_alerts': new_alerts,
+        'transitions': transitions,
+        'batch_timestamp': batch_timestamp,
+        'timings_ms': {
+            'resolve': round((resolved - started) * 1000, 3),
+            'apply': round((applied - resolved) * 1000, 3),
+            'persist': round((persisted - applied) * 1000, 3),
+            'alerts': round((finished - persisted) * 1000, 3),
+            'total': round((finished - started) * 1000, 3)
+        }
+    }
+
+def is_quantity(value):
+    """A finite JSON number (booleans excluded)"""
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+def is_service_level(value):
+    """A service level the safety-stock z-score is defined and non-negative for"""
+    return is_quantity(value) and 0.5 <= value < 1
+
+def is_lead_time(value):
+    """A lead time in days the safety-stock term is defined for (zero included)"""
+    return is_quantity(value) and value >= 0
+
+def invalid_forecast_field(forecast):
+    """The first demand forecast field present in `forecast` that is out of range or not a number, or None"""
+    for field, in_range in FORECAST_FIELD_CHECKS.items():
+        if field in forecast and not (is_quantity(forecast[field]) and in_range(forecast[field])):
+            return field
+    return None
+
+def batch_transitions(rows, previous, timestamp):
+    """Derive status transitions for a batch as set operations and raise alerts for them"""
+    status = inventory_data.status
+    before_stockout = {row for row, code in zip(rows, previous) if code == STOCKOUT}
+    before_overstock = {row for row, code in zip(rows, previous) if code == OVERSTOCK}
+    after_stockout = {row for row in rows if status[row] == STOCKOUT}
+    after_overstock = {row for row in rows if status[row] == OVERSTOCK}
+    transitions = {
+        'entered_stockout': len(after_stockout - before_stockout),
+        'cleared_stockout': len(before_stockout - after_stockout),
+        'entered_overstock': len(after_overstock - before_overstock),
+        'cleared_overstock': len(before_overstock - after_overstock)
+    }
+    
+    # Only products entering stockout/overstock raise alerts
+    entered = (after_stockout - before_stockout) | (after_overstock - before_overstock)
+    return transitions, build_inventory_alerts(sorted(entered), timestamp)
+
+def publish_inventory(rows):
+    """Share the current state of written rows with the other workers"""
+    records = {}
+    for row in rows:
+        record = inventory_data.materialize(row)
+        record.update(inventory_data.materialize(row, ('stock_by_location',)))
+        records[inventory_data.product_ids[row]] = record
+    inventory_replica.publish(records)
+
+def record_stock_changes(rows, before, only_if_empty=False):
+    """Log per-location differences against `before` ({row: {location: quantity}}) as adjustments"""
+    movements = []
+    for row in rows:
+        old, new = before.get(row, {}), inventory_data.stock_by_location[row]
+        for location in new.keys() | old.keys():
+            delta = new.get(location, 0) - old.get(location, 0)
+            if delta:
+                movements.append((ADJUSTMENT, inventory_data.product_ids[row], location, delta, None))
+    return stock_ledger.record(movements, only_if_empty)
+
+@serialized_write
+def apply_stock_movements(movements):
+    """Validate and apply receipt/sale/adjustment/transfer movements as one batch.
+    
+    Raises ValueError for a malformed movement before anything is recorded;
+    well-formed movements that do not apply are listed as rejected.
+    """
+    timestamp = datetime.utcnow().isoformat()
+    location_updates = {}
+    accepted = []
+    rejected = []
+    
+    # The ledger keeps every movement for good, so nothing is written unless all are well-formed
+    for index, movement in enumerate(movements):
+        if not isinstance(movement, dict):
+            raise ValueError(f'Movement {index} is not an object')
+        if not is_quantity(movement.get('quantity')):
+            raise ValueError(f'Invalid quantity in movement {index}')
+        for field in ('location', 'to_location'):
+            if movement.get(field) is not None and not isinstance(movement[field], str):
+                raise ValueError(f'Invalid {field} in movement {index}')
+    
+    for index, movement in enumerate(movements):
+        kind = MOVEMENT_KINDS.get(movement.get('type'))
+        row = inventory_data.row(movement.get('product_id'))
+        quantity = movement['quantity']
+        if kind is None:
+            rejected.append({'index': index, 'error': 'Unknown movement type'})
+            continue
+        if row is None:
+            rejected.append({'index': index, 'error': 'Product not found'})
+            continue
+        if kind != ADJUSTMENT and quantity <= 0:
+            rejected.append({'index': index, 'error': 'Quantity must be positive'})
+            continue
+        
+        location = movement.get('location') or inventory_data.locations[row]
+        to_location = movement.get('to_location')
+        if kind == TRANSFER and (not to_location or to_location == location):
+            rejected.append({'index': index, 'error': 'Transfers need a different to_location'})
+            continue
+        
+        # Accumulate against the row's current cells so movements in one batch compose
+        cells = location_updates.setdefault(row, {})
+        current = inventory_data.stock_by_location[row]
+        delta = -quantity if kind in (SALE, TRANSFER) else quantity
+        cells[location] = cells.get(location, current.get(location, 0)) + delta
+        if kind == TRANSFER:
+            cells[to_location] = cells.get(to_location, current.get(to_location, 0)) + quantity
+        accepted.append((kind, inventory_data.product_ids[row], location, quantity,
+                         to_location if kind == TRANSFER else None))
+    
+    rows = list(location_updates)
+    previous = inventory_data.bulk_update(rows, [None] * len(rows), timestamp, location_updates)
+    inventory_repository.save(inventory_data, rows)
+    ledger_seq = stock_ledger.record(accepted)
+    publish_inventory(rows)
+    transitions, new_alerts = batch_transitions(rows, previous, timestamp)
+    
+    return {
+        'applied': len(accepted),
+        'rejected': rejected,
+        'updated_products': [inventory_data.product_ids[row] for row in rows],
+        'transitions': transitions,
+        'new_alerts': len(new_alerts),
+        'ledger_seq': ledger_seq
+    }
+
+def sync_inventory_stream(stream, stream_format, batch_size=DEFAULT_SYNC_BATCH_SIZE):
+    """Apply an NDJSON/CSV sync body in bounded micro-batches while it is being read.
+    
+    If a CSV line cannot be decoded the sync stops there: the batch being
+    gathered is dropped, and `aborted` names the line. Everything the
+    summary counts as applied stays applied.
+    """
+    started = time.perf_counter()
+    batch_timestamp = datetime.utcnow().isoformat()
+    
+    updated_products = []
+    unknown_products = []
+    rejected_products = []
+    transitions = {}
+    rows_read = 0
+    rows_applied = 0
+    new_alerts = 0
+    batches = 0
+    batch = []
+    aborted = None
+    
+    def flush():
+        nonlocal rows_applied, new_alerts, batches
+        result = sync_inventory_batch(batch, batch_timestamp)
+        rows_applied += len(batch)
+        updated_products.extend(result['updated_products'])
+        unknown_products.extend(result['unknown_products'])
+        new_alerts += len(result['new_alerts'])
+        for key, count in result['transitions'].items():
+            transitions[key] = transitions.get(key, 0) + count
+        batches += 1
+        batch.clear()
+    
+    try:
+        for line_number, product_id, update, error in iter_sync_stream(stream, stream_format):
+            rows_read += 1
+            if error:
+                rejected_products.append({'line': line_number, 'product_id': product_id, 'error': error})
+                continue
+            
+            batch.append(update)
+            if len(batch) >= batch_size:
+                flush()
+    except StreamDecodeError as e:
+        aborted = {'line': e.line_number, 'error': str(e)}
+        batch.clear()
+    
+    if batch:
+        flush()
+    
+    return {
+        'updated_products': updated_products,
+        'unknown_products': unknown_products,
+        'rejected_products': rejected_products,
+        'rows_read': rows_read,
+        'rows_applied': rows_applied,
+        'aborted': aborted,
+        'new_alerts': new_alerts,
+        'transitions': transitions,
+        'batches': batches,
+        'batch_size': batch_size,
+        'batch_timestamp': batch_timestamp,
+        'total_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def iter_sync_stream(stream, stream_format):
+    """Yield (line_number, product_id, update, error) for each row of a sync body"""
+    for line_number, record, error in iter_stream_records(stream, stream_format):
+        if error:
+            yield line_number, None, None, error
+            continue
+        yield (line_number, *parse_sync_row(record))
+
+def parse_sync_row(record):
+    """Validate one streamed sync row, returning (product_id, update, error)"""
+    product_id = record.get('product_id')
+    if not product_id:
+        return None, None, 'Missing product_id'
+    
+    update = {'product_id': product_id, 'current_stock': None}
+    if record.get('location'):
+        update['location'] = record['location']
+    
+    current_stock = record.get('current_stock')
+    if current_stock is None or current_stock == '':
+        return product_id, update, None
+    if isinstance(current_stock, bool):
+        return product_id, None, 'Invalid current_stock'
+    try:
+        update['current_stock'] = float(current_stock)
+    except (TypeError, ValueError):
+        return product_id, None, 'Invalid current_stock'
+    if not math.isfinite(update['current_stock']):
+        return product_id, None, 'Invalid current_stock'
+    return product_id, update, None
+
+def restore_inventory():
+    """Load persisted products into the in-memory store (call inside an app context)"""
+    # A state snapshot restores much faster than the database; writes made
+    # after it was taken are replayed from shared state
+    snapshot = state_snapshots.section('inventory')
+    if snapshot is not None:
+        version, buffer = snapshot
+        count = inventory_data.load_snapshot(buffer)
+        inventory_replica.seen = version
+        inventory_replica.refresh()
+        logger.info(f"Restored {count} products from the state snapshot")
+    else:
+        count = inventory_repository.load_into(inventory_data)
+        logger.info(f"Restored {count} products from the database")
+    
+    # Stock levels come from the movement ledger; seed it with opening balances on first run
+    # (only_if_empty keeps workers starting together from seeding twice)
+    stats = stock_ledger.open()
+    if stats['seq'] == 0:
+        record_stock_changes(range(len(inventory_data)), {}, only_if_empty=True)
     else:
-        return 'normal'
+        reconcile_with_ledger()
+    logger.info(f"Opened stock ledger at seq {stock_ledger.seq}: "
+                f"replayed {stats['replayed_movements']} movements in {stats['restore_ms']}ms")
+    
+    # The first worker on a fresh shared state seeds it (so the change feed starts
+    # complete); later ones pick up what the database does not hold (forecasts, alerts)
+    if inventory_replica.version == 0:
+        publish_inventory(range(len(inventory_data)))
+    inventory_replica.refresh()
+    alert_replica.refresh()
+    return count
+
+def reconcile_with_ledger():
+    """Overwrite in-memory stock levels with the balances derived from the ledger"""
+    timestamp = datetime.utcnow().isoformat()
+    location_updates = {}
+    for product_id, balances in stock_ledger.all_balances().items():
+        row = inventory_data.row(product_id)
+        if row is None:
+            continue
+        cells = inventory_data.stock_by_location[row]
+        target = {location: 0 for location in cells}
+        target.update(balances)
+        if target != cells:
+            location_updates[row] = target
+    
+    rows = list(location_updates)
+    if rows:
+        inventory_data.bulk_update(rows, [None] * len(rows), timestamp, location_updates)
+        inventory_repository.save(inventory_data, rows)
+        publish_inventory(rows)
+        logger.info(f"Reconciled {len(rows)} products with the stock ledger")
 
-def check_inventory_alerts(product_id):
-    """Check and generate inventory alerts"""
-    if product_id not in inventory_data:
+def check_inventory_alerts(product_id, previous_status=NORMAL):
+    """Check and generate inventory alerts when a product's status changed into stockout/overstock"""
+    row = inventory_data.row(product_id)
+    if row is None:
         return []
     
-    product = inventory_data[product_id]
+    status = inventory_data.status[row]
+    if status == NORMAL or status == previous_status:
+        return []
+    
+    return build_inventory_alerts([row])
+
+@serialized_write
+def scan_inventory_alerts():
+    """Reclassify the whole catalogue in one pass and raise alerts for status transitions"""
+    previous = np.frombuffer(inventory_data.classify(), dtype=np.int8)
+    status = np.frombuffer(inventory_data.status, dtype=np.int8)
+    changed = np.flatnonzero(previous != status)
+    publish_inventory(changed.tolist())
+    return build_inventory_alerts(changed[status[changed] != NORMAL].tolist())
+
+def build_inventory_alerts(rows, timestamp=None):
+    """Generate stockout/overstock alerts for rows that just moved out of range"""
     new_alerts = []
+    timestamp = timestamp or datetime.utcnow().isoformat()
+    alert_key = datetime.fromisoformat(timestamp).timestamp()
     
-    # Check for stockout
-    if product['current_stock'] <= product['min_threshold']:
-        alert = {
-            'id': f"stockout_{product_id}_{datetime.utcnow().timestamp()}",
-            'type': 'stockout',
-            'product_id': product_id,
-            'product_name': product['name'],
-            'current_stock': product['current_stock'],
-            'min_threshold': product['min_threshold'],
-            'severity': 'high' if product['current_stock'] == 0 else 'medium',
-            'message': f"Stock low for {product['name']}: {product['current_stock']} units remaining",
-            'timestamp': datetime.utcnow().isoformat(),
-            'webhook_data': {
-                'trigger': 'stockout_alert',
-                'product': product
+    for row in rows:
+        product = inventory_data.materialize(row, ALERT_PRODUCT_FIELDS)
+        product_id = product['product_id']
+        
+        # Check for stockout
+        if product['status'] == 'stockout':
+            alert = {
+                'id': f"stockout_{product_id}_{alert_key}",
+                'type': 'stockout',
+                'product_id': product_id,
+                'product_name': product['name'],
+                'current_stock': product['current_stock'],
+                'min_threshold': product['min_threshold'],
+                'severity': 'high' if product['current_stock'] == 0 else 'medium',
+                'message': f"Stock low for {product['name']}: {product['current_stock']} units remaining",
+                'timestamp': timestamp,
+                'webhook_data': {
+                    'trigger': 'stockout_alert',
+                    'product': product
+                }
             }
-        }
-        inventory_alerts.append(alert)
-        new_alerts.append(alert)
-    
-    # Check for overstock
-    elif product['current_stock'] >= product['max_threshold']:
-        alert = {
-            'id': f"overstock_{product_id}_{datetime.utcnow().timestamp()}",
-            'type': 'overstock',
-            'product_id': product_id,
-            'product_name': product['name'],
-            'current_stock': product['current_stock'],
-            'max_threshold': product['max_threshold'],
-            'severity': 'medium',
-            'message': f"Overstock warning for {product['name']}: {product['current_stock']} units in stock",
-            'timestamp': datetime.utcnow().isoformat(),
-            'webhook_data': {
-                'trigger': 'overstock_warning',
-                'product': product
+        
+        # Check for overstock
+        else:
+            alert = {
+                'id': f"overstock_{product_id}_{alert_key}",
+                'type': 'overstock',
+                'product_id': product_id,
+                'product_name': product['name'],
+                'current_stock': product['current_stock'],
+                'max_threshold': product['max_threshold'],
+                'severity': 'medium',
+                'message': f"Overstock warning for {product['name']}: {product['current_stock']} units in stock",
+                'timestamp': timestamp,
+                'webhook_data': {
+                    'trigger': 'overstock_warning',
+                    'product': product
+                }
             }
-        }
-        inventory_alerts.append(alert)
+        
         new_alerts.append(alert)
     
+    # Appended to every worker's alert log (this one's included) in shared order
+    alert_replica.extend(new_alerts)
+    
     return new_alerts
 
-def calculate_recommended_stock(forecast_data):
-    """Calculate recommended stock levels based on demand forecast"""
-    predicted_demand = forecast_data.get('predicted_demand', 0)
-    forecast_period = forecast_data.get('forecast_period', 30)
-    confidence_level = forecast_data.get('confidence_level', 0.8)
+@serialized_write
+def recompute_recommended_stock(rows=None, service_level=DEFAULT_SERVICE_LEVEL,
+                                default_lead_time_days=DEFAULT_LEAD_TIME_DAYS):
+    """Recompute recommended stock for products with a forecast in one column-wise pass.
+    
+    Safety stock is z(service_level) * daily demand std dev * sqrt(lead time);
+    the recommended minimum is the reorder point (lead-time demand + safety
+    stock) and the maximum adds one forecast period of demand on top.
+    Forecasts with a field that is not a usable number are skipped, and
+    lead times that are not are passed over for the next source.
+    """
+    started = time.perf_counter()
+    if rows is None:
+        rows = range(len(inventory_data))
     
-    # Simple calculation (can be enhanced with more sophisticated algorithms)
-    safety_stock = predicted_demand * 0.2  # 20% safety stock
-    recommended_min = predicted_demand + safety_stock
-    recommended_max = predicted_demand * 2
+    # Lead times: the forecast's own first, then the active reorder rule, then the product's supplier
+    rule_lead_times = {
+        rule['product_id']: rule.get('lead_time_days', default_lead_time_days)
+        for rule in reorder_rules.values() if rule.get('status') == 'active'
+    }
+    
+    # Gather input columns for every row that has a forecast; std devs the
+    # forecast does not give are NaN until derived from history below
+    forecast_rows, predictions, confidences, std_devs, lead_times, periods = [], [], [], [], [], []
+    extras, product_ids, suppliers = inventory_data.extras, inventory_data.product_ids, inventory_data.suppliers
+    for row in rows:
+        product_id = product_ids[row]
+        forecast = extras.get(row, {}).get('demand_forecast')
+        if forecast is not None:
+            if invalid_forecast_field(forecast) is not None:
+                continue
+            predicted, period = forecast.get('predicted_demand', 0), forecast.get('forecast_period', 30)
+            confidence = forecast.get('confidence_level', 0.8)
+            std_dev = forecast.get('demand_std_dev')
+            lead_time = forecast.get('lead_time_days')
+        elif product_id in demand_forecasts:
+            forecast = demand_forecasts[product_id]
+            predicted, period = forecast['predicted_demand'], forecast['forecast_period_days']
+            confidence = forecast.get('confidence_level', 80) / 100
+            std_dev = lead_time = None
+        else:
+            continue
+        
+        supplier_lead_time = suppliers_data.get(suppliers[row], {}).get('lead_time_days')
+        if supplier_lead_time == 0:
+            supplier_lead_time = None  # suppliers are stored with 0 when no lead time was given
+        lead_time = next(
+            (days for days in (lead_time, rule_lead_times.get(product_id), supplier_lead_time) if is_lead_time(days)),
+            default_lead_time_days
+        )
+        
+        forecast_rows.append(row)
+        predictions.append(predicted)
+        confidences.append(confidence)
+        std_devs.append(math.nan if std_dev is None else std_dev)
+        lead_times.append(lead_time)
+        periods.append(period)
+    gathered = time.perf_counter()
+    
+    # Vectorized computation over the gathered columns
+    periods = np.maximum(np.array(periods, dtype=float), 1)
+    means = np.array(predictions, dtype=float) / periods
+    std_devs = np.array(std_devs, dtype=float)
+    missing = np.isnan(std_devs)
+    if missing.any():
+        std_devs[missing] = demand_std_devs(
+            [product_ids[row] for row, absent in zip(forecast_rows, missing) if absent],
+            means[missing], np.array(confidences, dtype=float)[missing]
+        )
+    lead_time_column = np.array(lead_times, dtype=float)
+    safety = NormalDist().inv_cdf(service_level) * std_devs * np.sqrt(lead_time_column)
+    minimums = means * lead_time_column + safety
+    maximums = minimums + means * periods
+    computed = time.perf_counter()
+    
+    # Write results back as one bulk store update
+    calculation_date = datetime.utcnow().isoformat()
+    inventory_data.set_extras_bulk(forecast_rows, 'recommended_stock', [
+        {
+            'recommended_min': low,
+            'recommended_max': high,
+            'safety_stock': ss,
+            'service_level': service_level,
+            'lead_time_days': lt,
+            'calculation_date': calculation_date
+        }
+        for low, high, ss, lt in zip(
+            np.ceil(minimums).astype(int).tolist(), np.ceil(maximums).astype(int).tolist(),
+            np.ceil(safety).astype(int).tolist(), lead_times
+        )
+    ])
+    publish_inventory(forecast_rows)
+    finished = time.perf_counter()
     
     return {
-        'recommended_min': int(recommended_min),
-        'recommended_max': int(recommended_max),
-        'safety_stock': int(safety_stock),
-        'calculation_date': datetime.utcnow().isoformat()
+        'products_updated': len(forecast_rows),
+        'service_level': service_level,
+        'timings_ms': {
+            'gather': round((gathered - started) * 1000, 3),
+            'compute': round((computed - gathered) * 1000, 3),
+            'write': round((finished - computed) * 1000, 3),
+            'total': round((finished - started) * 1000, 3)
+        }
     }
 
+def demand_std_devs(product_ids, means, confidence_levels):
+    """Daily demand std devs from recent history, or confidence-based estimates for products without.
+    
+    The recent windows are concatenated into one array and reduced per
+    product with np.add.reduceat, so the cost is one pass over the data.
+    """
+    std_devs = means * (1 - confidence_levels)
+    with_history = np.zeros(len(product_ids), dtype=bool)
+    demands, counts = array('d'), []
+    for index, product_id in enumerate(product_ids):
+        history = historical_data.get(product_id)
+        if history is not None and len(history) >= 2:
+            window = history.window(DEMAND_HISTORY_DAYS)[0]
+            demands += window
+            counts.append(len(window))
+            with_history[index] = True
+    if not counts:
+        return std_devs
+    
+    demands, counts = np.frombuffer(demands, dtype=float), np.array(counts)
+    starts = np.cumsum(counts) - counts
+    averages = np.add.reduceat(demands, starts) / counts
+    deviations = demands - np.repeat(averages, counts)
+    std_devs[with_history] = np.sqrt(np.add.reduceat(deviations ** 2, starts) / (counts - 1))
+    return std_devs
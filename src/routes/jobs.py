@@ -0,0 +1,97 @@
+from flask import Blueprint, request, jsonify, url_for
+import logging
+import os
+from src.models.job_queue import JobQueue, FINISHED_STATES, SUCCEEDED
+from src.models.shared_state import shared_state
+
+jobs_bp = Blueprint('jobs', __name__)
+logger = logging.getLogger(__name__)
+
+# Job types are registered by the blueprints that own the work; records are
+# shared so any worker can answer for (or cancel) a job another one runs
+job_queue = JobQueue(retention=int(os.environ.get('JOB_RETENTION', 1000)))
+job_queue.share(shared_state)
+
+def wants_async():
+    """Whether the caller asked for a heavy operation to run as a background job"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def accepted(job):
+    """202 response pointing at the job's polling endpoint"""
+    response = jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'status_url': url_for('jobs.get_job', job_id=job.job_id),
+        'result_url': url_for('jobs.get_job_result', job_id=job.job_id)
+    })
+    response.status_code = 202
+    response.headers['Location'] = url_for('jobs.get_job', job_id=job.job_id)
+    return response
+
+@jobs_bp.route('', methods=['GET'])
+def list_jobs():
+    """List retained jobs (newest first) and per-type queue stats"""
+    jobs = job_queue.jobs(status=request.args.get('status'), job_type=request.args.get('type'))
+    return jsonify({
+        'jobs': [job.to_dict() for job in jobs],
+        'total_count': len(jobs),
+        'queues': job_queue.stats()
+    })
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """Queue a background job of a registered type"""
+    try:
+        data = request.get_json() or {}
+        
+        if 'type' not in data:
+            return jsonify({'error': 'Missing required field: type'}), 400
+        if data['type'] not in job_queue.job_types:
+            return jsonify({'error': f"Unknown job type: {data['type']}", 'job_types': job_queue.job_types}), 400
+        
+        job = job_queue.submit(data['type'], data.get('payload', {}))
+        
+        logger.info(f"Queued {job.job_type} job: {job.job_id}")
+        
+        return accepted(job)
+        
+    except Exception as e:
+        logger.error(f"Error queueing job: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job status and progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job.to_dict())
+
+@jobs_bp.route('/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Get a finished job's result; 202 while it is still queued or running"""
+    job = job_queue.get(job_id, include_result=True)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job.status not in FINISHED_STATES:
+        return jsonify(job.to_dict()), 202
+    if job.status != SUCCEEDED:
+        return jsonify(job.to_dict()), 409
+    
+    return jsonify(job.to_dict(include_result=True))
+
+@jobs_bp.route('/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    logger.info(f"Cancellation requested for job: {job_id}")
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
@@ -0,0 +1,124 @@
+from flask import Blueprint, Response, request, g
+import os
+import resource
+import time
+from src.models.shared_state import shared_state, SharedDict
+from src.models.worker_metrics import WorkerMetrics
+from src.routes.jobs import job_queue
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Per-thread shards of every worker live here; clear it on deploy to reset counters
+request_metrics = WorkerMetrics(os.environ.get(
+    'METRICS_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'metrics')
+))
+STARTED = time.time()
+
+# Sized stores reported besides every SharedDict, and logs reported as backlogs;
+# filled by the blueprints that own them
+TRACKED_STORES = {}
+TRACKED_BACKLOGS = {}
+
+def track_store(name, store):
+    TRACKED_STORES[name] = store
+
+def track_backlog(name, log):
+    TRACKED_BACKLOGS[name] = log
+
+@metrics_bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@metrics_bp.after_app_request
+def record_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        request_metrics.observe_request(
+            request.endpoint or 'unmatched', request.method, response.status_code,
+            (time.perf_counter() - started) * 1000
+        )
+    return response
+
+def store_sizes():
+    """Entry count of every tracked store and shared dict"""
+    sizes = {name: len(store) for name, store in TRACKED_STORES.items()}
+    sizes.update({
+        namespace: len(replica) for namespace, replica in shared_state.replicas.items()
+        if isinstance(replica, SharedDict)
+    })
+    return sizes
+
+def process_rss(pid):
+    """Resident set size of a live process in bytes, or None if it has exited"""
+    try:
+        with open(f'/proc/{pid}/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # No procfs: only our own peak RSS is available (kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if pid == os.getpid() else None
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value
+
+def _labels(**labels):
+    return ','.join(f'{name}="{str(value)}"' for name, value in labels.items())
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format"""
+    collected = request_metrics.collect()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for suffix, labels, value in samples:
+            lines.append(f'{name}{suffix}{{{labels}}} {_number(value)}' if labels else f'{name}{suffix} {_number(value)}')
+
+    metric('http_requests_total', 'counter', 'Requests handled, by endpoint, method and status.', [
+        ('', _labels(endpoint=endpoint, method=method, status=status), count)
+        for (endpoint, method, status), count in sorted(collected['requests'].items())
+    ])
+
+    samples = []
+    for endpoint, histogram in sorted(collected['latency'].items()):
+        total = 0
+        for bound, count in zip(request_metrics.bounds + ('+Inf',), histogram['buckets']):
+            total += count
+            le = bound if bound == '+Inf' else bound / 1000
+            samples.append(('_bucket', _labels(endpoint=endpoint, le=le), total))
+        samples.append(('_sum', _labels(endpoint=endpoint), histogram['sum_ms'] / 1000))
+        samples.append(('_count', _labels(endpoint=endpoint), total))
+    metric('http_request_duration_seconds', 'histogram', 'Request latency, by endpoint.', samples)
+
+    metric('store_entries', 'gauge', 'Entries held in each in-memory store.', [
+        ('', _labels(store=name), size) for name, size in sorted(store_sizes().items())
+    ])
+    metric('backlog_entries', 'gauge', 'Retained entries of each alert and event log.', [
+        ('', _labels(log=name), len(log)) for name, log in sorted(TRACKED_BACKLOGS.items())
+    ])
+
+    queue_stats = job_queue.stats()
+    metric('job_queue_depth', 'gauge', 'Background jobs waiting to run, by job type.', [
+        ('', _labels(type=job_type), stats['queued']) for job_type, stats in sorted(queue_stats.items())
+    ])
+    metric('jobs_running', 'gauge', 'Background jobs running, by job type.', [
+        ('', _labels(type=job_type), stats['running']) for job_type, stats in sorted(queue_stats.items())
+    ])
+
+    rss = {pid: process_rss(pid) for pid in collected['pids'] | {os.getpid()}}
+    metric('process_resident_memory_bytes', 'gauge', 'Resident memory of each live worker.', [
+        ('', _labels(pid=pid), size) for pid, size in sorted(rss.items()) if size is not None
+    ])
+    metric('process_uptime_seconds', 'gauge', 'Seconds since the scraped worker started.', [
+        ('', '', round(time.time() - STARTED, 3))
+    ])
+
+    return '\n'.join(lines) + '\n'
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint; aggregates the counters of every worker"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,394 @@
+from flask import Blueprint, request, jsonify, current_app
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from src.models.inventory_store import PRODUCT_FIELDS
+from src.models.latency_histogram import LatencyHistogram
+from src.routes.inventory import inventory_data, inventory_alerts, sync_inventory_batch
+from src.routes.metrics import request_metrics, store_sizes, STARTED
+from src.routes.supplier import open_supplier_request
+from src.routes.reorder import reorder_rules, trigger_product_reorder, check_triggers
+from src.routes.forecasting import create_product_forecast
+
+# Cross-bot endpoints; routes carry their full paths (/api/health, /api/orchestrator/..., /api/zapier/...)
+orchestrator_bp = Blueprint('orchestrator', __name__)
+logger = logging.getLogger(__name__)
+
+# Bounded worker pool shared by all batch orchestrator requests
+MAX_BATCH_REQUESTS = int(os.environ.get('ORCHESTRATOR_MAX_BATCH', 10000))
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ORCHESTRATOR_BATCH_WORKERS', 8)),
+    thread_name_prefix='orchestrator-batch'
+)
+
+# Bot -> (blueprint name, service name in the health check, features)
+BOTS = {
+    'inventory_management': ('inventory', 'inventory_bot',
+                             ['stock_monitoring', 'stockout_alerts', 'overstock_warnings']),
+    'supplier_visibility': ('supplier', 'supplier_bot',
+                            ['supplier_onboarding', 'request_intake', 'performance_tracking']),
+    'auto_reorder': ('reorder', 'reorder_bot',
+                     ['smart_triggers', 'automated_po', 'approval_workflow']),
+    'demand_forecasting': ('forecasting', 'forecasting_bot',
+                           ['trend_analysis', 'seasonal_detection', 'predictive_analytics'])
+}
+
+def bot_activity():
+    """Requests, server errors and average latency per bot, summed across workers"""
+    collected = request_metrics.collect()
+    activity = {blueprint: {'requests': 0, 'errors': 0, 'total_ms': 0.0} for blueprint, _, _ in BOTS.values()}
+    
+    for (endpoint, _, status), count in collected['requests'].items():
+        stats = activity.get(endpoint.split('.')[0])
+        if stats is not None:
+            stats['requests'] += int(count)
+            stats['errors'] += int(count) if status.startswith('5') else 0
+    for endpoint, histogram in collected['latency'].items():
+        stats = activity.get(endpoint.split('.')[0])
+        if stats is not None:
+            stats['total_ms'] += histogram['sum_ms']
+    
+    for stats in activity.values():
+        total_ms = stats.pop('total_ms')
+        stats['avg_ms'] = round(total_ms / stats['requests'], 3) if stats['requests'] else 0.0
+    return activity
+
+@orchestrator_bp.route('/api/health', methods=['GET'])
+def health_check():
+    """Health check endpoint for monitoring"""
+    activity = bot_activity()
+    return jsonify({
+        'status': 'healthy',
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': '1.0.0',
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - STARTED, 3),
+        'services': {
+            service: {'status': 'active', **activity[blueprint]}
+            for blueprint, service, _ in BOTS.values()
+        }
+    })
+
+@orchestrator_bp.route('/api/orchestrator/status', methods=['GET'])
+def orchestrator_status():
+    """Get status of all supply chain automation bots"""
+    activity = bot_activity()
+    sizes = store_sizes()
+    stores = {
+        'inventory_management': {'products': sizes['inventory_products'], 'alerts': len(inventory_alerts)},
+        'supplier_visibility': {
+            'suppliers': sizes['suppliers_data'], 'requests': sizes['supplier_requests']
+        },
+        'auto_reorder': {
+            'rules': sizes['reorder_rules'], 'pending_orders': sizes['pending_orders']
+        },
+        'demand_forecasting': {
+            'forecasts': sizes['forecast_data'], 'products_with_history': sizes['historical_data']
+        }
+    }
+    
+    return jsonify({
+        'orchestrator': 'active',
+        'timestamp': datetime.utcnow().isoformat(),
+        'uptime_seconds': round(time.time() - STARTED, 3),
+        'bots': {
+            bot: {
+                'status': 'active',
+                'features': features,
+                'activity': activity[blueprint],
+                'stores': stores[bot]
+            }
+            for bot, (blueprint, _, features) in BOTS.items()
+        }
+    })
+
+@orchestrator_bp.route('/api/orchestrator/process', methods=['POST'])
+def process_supply_chain_request():
+    """Main orchestrator endpoint for processing supply chain automation requests"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        request_type = data.get('type')
+        payload = data.get('payload', {})
+        
+        logger.info(f"Processing supply chain request: {request_type}")
+        
+        try:
+            result = dispatch_request(request_type, payload)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'request_type': request_type,
+            'result': result,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing supply chain request: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@orchestrator_bp.route('/api/orchestrator/process/batch', methods=['POST'])
+def process_supply_chain_batch():
+    """Process many typed requests concurrently, returning ordered per-item results and per-type timing"""
+    try:
+        data = request.get_json()
+        
+        items = data.get('requests') if data else None
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'No requests provided'}), 400
+        if len(items) > MAX_BATCH_REQUESTS:
+            return jsonify({'error': f'Batch exceeds {MAX_BATCH_REQUESTS} requests'}), 400
+        
+        started = time.perf_counter()
+        # map() keeps results in submission order; the pool bounds concurrency
+        app = current_app._get_current_object()
+        outcomes = list(batch_executor.map(partial(run_batch_item, app), range(len(items)), items))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        timing = {}
+        for outcome, duration_ms in outcomes:
+            stats = timing.setdefault(outcome['request_type'] or 'untyped', {
+                'count': 0, 'failed': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['count'] += 1
+            stats['failed'] += not outcome['success']
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        for stats in timing.values():
+            stats['avg_ms'] = round(stats['total_ms'] / stats['count'], 3)
+            stats['total_ms'] = round(stats['total_ms'], 3)
+            stats['max_ms'] = round(stats['max_ms'], 3)
+        
+        results = [outcome for outcome, _ in outcomes]
+        failed = sum(not outcome['success'] for outcome in results)
+        
+        logger.info(f"Processed batch of {len(results)} supply chain requests ({failed} failed) in {elapsed_ms:.1f}ms")
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'total': len(results),
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'timing': timing,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing supply chain batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def run_batch_item(app, index, item):
+    """Run one batch entry on a pool thread, returning (outcome, duration_ms); never raises"""
+    started = time.perf_counter()
+    request_type = item.get('type') if isinstance(item, dict) else None
+    outcome = {'index': index, 'request_type': request_type}
+    
+    try:
+        if request_type is None:
+            raise UnknownRequestType('Missing request type')
+        with app.app_context():
+            outcome['result'] = dispatch_request(request_type, item.get('payload', {}))
+        outcome['success'] = True
+    except Exception as e:
+        outcome['success'] = False
+        outcome['error'] = str(e)
+    
+    return outcome, (time.perf_counter() - started) * 1000
+
+class UnknownRequestType(ValueError):
+    pass
+
+# Request type -> in-process bot handler, filled by @orchestrator_handler
+REQUEST_HANDLERS = {}
+request_latency = {}
+
+def orchestrator_handler(request_type):
+    """Register a function as the in-process handler for a request type"""
+    def decorator(handler):
+        REQUEST_HANDLERS[request_type] = handler
+        request_latency[request_type] = LatencyHistogram()
+        return handler
+    return decorator
+
+def dispatch_request(request_type, payload):
+    """Route a typed request to its bot handler, recording handler latency"""
+    handler = REQUEST_HANDLERS.get(request_type)
+    if handler is None:
+        raise UnknownRequestType(f'Unknown request type: {request_type}')
+    
+    started = time.perf_counter()
+    try:
+        return handler(payload)
+    finally:
+        request_latency[request_type].observe((time.perf_counter() - started) * 1000)
+
+def require_fields(payload, fields):
+    for field in fields:
+        if field not in payload:
+            raise ValueError(f'Missing required field: {field}')
+
+@orchestrator_handler('inventory_check')
+def process_inventory_request(payload):
+    """Sync stock levels when `products` is given, otherwise report stock and status for the requested products"""
+    if 'products' in payload:
+        result = sync_inventory_batch(payload['products'])
+        result['new_alerts'] = len(result['new_alerts'])
+        return {'bot': 'inventory_management', 'action': 'synced', **result}
+    
+    product_ids = payload.get('product_ids') or ([payload['product_id']] if 'product_id' in payload else [])
+    if not product_ids:
+        raise ValueError('Missing required field: product_id')
+    
+    rows = {product_id: inventory_data.row(product_id) for product_id in product_ids}
+    return {
+        'bot': 'inventory_management',
+        'action': 'checked',
+        'products': inventory_data.records(
+            [row for row in rows.values() if row is not None],
+            PRODUCT_FIELDS + ('stock_by_location',)
+        ),
+        'unknown_products': [product_id for product_id, row in rows.items() if row is None]
+    }
+
+@orchestrator_handler('supplier_request')
+def process_supplier_request(payload):
+    """Open a supplier request (same fields as POST /api/suppliers/requests)"""
+    require_fields(payload, ['request_type', 'supplier_id', 'description'])
+    return {
+        'bot': 'supplier_visibility',
+        'action': 'request_created',
+        'request': open_supplier_request(payload)
+    }
+
+@orchestrator_handler('reorder_trigger')
+def process_reorder_request(payload):
+    """Reorder one product when `product_id` is given, otherwise evaluate every active rule"""
+    if 'product_id' in payload:
+        require_fields(payload, ['quantity'])
+        order = trigger_product_reorder(payload['product_id'], payload['quantity'])
+        if order is None:
+            raise LookupError('No active reorder rule found for this product')
+        return {'bot': 'auto_reorder', 'action': 'order_created', 'order': order}
+    
+    # Without explicit inventory data, evaluate rules against the live inventory store
+    stock = payload.get('inventory_data')
+    if stock is None:
+        product_ids = {rule['product_id'] for rule in reorder_rules.values() if rule['status'] == 'active'}
+        rows = [row for row in map(inventory_data.row, product_ids) if row is not None]
+        stock = {
+            record['product_id']: {
+                'current_stock': record['current_stock'],
+                'demand_forecast': record['demand_forecast'] or {}
+            }
+            for record in inventory_data.records(rows, ('product_id', 'current_stock', 'demand_forecast'))
+        }
+    
+    orders = check_triggers(stock)
+    return {'bot': 'auto_reorder', 'action': 'triggers_checked', 'triggered_orders': orders}
+
+@orchestrator_handler('demand_forecast')
+def process_forecasting_request(payload):
+    """Create a demand forecast (same fields as POST /api/forecasting/forecasts)"""
+    require_fields(payload, ['product_id', 'forecast_period_days'])
+    forecast = create_product_forecast(
+        payload['product_id'], payload['forecast_period_days'], payload.get('product_name', ''), payload.get('model')
+    )
+    if forecast is None:
+        raise ValueError('Insufficient historical data for forecasting')
+    return {'bot': 'demand_forecasting', 'action': 'forecast_created', 'forecast': forecast}
+
+@orchestrator_bp.route('/api/orchestrator/latency', methods=['GET'])
+def orchestrator_latency():
+    """Get per-request-type handler latency histograms"""
+    return jsonify({
+        'latency': {request_type: histogram.to_dict() for request_type, histogram in request_latency.items()},
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+@orchestrator_bp.route('/api/orchestrator/startup', methods=['GET'])
+def startup_report():
+    """Get the startup timing report (blueprint imports, DB init, state restore)"""
+    return jsonify(current_app.extensions['startup_report'].to_dict())
+
+# Zapier integration endpoints
+@orchestrator_bp.route('/api/zapier/triggers', methods=['GET'])
+def zapier_triggers():
+    """List available triggers for Zapier integration"""
+    return jsonify({
+        'triggers': [
+            {
+                'key': 'stockout_alert',
+                'name': 'Stock Out Alert',
+                'description': 'Triggered when inventory falls below minimum threshold',
+                'webhook_url': '/api/webhooks/stockout'
+            },
+            {
+                'key': 'overstock_warning',
+                'name': 'Overstock Warning',
+                'description': 'Triggered when inventory exceeds maximum threshold',
+                'webhook_url': '/api/webhooks/overstock'
+            },
+            {
+                'key': 'supplier_request',
+                'name': 'New Supplier Request',
+                'description': 'Triggered when a new supplier request is received',
+                'webhook_url': '/api/webhooks/supplier_request'
+            },
+            {
+                'key': 'reorder_generated',
+                'name': 'Reorder Generated',
+                'description': 'Triggered when an automatic reorder is generated',
+                'webhook_url': '/api/webhooks/reorder_generated'
+            },
+            {
+                'key': 'forecast_updated',
+                'name': 'Forecast Updated',
+                'description': 'Triggered when demand forecast is updated',
+                'webhook_url': '/api/webhooks/forecast_updated'
+            }
+        ]
+    })
+
+@orchestrator_bp.route('/api/zapier/actions', methods=['GET'])
+def zapier_actions():
+    """List available actions for Zapier integration"""
+    return jsonify({
+        'actions': [
+            {
+                'key': 'update_inventory',
+                'name': 'Update Inventory',
+                'description': 'Update inventory levels for a product',
+                'endpoint': '/api/inventory/update'
+            },
+            {
+                'key': 'create_supplier_request',
+                'name': 'Create Supplier Request',
+                'description': 'Create a new supplier request',
+                'endpoint': '/api/suppliers/request'
+            },
+            {
+                'key': 'trigger_reorder',
+                'name': 'Trigger Reorder',
+                'description': 'Manually trigger a reorder for a product',
+                'endpoint': '/api/reorder/trigger'
+            },
+            {
+                'key': 'update_forecast',
+                'name': 'Update Forecast',
+                'description': 'Update demand forecast parameters',
+                'endpoint': '/api/forecasting/update'
+            }
+        ]
+    })
@@ -0,0 +1,88 @@
+from flask import Blueprint, request, jsonify, g
+import logging
+import os
+import time
+from src.models.request_profiler import ProfileBuffer, SORT_KEYS
+from src.models.shared_state import shared_state, SharedDict
+
+profiling_bp = Blueprint('profiling', __name__)
+logger = logging.getLogger(__name__)
+
+# Slowest profiled requests of every worker
+request_profiles = ProfileBuffer(
+    capacity=int(os.environ.get('PROFILE_CAPACITY', 20)),
+    store=SharedDict(shared_state, 'request_profiles')
+)
+
+def init_profiling(app):
+    """Install the profiling hooks when PROFILE_ROUTES or PROFILE_HEADER is configured.
+
+    With neither set no hook is installed, so unprofiled deployments pay nothing.
+    """
+    routes = set(app.config['PROFILE_ROUTES'])
+    header = app.config['PROFILE_HEADER']
+    if not routes and not header:
+        return
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint in routes or (request.url_rule is not None and request.url_rule.rule in routes):
+            trigger = 'route'
+        elif header and request.headers.get(header, '').lower() in ('1', 'true', 'yes'):
+            trigger = 'header'
+        else:
+            return
+        g.profile = (request_profiles.start(), trigger, time.perf_counter())
+
+    @app.after_request
+    def finish_profile(response):
+        profiler, trigger, started = g.pop('profile', (None, None, None))
+        if profiler is None:
+            return response
+        profile_id = request_profiles.add(
+            profiler, (time.perf_counter() - started) * 1000,
+            endpoint=request.endpoint, method=request.method, path=request.path,
+            status=response.status_code, trigger=trigger
+        )
+        if profile_id is not None:
+            response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # Only still set when the request failed before after_request ran
+        profiler = g.pop('profile', (None,))[0]
+        if profiler is not None:
+            profiler.disable()
+
+    logger.info(f"Request profiling enabled (routes: {sorted(routes) or 'none'}, header: {header or 'off'})")
+
+@profiling_bp.route('', methods=['GET'])
+def list_profiles():
+    """List retained profiles, slowest first"""
+    profiles = request_profiles.summaries()
+    return jsonify({
+        'profiles': profiles,
+        'total_count': len(profiles),
+        'capacity': request_profiles.capacity
+    })
+
+@profiling_bp.route('/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """Get one profile's call stats, sorted by `sort` (cumtime_ms, tottime_ms, calls, primitive_calls)"""
+    sort = request.args.get('sort', 'cumtime_ms')
+    if sort not in SORT_KEYS:
+        return jsonify({'error': f'Invalid sort: {sort}', 'sort_keys': SORT_KEYS}), 400
+
+    limit = request.args.get('limit', 50, type=int)
+    profile = request_profiles.get(profile_id, sort=sort, limit=limit)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    return jsonify(profile)
+
+@profiling_bp.route('', methods=['DELETE'])
+def clear_profiles():
+    """Drop every retained profile"""
+    request_profiles.clear()
+    return jsonify({'success': True})
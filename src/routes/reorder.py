@@ -2,17 +2,21 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import logging
 import json
+from src.models.shared_state import shared_state, SharedDict
+from src.routes.conditional import conditional_get
+from src.routes.jobs import job_queue, wants_async, accepted
 
 reorder_bp = Blueprint('reorder', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-reorder_rules = {}
-reorder_history = {}
-pending_orders = {}
-approval_workflows = {}
+# Stores shared by all workers; each SharedDict's version doubles as its ETag source
+reorder_rules = SharedDict(shared_state, 'reorder_rules')
+reorder_history = SharedDict(shared_state, 'reorder_history')
+pending_orders = SharedDict(shared_state, 'pending_orders')
+approval_workflows = SharedDict(shared_state, 'approval_workflows')
 
 @reorder_bp.route('/status', methods=['GET'])
+@conditional_get(reorder_rules, pending_orders)
 def reorder_status():
     """Get auto-reorder bot status"""
     return jsonify({
@@ -31,6 +35,7 @@ def reorder_status():
     })
 
 @reorder_bp.route('/rules', methods=['GET'])
+@conditional_get(reorder_rules)
 def get_all_rules():
     """Get all reorder rules"""
     return jsonify({
@@ -39,6 +44,7 @@ def get_all_rules():
     })
 
 @reorder_bp.route('/rules/<rule_id>', methods=['GET'])
+@conditional_get(reorder_rules)
 def get_rule(rule_id):
     """Get specific reorder rule"""
     if rule_id not in reorder_rules:
@@ -98,19 +104,22 @@ def update_reorder_rule(rule_id):
             return jsonify({'error': 'Reorder rule not found'}), 404
         
         data = request.get_json()
-        rule = reorder_rules[rule_id]
         
-        # Update allowed fields
+        # Update allowed fields; the whole rule is written back, so hold the
+        # shared write lock to keep trigger counts from other workers
         updatable_fields = ['trigger_type', 'trigger_value', 'reorder_quantity', 
                           'supplier_id', 'max_cost', 'approval_required', 
                           'approval_threshold', 'lead_time_days', 'safety_stock', 
                           'seasonal_adjustment', 'status']
         
-        for field in updatable_fields:
-            if field in data:
-                rule[field] = data[field]
-        
-        rule['last_updated'] = datetime.utcnow().isoformat()
+        with reorder_rules.exclusive():
+            rule = reorder_rules[rule_id]
+            for field in updatable_fields:
+                if field in data:
+                    rule[field] = data[field]
+            
+            rule['last_updated'] = datetime.utcnow().isoformat()
+            reorder_rules.commit(rule_id)
         
         logger.info(f"Updated reorder rule: {rule_id}")
         
@@ -134,22 +143,10 @@ def trigger_reorder():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        product_id = data['product_id']
-        quantity = data['quantity']
-        
-        # Find applicable reorder rule
-        applicable_rule = None
-        for rule in reorder_rules.values():
-            if rule['product_id'] == product_id and rule['status'] == 'active':
-                applicable_rule = rule
-                break
-        
-        if not applicable_rule:
+        order_result = trigger_product_reorder(data['product_id'], data['quantity'])
+        if order_result is None:
             return jsonify({'error': 'No active reorder rule found for this product'}), 404
         
-        # Create reorder
-        order_result = create_reorder(applicable_rule, quantity, 'manual_trigger')
-        
         return jsonify({
             'success': True,
             'order': order_result
@@ -164,66 +161,11 @@ def check_reorder_triggers():
     """Check all reorder triggers and execute if conditions are met"""
     try:
         data = request.get_json()
-        inventory_data = data.get('inventory_data', {})
         
-        triggered_orders = []
+        if wants_async():
+            return accepted(job_queue.submit('reorder_check_triggers', {'inventory_data': data.get('inventory_data', {})}))
         
-        for rule in reorder_rules.values():
-            if rule['status'] != 'active':
-                continue
-            
-            product_id = rule['product_id']
-            
-            # Check if trigger conditions are met
-            should_trigger = False
-            trigger_reason = ""
-            
-            if rule['trigger_type'] == 'threshold':
-                current_stock = inventory_data.get(product_id, {}).get('current_stock', 0)
-                if current_stock <= rule['trigger_value']:
-                    should_trigger = True
-                    trigger_reason = f"Stock level ({current_stock}) below threshold ({rule['trigger_value']})"
-            
-            elif rule['trigger_type'] == 'time_based':
-                # Check if enough time has passed since last order
-                last_triggered = rule.get('last_triggered')
-                if last_triggered:
-                    last_date = datetime.fromisoformat(last_triggered)
-                    days_since = (datetime.utcnow() - last_date).days
-                    if days_since >= rule['trigger_value']:
-                        should_trigger = True
-                        trigger_reason = f"Time-based trigger: {days_since} days since last order"
-                else:
-                    should_trigger = True
-                    trigger_reason = "First time trigger"
-            
-            elif rule['trigger_type'] == 'demand_forecast':
-                # Check demand forecast data
-                forecast_data = inventory_data.get(product_id, {}).get('demand_forecast', {})
-                predicted_demand = forecast_data.get('predicted_demand', 0)
-                current_stock = inventory_data.get(product_id, {}).get('current_stock', 0)
-                
-                if current_stock < predicted_demand:
-                    should_trigger = True
-                    trigger_reason = f"Current stock ({current_stock}) below predicted demand ({predicted_demand})"
-            
-            if should_trigger:
-                # Calculate reorder quantity (can include seasonal adjustments)
-                reorder_qty = rule['reorder_quantity']
-                
-                if rule.get('seasonal_adjustment', False):
-                    # Simple seasonal adjustment (can be enhanced)
-                    current_month = datetime.utcnow().month
-                    if current_month in [11, 12, 1]:  # Holiday season
-                        reorder_qty = int(reorder_qty * 1.5)
-                
-                # Create reorder
-                order_result = create_reorder(rule, reorder_qty, trigger_reason)
-                triggered_orders.append(order_result)
-                
-                # Update rule
-                rule['last_triggered'] = datetime.utcnow().isoformat()
-                rule['total_triggers'] += 1
+        triggered_orders = check_triggers(data.get('inventory_data', {}))
         
         logger.info(f"Checked triggers, created {len(triggered_orders)} orders")
         
@@ -238,6 +180,7 @@ def check_reorder_triggers():
         return jsonify({'error': str(e)}), 500
 
 @reorder_bp.route('/orders', methods=['GET'])
+@conditional_get(pending_orders)
 def get_all_orders():
     """Get all reorders"""
     return jsonify({
@@ -246,6 +189,7 @@ def get_all_orders():
     })
 
 @reorder_bp.route('/orders/<order_id>', methods=['GET'])
+@conditional_get(pending_orders)
 def get_order(order_id):
     """Get specific reorder details"""
     if order_id not in pending_orders:
@@ -270,6 +214,7 @@ def approve_order(order_id):
         order['approved_by'] = data.get('approved_by', 'system')
         order['approved_date'] = datetime.utcnow().isoformat()
         order['approval_notes'] = data.get('notes', '')
+        pending_orders.commit(order_id)
         
         # Send to supplier (in production, integrate with supplier systems)
         send_order_to_supplier(order)
@@ -305,6 +250,7 @@ def reject_order(order_id):
         order['rejected_by'] = data.get('rejected_by', 'system')
         order['rejected_date'] = datetime.utcnow().isoformat()
         order['rejection_reason'] = data.get('reason', '')
+        pending_orders.commit(order_id)
         
         logger.info(f"Rejected reorder: {order_id}")
         
@@ -318,6 +264,7 @@ def reject_order(order_id):
         return jsonify({'error': str(e)}), 500
 
 @reorder_bp.route('/history', methods=['GET'])
+@conditional_get(reorder_history)
 def get_reorder_history():
     """Get reorder history"""
     return jsonify({
@@ -329,45 +276,136 @@ def get_reorder_history():
 def get_reorder_analytics():
     """Get reorder analytics and insights"""
     try:
-        # Calculate analytics from reorder data
-        total_rules = len(reorder_rules)
-        active_rules = len([r for r in reorder_rules.values() if r['status'] == 'active'])
-        total_orders = len(pending_orders) + len(reorder_history)
-        pending_approval = len([o for o in pending_orders.values() if o['status'] == 'pending_approval'])
-        
-        # Calculate cost savings and efficiency metrics
-        total_cost_saved = 0
-        avg_lead_time = 0
-        
-        if reorder_history:
-            total_cost_saved = sum(h.get('cost_saved', 0) for h in reorder_history.values())
-            avg_lead_time = sum(h.get('actual_lead_time', 0) for h in reorder_history.values()) / len(reorder_history)
-        
-        analytics = {
-            'summary': {
-                'total_rules': total_rules,
-                'active_rules': active_rules,
-                'total_orders': total_orders,
-                'pending_approval': pending_approval
-            },
-            'performance': {
-                'total_cost_saved': total_cost_saved,
-                'average_lead_time_days': round(avg_lead_time, 1),
-                'automation_rate': round((total_orders / max(total_rules, 1)) * 100, 1)
-            },
-            'trends': {
-                'orders_this_month': len([o for o in pending_orders.values() 
-                                        if datetime.fromisoformat(o['created_date']).month == datetime.utcnow().month]),
-                'most_triggered_product': get_most_triggered_product()
-            }
-        }
+        if wants_async():
+            return accepted(job_queue.submit('reorder_analytics'))
         
-        return jsonify(analytics)
+        return jsonify(compute_reorder_analytics())
         
     except Exception as e:
         logger.error(f"Error getting analytics: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def compute_reorder_analytics():
+    """Calculate reorder analytics from rules, orders and history"""
+    # Calculate analytics from reorder data
+    total_rules = len(reorder_rules)
+    active_rules = len([r for r in reorder_rules.values() if r['status'] == 'active'])
+    total_orders = len(pending_orders) + len(reorder_history)
+    pending_approval = len([o for o in pending_orders.values() if o['status'] == 'pending_approval'])
+    
+    # Calculate cost savings and efficiency metrics
+    total_cost_saved = 0
+    avg_lead_time = 0
+    
+    if reorder_history:
+        total_cost_saved = sum(h.get('cost_saved', 0) for h in reorder_history.values())
+        avg_lead_time = sum(h.get('actual_lead_time', 0) for h in reorder_history.values()) / len(reorder_history)
+    
+    analytics = {
+        'summary': {
+            'total_rules': total_rules,
+            'active_rules': active_rules,
+            'total_orders': total_orders,
+            'pending_approval': pending_approval
+        },
+        'performance': {
+            'total_cost_saved': total_cost_saved,
+            'average_lead_time_days': round(avg_lead_time, 1),
+            'automation_rate': round((total_orders / max(total_rules, 1)) * 100, 1)
+        },
+        'trends': {
+            'orders_this_month': len([o for o in pending_orders.values() 
+                                    if datetime.fromisoformat(o['created_date']).month == datetime.utcnow().month]),
+            'most_triggered_product': get_most_triggered_product()
+        }
+    }
+    
+    return analytics
+
+def trigger_product_reorder(product_id, quantity, trigger_reason='manual_trigger'):
+    """Create a reorder from the product's active rule, or return None if it has none"""
+    for rule in reorder_rules.values():
+        if rule['product_id'] == product_id and rule['status'] == 'active':
+            return create_reorder(rule, quantity, trigger_reason)
+    return None
+
+def check_triggers(inventory_data, report=None):
+    """Evaluate every active rule against {product_id: {current_stock, demand_forecast}} and create the triggered orders.
+    
+    `report(progress)` is called periodically when given (background jobs).
+    """
+    triggered_orders = []
+    rules = list(reorder_rules.values())
+    
+    for index, rule in enumerate(rules):
+        if report is not None and index % 100 == 0:
+            report(index / len(rules))
+        if rule['status'] != 'active':
+            continue
+        
+        product_id = rule['product_id']
+        
+        # Check if trigger conditions are met
+        should_trigger = False
+        trigger_reason = ""
+        
+        if rule['trigger_type'] == 'threshold':
+            current_stock = inventory_data.get(product_id, {}).get('current_stock', 0)
+            if current_stock <= rule['trigger_value']:
+                should_trigger = True
+                trigger_reason = f"Stock level ({current_stock}) below threshold ({rule['trigger_value']})"
+        
+        elif rule['trigger_type'] == 'time_based':
+            # Check if enough time has passed since last order
+            last_triggered = rule.get('last_triggered')
+            if last_triggered:
+                last_date = datetime.fromisoformat(last_triggered)
+                days_since = (datetime.utcnow() - last_date).days
+                if days_since >= rule['trigger_value']:
+                    should_trigger = True
+                    trigger_reason = f"Time-based trigger: {days_since} days since last order"
+            else:
+                should_trigger = True
+                trigger_reason = "First time trigger"
+        
+        elif rule['trigger_type'] == 'demand_forecast':
+            # Check demand forecast data
+            forecast_data = inventory_data.get(product_id, {}).get('demand_forecast', {})
+            predicted_demand = forecast_data.get('predicted_demand', 0)
+            current_stock = inventory_data.get(product_id, {}).get('current_stock', 0)
+            
+            if current_stock < predicted_demand:
+                should_trigger = True
+                trigger_reason = f"Current stock ({current_stock}) below predicted demand ({predicted_demand})"
+        
+        if should_trigger:
+            # Calculate reorder quantity (can include seasonal adjustments)
+            reorder_qty = rule['reorder_quantity']
+            
+            if rule.get('seasonal_adjustment', False):
+                # Simple seasonal adjustment (can be enhanced)
+                current_month = datetime.utcnow().month
+                if current_month in [11, 12, 1]:  # Holiday season
+                    reorder_qty = int(reorder_qty * 1.5)
+            
+            # Create reorder
+            order_result = create_reorder(rule, reorder_qty, trigger_reason)
+            triggered_orders.append(order_result)
+    
+    # Update the trigger stats of every rule that fired under the shared write
+    # lock, so checks running in other workers add to the counters too
+    fired = {order['rule_id'] for order in triggered_orders}
+    triggered_at = datetime.utcnow().isoformat()
+    with reorder_rules.exclusive():
+        for rule_id in fired:
+            rule = reorder_rules.get(rule_id)
+            if rule is not None:
+                rule['last_triggered'] = triggered_at
+                rule['total_triggers'] += 1
+        reorder_rules.commit(*fired)
+    
+    return triggered_orders
+
 def create_reorder(rule, quantity, trigger_reason):
     """Create a new reorder based on rule"""
     order_id = f"order_{datetime.utcnow().timestamp()}"
@@ -410,6 +448,7 @@ def send_order_to_supplier(order):
     # In production, integrate with supplier systems/APIs
     order['status'] = 'sent_to_supplier'
     order['sent_date'] = datetime.utcnow().isoformat()
+    pending_orders.commit(order['order_id'])
     
     logger.info(f"Sent order to supplier: {order['order_id']}")
 
@@ -452,3 +491,10 @@ def get_most_triggered_product():
     
     return max(product_counts.values(), key=lambda x: x['total_triggers'])
 
+def run_check_triggers_job(job, payload):
+    orders = check_triggers(payload.get('inventory_data', {}), report=job.report)
+    logger.info(f"Checked triggers in job {job.job_id}, created {len(orders)} orders")
+    return {'triggered_orders': orders, 'total_triggered': len(orders)}
+
+job_queue.register('reorder_check_triggers', run_check_triggers_job, concurrency=1)
+job_queue.register('reorder_analytics', lambda job, payload: compute_reorder_analytics(), concurrency=2)
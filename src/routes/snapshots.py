@@ -0,0 +1,46 @@
+from flask import Blueprint, jsonify
+import atexit
+import logging
+import os
+from src.models.shared_state import shared_state
+from src.models.state_snapshot import StateSnapshotter
+
+snapshots_bp = Blueprint('snapshots', __name__)
+logger = logging.getLogger(__name__)
+
+# Shared dicts are captured automatically; other stores register themselves.
+# Written every STATE_SNAPSHOT_INTERVAL seconds (0 disables) and at shutdown
+state_snapshots = StateSnapshotter(
+    os.environ.get('STATE_SNAPSHOT_PATH',
+                   os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'state.snapshot')),
+    shared_state,
+    interval=float(os.environ.get('STATE_SNAPSHOT_INTERVAL', 300))
+)
+atexit.register(state_snapshots.close)
+
+@snapshots_bp.before_app_request
+def start_snapshots():
+    """Make sure this worker runs the periodic snapshot thread"""
+    state_snapshots.ensure_running()
+
+@snapshots_bp.route('', methods=['GET'])
+def get_snapshots():
+    """Get the restored and last written snapshot stats"""
+    return jsonify(state_snapshots.stats())
+
+@snapshots_bp.route('', methods=['POST'])
+def write_snapshot():
+    """Write a snapshot now"""
+    try:
+        toc = state_snapshots.write(force=True)
+        if toc is None:
+            return jsonify({'error': 'A snapshot is already being written'}), 409
+
+        return jsonify({
+            'success': True,
+            'snapshot': state_snapshots.last_write
+        })
+
+    except Exception as e:
+        logger.error(f"Error writing state snapshot: {str(e)}")
+        return jsonify({'error': str(e)}), 500
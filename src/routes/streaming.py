@@ -0,0 +1,67 @@
+import csv
+import json
+
+# Request content types streamed row by row by the bulk endpoints
+STREAM_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv'
+}
+
+class StreamDecodeError(ValueError):
+    """A CSV body line that is not valid UTF-8; the rows before it were already read"""
+
+    def __init__(self, line_number):
+        super().__init__(f'Line {line_number} is not valid UTF-8')
+        self.line_number = line_number
+
+def iter_stream_lines(stream, chunk_size=1 << 16):
+    """Yield the lines of a request body, reading it in large chunks rather than line by line"""
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+def iter_stream_records(stream, stream_format):
+    """Yield (line_number, record, error) for each row of an NDJSON/CSV body.
+
+    `record` is the row as a dict (CSV values are strings), or None when
+    the row could not be read, with `error` saying why. An NDJSON line
+    that is not UTF-8 is rejected like any other unreadable row; in CSV,
+    where a row may span lines, it raises StreamDecodeError instead.
+    """
+    if stream_format == 'csv':
+        # Line numbers count the header row
+        for line_number, record in enumerate(csv.DictReader(_decoded_lines(stream)), start=2):
+            yield line_number, record, None
+        return
+
+    for line_number, line in enumerate(iter_stream_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except UnicodeDecodeError:
+            yield line_number, None, 'Invalid UTF-8'
+            continue
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Row is not an object'
+            continue
+        yield line_number, record, None
+
+def _decoded_lines(stream):
+    for line_number, line in enumerate(iter_stream_lines(stream), start=1):
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise StreamDecodeError(line_number) from None
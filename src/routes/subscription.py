@@ -2,12 +2,13 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import logging
 import json
+from src.models.shared_state import shared_state, SharedDict
 
 subscription_bp = Blueprint('subscription', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-subscriptions = {}
+# Subscriptions are shared by all workers; plans are static configuration
+subscriptions = SharedDict(shared_state, 'subscriptions')
 subscription_plans = {
     'basic': {
         'plan_id': 'basic',
@@ -194,17 +195,21 @@ def cancel_subscription(subscription_id):
         if subscription_id not in subscriptions:
             return jsonify({'error': 'Subscription not found'}), 404
         
-        subscription = subscriptions[subscription_id]
-        
-        if subscription['status'] != 'active':
-            return jsonify({'error': 'Subscription is not active'}), 400
-        
         data = request.get_json() or {}
         
-        # In production, cancel with Stripe
-        subscription['status'] = 'cancelled'
-        subscription['cancelled_date'] = datetime.utcnow().isoformat()
-        subscription['cancellation_reason'] = data.get('reason', '')
+        # Whole records are written back: hold the shared write lock so usage
+        # counted by other workers in the meantime is kept
+        with subscriptions.exclusive():
+            subscription = subscriptions[subscription_id]
+            
+            if subscription['status'] != 'active':
+                return jsonify({'error': 'Subscription is not active'}), 400
+            
+            # In production, cancel with Stripe
+            subscription['status'] = 'cancelled'
+            subscription['cancelled_date'] = datetime.utcnow().isoformat()
+            subscription['cancellation_reason'] = data.get('reason', '')
+            subscriptions.commit(subscription_id)
         
         logger.info(f"Cancelled subscription: {subscription_id}")
         
@@ -230,20 +235,22 @@ def upgrade_subscription(subscription_id):
         if not new_plan_id or new_plan_id not in subscription_plans:
             return jsonify({'error': 'Invalid new plan ID'}), 400
         
-        subscription = subscriptions[subscription_id]
-        old_plan = subscription_plans[subscription['plan_id']]
-        new_plan = subscription_plans[new_plan_id]
-        
-        if new_plan['price'] <= old_plan['price']:
-            return jsonify({'error': 'New plan must be higher tier'}), 400
-        
-        # In production, handle prorated billing with Stripe
-        subscription['plan_id'] = new_plan_id
-        subscription['plan_name'] = new_plan['name']
-        subscription['price'] = new_plan['price']
-        subscription['features'] = new_plan['features']
-        subscription['limits'] = new_plan['limits']
-        subscription['upgraded_date'] = datetime.utcnow().isoformat()
+        with subscriptions.exclusive():
+            subscription = subscriptions[subscription_id]
+            old_plan = subscription_plans[subscription['plan_id']]
+            new_plan = subscription_plans[new_plan_id]
+            
+            if new_plan['price'] <= old_plan['price']:
+                return jsonify({'error': 'New plan must be higher tier'}), 400
+            
+            # In production, handle prorated billing with Stripe
+            subscription['plan_id'] = new_plan_id
+            subscription['plan_name'] = new_plan['name']
+            subscription['price'] = new_plan['price']
+            subscription['features'] = new_plan['features']
+            subscription['limits'] = new_plan['limits']
+            subscription['upgraded_date'] = datetime.utcnow().isoformat()
+            subscriptions.commit(subscription_id)
         
         logger.info(f"Upgraded subscription: {subscription_id} to {new_plan_id}")
         
@@ -297,17 +304,22 @@ def update_subscription_usage(subscription_id):
             return jsonify({'error': 'Subscription not found'}), 404
         
         data = request.get_json()
-        subscription = subscriptions[subscription_id]
-        
-        # Update usage counters
-        if 'products' in data:
-            subscription['usage']['products'] = data['products']
-        
-        if 'api_calls' in data:
-            subscription['usage']['api_calls_this_month'] += data['api_calls']
         
-        if 'webhooks' in data:
-            subscription['usage']['webhooks'] = data['webhooks']
+        # Update usage counters under the shared write lock so concurrent
+        # increments from other workers are not lost
+        with subscriptions.exclusive():
+            subscription = subscriptions[subscription_id]
+            
+            if 'products' in data:
+                subscription['usage']['products'] = data['products']
+            
+            if 'api_calls' in data:
+                subscription['usage']['api_calls_this_month'] += data['api_calls']
+            
+            if 'webhooks' in data:
+                subscription['usage']['webhooks'] = data['webhooks']
+            
+            subscriptions.commit(subscription_id)
         
         # Check limits
         limits_exceeded = check_subscription_limits(subscription)
@@ -388,37 +400,43 @@ def check_subscription_limits(subscription):
 
 def handle_payment_success(stripe_subscription_id):
     """Handle successful payment"""
-    # Find subscription by Stripe ID
-    for subscription in subscriptions.values():
-        if subscription.get('stripe_subscription_id') == stripe_subscription_id:
-            subscription['status'] = 'active'
-            subscription['last_payment_date'] = datetime.utcnow().isoformat()
-            
-            # Reset monthly usage counters
-            subscription['usage']['api_calls_this_month'] = 0
-            
-            logger.info(f"Payment succeeded for subscription: {subscription['subscription_id']}")
-            break
+    # Find subscription by Stripe ID; whole records are written back, so under the shared write lock
+    with subscriptions.exclusive():
+        for subscription in subscriptions.values():
+            if subscription.get('stripe_subscription_id') == stripe_subscription_id:
+                subscription['status'] = 'active'
+                subscription['last_payment_date'] = datetime.utcnow().isoformat()
+                
+                # Reset monthly usage counters
+                subscription['usage']['api_calls_this_month'] = 0
+                subscriptions.commit(subscription['subscription_id'])
+                
+                logger.info(f"Payment succeeded for subscription: {subscription['subscription_id']}")
+                break
 
 def handle_payment_failure(stripe_subscription_id):
     """Handle failed payment"""
-    # Find subscription by Stripe ID
-    for subscription in subscriptions.values():
-        if subscription.get('stripe_subscription_id') == stripe_subscription_id:
-            subscription['status'] = 'past_due'
-            subscription['payment_failed_date'] = datetime.utcnow().isoformat()
-            
-            logger.warning(f"Payment failed for subscription: {subscription['subscription_id']}")
-            break
+    # Find subscription by Stripe ID; whole records are written back, so under the shared write lock
+    with subscriptions.exclusive():
+        for subscription in subscriptions.values():
+            if subscription.get('stripe_subscription_id') == stripe_subscription_id:
+                subscription['status'] = 'past_due'
+                subscription['payment_failed_date'] = datetime.utcnow().isoformat()
+                subscriptions.commit(subscription['subscription_id'])
+                
+                logger.warning(f"Payment failed for subscription: {subscription['subscription_id']}")
+                break
 
 def handle_subscription_cancellation(stripe_subscription_id):
     """Handle subscription cancellation from Stripe"""
-    # Find subscription by Stripe ID
-    for subscription in subscriptions.values():
-        if subscription.get('stripe_subscription_id') == stripe_subscription_id:
-            subscription['status'] = 'cancelled'
-            subscription['cancelled_date'] = datetime.utcnow().isoformat()
-            
-            logger.info(f"Subscription cancelled via Stripe: {subscription['subscription_id']}")
-            break
+    # Find subscription by Stripe ID; whole records are written back, so under the shared write lock
+    with subscriptions.exclusive():
+        for subscription in subscriptions.values():
+            if subscription.get('stripe_subscription_id') == stripe_subscription_id:
+                subscription['status'] = 'cancelled'
+                subscription['cancelled_date'] = datetime.utcnow().isoformat()
+                subscriptions.commit(subscription['subscription_id'])
+                
+                logger.info(f"Subscription cancelled via Stripe: {subscription['subscription_id']}")
+                break
 
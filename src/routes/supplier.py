@@ -2,16 +2,19 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, timedelta
 import logging
 import json
+from src.models.shared_state import shared_state, SharedDict
+from src.routes.conditional import conditional_get
 
 supplier_bp = Blueprint('supplier', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-suppliers_data = {}
-supplier_requests = {}
-supplier_performance = {}
+# Stores shared by all workers; each SharedDict's version doubles as its ETag source
+suppliers_data = SharedDict(shared_state, 'suppliers_data')
+supplier_requests = SharedDict(shared_state, 'supplier_requests')
+supplier_performance = SharedDict(shared_state, 'supplier_performance')
 
 @supplier_bp.route('/status', methods=['GET'])
+@conditional_get(suppliers_data, supplier_requests)
 def supplier_status():
     """Get supplier management bot status"""
     return jsonify({
@@ -30,6 +33,7 @@ def supplier_status():
     })
 
 @supplier_bp.route('/suppliers', methods=['GET'])
+@conditional_get(suppliers_data)
 def get_all_suppliers():
     """Get all suppliers"""
     return jsonify({
@@ -38,6 +42,7 @@ def get_all_suppliers():
     })
 
 @supplier_bp.route('/suppliers/<supplier_id>', methods=['GET'])
+@conditional_get(suppliers_data, supplier_performance)
 def get_supplier(supplier_id):
     """Get specific supplier details"""
     if supplier_id not in suppliers_data:
@@ -123,6 +128,7 @@ def update_supplier(supplier_id):
                 supplier[field] = data[field]
         
         supplier['last_updated'] = datetime.utcnow().isoformat()
+        suppliers_data.commit(supplier_id)
         
         logger.info(f"Updated supplier: {supplier_id}")
         
@@ -136,6 +142,7 @@ def update_supplier(supplier_id):
         return jsonify({'error': str(e)}), 500
 
 @supplier_bp.route('/requests', methods=['GET'])
+@conditional_get(supplier_requests)
 def get_all_requests():
     """Get all supplier requests"""
     return jsonify({
@@ -154,37 +161,13 @@ def create_supplier_request():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
-        request_id = f"req_{datetime.utcnow().timestamp()}"
-        
-        supplier_requests[request_id] = {
-            'request_id': request_id,
-            'request_type': data['request_type'],  # quote, order, information, complaint, etc.
-            'supplier_id': data['supplier_id'],
-            'description': data['description'],
-            'priority': data.get('priority', 'medium'),
-            'status': 'pending',
-            'created_date': datetime.utcnow().isoformat(),
-            'due_date': data.get('due_date', ''),
-            'assigned_to': data.get('assigned_to', ''),
-            'products': data.get('products', []),
-            'quantity': data.get('quantity', 0),
-            'budget': data.get('budget', 0),
-            'notes': data.get('notes', ''),
-            'attachments': data.get('attachments', []),
-            'responses': []
-        }
-        
-        # Auto-assign based on request type and supplier
-        auto_assign_request(request_id)
-        
-        # Send notification (webhook trigger)
-        trigger_supplier_request_webhook(supplier_requests[request_id])
+        request_obj = open_supplier_request(data)
         
-        logger.info(f"Created supplier request: {request_id}")
+        logger.info(f"Created supplier request: {request_obj['request_id']}")
         
         return jsonify({
             'success': True,
-            'request': supplier_requests[request_id]
+            'request': request_obj
         }), 201
         
     except Exception as e:
@@ -215,6 +198,7 @@ def update_request(request_id):
             request_obj['responses'].append(response)
         
         request_obj['last_updated'] = datetime.utcnow().isoformat()
+        supplier_requests.commit(request_id)
         
         logger.info(f"Updated supplier request: {request_id}")
         
@@ -228,6 +212,7 @@ def update_request(request_id):
         return jsonify({'error': str(e)}), 500
 
 @supplier_bp.route('/performance', methods=['GET'])
+@conditional_get(supplier_performance)
 def get_all_performance():
     """Get performance data for all suppliers"""
     return jsonify({
@@ -236,6 +221,7 @@ def get_all_performance():
     })
 
 @supplier_bp.route('/performance/<supplier_id>', methods=['GET'])
+@conditional_get(supplier_performance)
 def get_supplier_performance(supplier_id):
     """Get performance data for specific supplier"""
     if supplier_id not in supplier_performance:
@@ -252,44 +238,48 @@ def update_supplier_performance(supplier_id):
         
         data = request.get_json()
         
-        if supplier_id not in supplier_performance:
-            supplier_performance[supplier_id] = {
-                'supplier_id': supplier_id,
-                'total_orders': 0,
-                'on_time_deliveries': 0,
-                'quality_score': 0,
-                'response_time_hours': 0
-            }
-        
-        performance = supplier_performance[supplier_id]
-        
-        # Update performance metrics
-        if 'delivery_status' in data:
-            performance['total_orders'] += 1
-            if data['delivery_status'] == 'on_time':
-                performance['on_time_deliveries'] += 1
-        
-        if 'quality_score' in data:
-            # Calculate running average
-            current_score = performance.get('quality_score', 0)
-            new_score = data['quality_score']
-            total_orders = performance.get('total_orders', 1)
-            performance['quality_score'] = ((current_score * (total_orders - 1)) + new_score) / total_orders
-        
-        if 'response_time_hours' in data:
-            # Calculate running average
-            current_time = performance.get('response_time_hours', 0)
-            new_time = data['response_time_hours']
-            total_orders = performance.get('total_orders', 1)
-            performance['response_time_hours'] = ((current_time * (total_orders - 1)) + new_time) / total_orders
-        
-        # Calculate overall performance score
-        on_time_rate = performance['on_time_deliveries'] / max(performance['total_orders'], 1)
-        quality_score = performance['quality_score'] / 100  # Normalize to 0-1
-        response_score = max(0, 1 - (performance['response_time_hours'] / 48))  # 48 hours = 0 score
-        
-        performance['overall_score'] = (on_time_rate * 0.4 + quality_score * 0.4 + response_score * 0.2) * 100
-        performance['last_performance_update'] = datetime.utcnow().isoformat()
+        # Counters and running averages are read-modify-write: hold the shared
+        # write lock so updates from other workers are not overwritten
+        with supplier_performance.exclusive():
+            if supplier_id not in supplier_performance:
+                supplier_performance[supplier_id] = {
+                    'supplier_id': supplier_id,
+                    'total_orders': 0,
+                    'on_time_deliveries': 0,
+                    'quality_score': 0,
+                    'response_time_hours': 0
+                }
+            
+            performance = supplier_performance[supplier_id]
+            
+            # Update performance metrics
+            if 'delivery_status' in data:
+                performance['total_orders'] += 1
+                if data['delivery_status'] == 'on_time':
+                    performance['on_time_deliveries'] += 1
+            
+            if 'quality_score' in data:
+                # Calculate running average
+                current_score = performance.get('quality_score', 0)
+                new_score = data['quality_score']
+                total_orders = performance.get('total_orders', 1)
+                performance['quality_score'] = ((current_score * (total_orders - 1)) + new_score) / total_orders
+            
+            if 'response_time_hours' in data:
+                # Calculate running average
+                current_time = performance.get('response_time_hours', 0)
+                new_time = data['response_time_hours']
+                total_orders = performance.get('total_orders', 1)
+                performance['response_time_hours'] = ((current_time * (total_orders - 1)) + new_time) / total_orders
+            
+            # Calculate overall performance score
+            on_time_rate = performance['on_time_deliveries'] / max(performance['total_orders'], 1)
+            quality_score = performance['quality_score'] / 100  # Normalize to 0-1
+            response_score = max(0, 1 - (performance['response_time_hours'] / 48))  # 48 hours = 0 score
+            
+            performance['overall_score'] = (on_time_rate * 0.4 + quality_score * 0.4 + response_score * 0.2) * 100
+            performance['last_performance_update'] = datetime.utcnow().isoformat()
+            supplier_performance.commit(supplier_id)
         
         logger.info(f"Updated performance for supplier: {supplier_id}")
         
@@ -344,6 +334,7 @@ def send_communication():
         return jsonify({'error': str(e)}), 500
 
 @supplier_bp.route('/compliance/<supplier_id>', methods=['GET'])
+@conditional_get(suppliers_data)
 def get_supplier_compliance(supplier_id):
     """Get supplier compliance status"""
     if supplier_id not in suppliers_data:
@@ -363,6 +354,37 @@ def get_supplier_compliance(supplier_id):
     
     return jsonify(compliance_data)
 
+def open_supplier_request(data):
+    """Create, auto-assign and announce a supplier request from validated input"""
+    request_id = f"req_{datetime.utcnow().timestamp()}"
+    
+    supplier_requests[request_id] = {
+        'request_id': request_id,
+        'request_type': data['request_type'],  # quote, order, information, complaint, etc.
+        'supplier_id': data['supplier_id'],
+        'description': data['description'],
+        'priority': data.get('priority', 'medium'),
+        'status': 'pending',
+        'created_date': datetime.utcnow().isoformat(),
+        'due_date': data.get('due_date', ''),
+        'assigned_to': data.get('assigned_to', ''),
+        'products': data.get('products', []),
+        'quantity': data.get('quantity', 0),
+        'budget': data.get('budget', 0),
+        'notes': data.get('notes', ''),
+        'attachments': data.get('attachments', []),
+        'responses': []
+    }
+    
+    # Auto-assign based on request type and supplier
+    auto_assign_request(request_id)
+    supplier_requests.commit(request_id)
+    
+    # Send notification (webhook trigger)
+    trigger_supplier_request_webhook(supplier_requests[request_id])
+    
+    return supplier_requests[request_id]
+
 def auto_assign_request(request_id):
     """Auto-assign request based on type and supplier"""
     if request_id not in supplier_requests:
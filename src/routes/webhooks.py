@@ -4,13 +4,19 @@ import logging
 import json
 import hmac
 import hashlib
+import os
+from src.models.shared_state import shared_state, SharedDict, SharedLog
+from src.routes.metrics import track_backlog
 
 webhooks_bp = Blueprint('webhooks', __name__)
 logger = logging.getLogger(__name__)
 
-# In-memory storage for demo (replace with database in production)
-webhook_subscriptions = {}
-webhook_events = []
+# Stores shared by all workers; only the newest WEBHOOK_EVENT_RETENTION events are kept
+webhook_subscriptions = SharedDict(shared_state, 'webhook_subscriptions')
+webhook_events = SharedLog(
+    shared_state, 'webhook_events', retain=int(os.environ.get('WEBHOOK_EVENT_RETENTION', 10000))
+)
+track_backlog('webhook_events', webhook_events)
 webhook_config = {
     'secret_key': 'supply_chain_webhook_secret_2024'
 }
@@ -382,7 +388,7 @@ def zapier_sample_data():
 
 def trigger_subscribed_webhooks(trigger_event, event_data):
     """Trigger all subscribed webhooks for an event"""
-    triggered_count = 0
+    triggered = []
     
     for subscription in webhook_subscriptions.values():
         if (subscription['trigger_event'] == trigger_event and 
@@ -392,14 +398,20 @@ def trigger_subscribed_webhooks(trigger_event, event_data):
             if passes_filters(event_data, subscription.get('filters', {})):
                 # In production, send HTTP POST to webhook_url
                 logger.info(f"Triggering webhook: {subscription['webhook_url']}")
-                
-                # Update subscription stats
-                subscription['last_triggered'] = datetime.utcnow().isoformat()
-                subscription['total_triggers'] += 1
-                
-                triggered_count += 1
+                triggered.append(subscription['subscription_id'])
     
-    return triggered_count
+    # Update subscription stats under the shared write lock so triggers in other workers are counted too
+    if triggered:
+        triggered_at = datetime.utcnow().isoformat()
+        with webhook_subscriptions.exclusive():
+            for subscription_id in triggered:
+                subscription = webhook_subscriptions.get(subscription_id)
+                if subscription is not None:
+                    subscription['last_triggered'] = triggered_at
+                    subscription['total_triggers'] += 1
+            webhook_subscriptions.commit(*triggered)
+    
+    return len(triggered)
 
 def passes_filters(event_data, filters):
     """Check if event data passes subscription filters"""
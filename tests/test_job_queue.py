@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from src.models.job_queue import JobQueue, FAILED, RUNNING, SUCCEEDED
+from src.models.shared_state import SharedState
+
+
+def exited_pid():
+    """Pid of a child process that has already exited and been reaped"""
+    pid = os.fork()
+    if pid == 0:
+        os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+class SharedJobQueueTest(unittest.TestCase):
+    """Two job queues sharing records through one database, as two workers would"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'shared_state.db')
+        self.a, self.b = self.queue(path), self.queue(path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def queue(self, path, retention=3):
+        queue = JobQueue(retention=retention)
+        queue.share(SharedState(path))
+        queue.register('echo', lambda job, payload: {'echo': payload})
+        return queue
+
+    def run_job(self, queue, payload=None):
+        job = queue.submit('echo', payload)
+        job.future.result()
+        return job
+
+    def test_result_is_read_only_by_the_result_lookup(self):
+        job = self.run_job(self.a, {'n': 1})
+
+        self.assertNotIn('result', self.b.shared[job.job_id])
+        self.assertIsNone(self.b.jobs()[0].result)
+        view = self.b.get(job.job_id, include_result=True)
+        self.assertEqual(view.status, SUCCEEDED)
+        self.assertEqual(view.result, {'echo': {'n': 1}})
+
+    def test_jobs_of_an_exited_worker_are_failed(self):
+        job = self.run_job(self.a)
+        self.a.shared['orphan'] = dict(
+            self.a.shared[job.job_id], job_id='orphan', status=RUNNING, finished_date=None, owner_pid=exited_pid()
+        )
+
+        self.assertEqual(self.b.get('orphan').status, FAILED)
+        self.assertEqual(self.a.shared['orphan']['status'], FAILED)
+
+    def test_shared_records_are_held_to_retention(self):
+        for _ in range(3):
+            self.run_job(self.a)
+        job = self.run_job(self.a)
+        self.a.shared['orphan'] = dict(
+            self.a.shared[job.job_id], job_id='orphan', status=RUNNING, created_date='2000-01-01T00:00:00',
+            finished_date=None, owner_pid=exited_pid()
+        )
+        for _ in range(2):
+            self.run_job(self.b)
+
+        self.assertLessEqual(len(self.b.shared), 3)
+        self.assertLessEqual(set(self.b.results), set(self.b.shared))
+        self.assertNotIn('orphan', self.b.shared)
+
+
+if __name__ == '__main__':
+    unittest.main()
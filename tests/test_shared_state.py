@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from src.models.shared_state import SharedState, SharedDict, SharedLog
+
+
+class SharedDictReplicaTest(unittest.TestCase):
+    """Two replicas of one namespace, each on its own SharedState as two workers would be"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(self.directory.name, 'shared_state.db')
+        self.state_a, self.state_b = SharedState(path), SharedState(path)
+        self.a = SharedDict(self.state_a, 'items')
+        self.b = SharedDict(self.state_b, 'items')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_writes_reach_the_other_replica(self):
+        self.a['x'] = 1
+        self.b['y'] = 2
+        del self.a['x']
+        self.assertEqual(dict(self.a.items()), {'y': 2})
+        self.assertEqual(dict(self.b.items()), {'y': 2})
+
+    def test_write_landing_after_own_write_wins(self):
+        # Worker B writes the same key between A's write and A applying the changes after it
+        write = self.state_a.write
+
+        def write_then_b(namespace, entries):
+            version = write(namespace, entries)
+            self.b['key'] = 'from_b'
+            return version
+
+        self.state_a.write = write_then_b
+        self.a['key'] = 'from_a'
+        del self.state_a.write
+
+        self.assertEqual(self.b['key'], 'from_b')
+        self.assertEqual(self.a['key'], 'from_b')
+        self.assertEqual(self.a.seen, self.state_a.version('items'))
+
+    def test_write_landing_before_own_write_is_overwritten(self):
+        write = self.state_a.write
+
+        def b_then_write(namespace, entries):
+            self.b['key'] = 'from_b'
+            return write(namespace, entries)
+
+        self.state_a.write = b_then_write
+        self.a['key'] = 'from_a'
+        del self.state_a.write
+
+        self.assertEqual(self.a['key'], 'from_a')
+        self.assertEqual(self.b['key'], 'from_a')
+
+    def test_exclusive_increments_are_not_lost(self):
+        self.a['count'] = 0
+        for replica in (self.a, self.b) * 5:
+            with replica.exclusive():
+                replica['count'] = replica['count'] + 1
+        self.assertEqual(self.a['count'], 10)
+        self.assertEqual(self.b['count'], 10)
+
+
+class SharedLogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'shared_state.db')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_retain_bounds_the_shared_store_and_every_replica(self):
+        a = SharedLog(SharedState(self.path), 'events', retain=3)
+        b = SharedLog(SharedState(self.path), 'events', retain=3)
+        for value in range(4):
+            a.append(value)
+        b.extend([4, 5])
+
+        self.assertEqual(list(a), [3, 4, 5])
+        self.assertEqual(list(b), [3, 4, 5])
+        late = SharedLog(SharedState(self.path), 'events', retain=3)
+        self.assertEqual(list(late), [3, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
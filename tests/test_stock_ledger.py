@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+
+from src.models.stock_ledger import StockLedger, RECEIPT, SALE, TRANSFER
+
+
+class StockLedgerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def ledger(self, snapshot_every=100000):
+        ledger = StockLedger(self.directory.name, snapshot_every=snapshot_every)
+        ledger.open()
+        self.addCleanup(ledger.close)
+        return ledger
+
+    def test_restart_after_compaction_restores_balances(self):
+        ledger = self.ledger(snapshot_every=4)
+        for _ in range(5):
+            ledger.record([(RECEIPT, 'p', 'a', 10, None), (SALE, 'p', 'a', 3, None)])
+        ledger.record([(TRANSFER, 'p', 'a', 5, 'b')])
+        self.assertGreater(ledger.snapshot_seq, 0)
+
+        restarted = self.ledger()
+        self.assertEqual(restarted.all_balances(), {'p': {'a': 30, 'b': 5}})
+        self.assertEqual(restarted.seq, ledger.seq)
+
+    def test_writers_sharing_a_directory_see_each_other(self):
+        first, second = self.ledger(snapshot_every=3), self.ledger(snapshot_every=3)
+        for _ in range(4):
+            first.record([(RECEIPT, 'p', 'a', 1, None)])
+            second.record([(RECEIPT, 'p', 'a', 2, None)])
+        first.refresh()
+        self.assertEqual(first.all_balances(), {'p': {'a': 12}})
+        self.assertEqual(second.all_balances(), {'p': {'a': 12}})
+
+    def test_reopening_only_catches_up(self):
+        ledger, other = self.ledger(), self.ledger()
+        ledger.record([(RECEIPT, 'p', 'a', 5, None)])
+        other.record([(RECEIPT, 'p', 'a', 2, None)])
+        handles = (ledger._log, ledger._names_file, ledger._lock_file)
+
+        self.assertEqual(ledger.open()['replayed_movements'], 1)
+        self.assertEqual(ledger.open()['replayed_movements'], 0)
+        self.assertEqual((ledger._log, ledger._names_file, ledger._lock_file), handles)
+        self.assertEqual(ledger.all_balances(), {'p': {'a': 7}})
+
+
+if __name__ == '__main__':
+    unittest.main()